@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare benchmark results against a stored baseline.
+
+Metrics ending in `_per_s` are throughputs and metrics containing `recall`
+are search quality (higher is better); everything else, such as metrics
+containing `_ms`, is a cost (lower is better). A metric regresses when it
+is worse than the baseline by more than the threshold. Results are only
+compared when they were recorded with the same settings.
+
+Usage:
+    python benchmarks/compare.py benchmarks/results/latest.json benchmarks/baseline.json --threshold 0.10
+"""
+
+import argparse
+import json
+from typing import List, Tuple
+
+
+def higher_is_better(name: str) -> bool:
+    return name.endswith("_per_s") or "recall" in name
+
+
+def compare_results(current: dict, baseline: dict, threshold: float = 0.10) -> Tuple[List[tuple], int]:
+    """
+    Compare every metric present in both result files.
+
+    Args:
+        current: Results from `run.py`
+        baseline: Baseline results from `run.py`
+        threshold: Allowed relative regression (0.10 = 10%)
+
+    Returns:
+        Tuple of (rows of (metric, baseline, current, change, status), regression count)
+
+    Raises:
+        ValueError: If the two runs used different settings
+    """
+    settings, base_settings = current.get("settings", {}), baseline.get("settings", {})
+    differing = sorted(
+        name for name in set(settings) | set(base_settings) if settings.get(name) != base_settings.get(name)
+    )
+    if differing:
+        details = ", ".join(f"{name}: {settings.get(name)} vs {base_settings.get(name)}" for name in differing)
+        raise ValueError(f"Benchmark settings differ from the baseline ({details}); re-run with matching settings")
+    if current["environment"].get("processor") != baseline["environment"].get("processor"):
+        print("WARNING: Baseline was recorded on a different processor")
+
+    rows = []
+    regressions = 0
+    for group, metrics in current["results"].items():
+        for name, value in metrics.items():
+            base = baseline["results"].get(group, {}).get(name)
+            if base is None or base == 0:
+                continue
+
+            change = (value - base) / base
+            # Positive `worse` means the metric moved in the bad direction
+            worse = -change if higher_is_better(name) else change
+            if worse > threshold:
+                status = "REGRESSION"
+                regressions += 1
+            elif worse < -threshold:
+                status = "improved"
+            else:
+                status = "ok"
+            rows.append((f"{group}.{name}", base, value, change, status))
+
+    return rows, regressions
+
+
+def print_comparison(rows: List[tuple], threshold: float):
+    print("\n" + "=" * 88)
+    print(f"BENCHMARK COMPARISON (threshold {threshold:.0%})")
+    print("=" * 88)
+    print(f"{'metric':<44} {'baseline':>10} {'current':>10} {'change':>8}  status")
+    for metric, base, value, change, status in rows:
+        print(f"{metric:<44} {base:>10.2f} {value:>10.2f} {change:>+8.1%}  {status}")
+    print("=" * 88)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark results with a baseline")
+    parser.add_argument("current", type=str, help="Results JSON from run.py")
+    parser.add_argument("baseline", type=str, help="Baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    with open(args.current, 'r') as f:
+        current = json.load(f)
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+
+    try:
+        rows, regressions = compare_results(current, baseline, args.threshold)
+    except ValueError as e:
+        print(f"\nERROR: {e}\n")
+        exit(1)
+    print_comparison(rows, args.threshold)
+
+    if regressions:
+        print(f"\n{regressions} metric(s) regressed by more than {args.threshold:.0%}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
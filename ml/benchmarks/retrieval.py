@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Nearest-neighbour query latency versus index size on synthetic embeddings.
+
+Builds exact (flat) and IVF indexes (see inference.vector_index) over
+clustered, L2-normalized float16 vectors shaped like the classifier's
+penultimate features, and measures single-query latency, batched query
+throughput, IVF build time and IVF recall@k against exact search for
+each index size. Results use run.py's JSON layout, so compare.py can
+check them against a baseline.
+
+Usage:
+    python benchmarks/retrieval.py --output benchmarks/results/retrieval.json
+    python benchmarks/retrieval.py --sizes 100000 300000 --nprobe 8 16 32 --threads 8
+"""
+
+import argparse
+import json
+import sys
+import time
+import torch
+import torch.nn.functional as F
+from pathlib import Path
+from typing import Tuple
+
+# Add ml/src and ml/benchmarks to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from inference.vector_index import FlatIndex, IVFIndex, search_dtype
+from run import environment, percentile_ms
+from compare import compare_results, print_comparison
+
+
+def synthetic_embeddings(
+    num_vectors: int,
+    dim: int,
+    num_modes: int,
+    spread: float,
+    generator: torch.Generator,
+    chunk_size: int = 65536,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Normalized float16 vectors scattered around `num_modes` random directions.
+
+    Real embeddings cluster by device model and view; `spread` is the noise
+    norm relative to the unit mode direction (0.75 puts vectors at cosine
+    ~0.8 from their mode).
+
+    Returns:
+        Tuple of (vectors (N, D), mode directions (num_modes, D))
+    """
+    modes = F.normalize(torch.randn(num_modes, dim, generator=generator), dim=1)
+    vectors = torch.empty(num_vectors, dim, dtype=torch.float16)
+    for start in range(0, num_vectors, chunk_size):
+        n = min(chunk_size, num_vectors - start)
+        mode = torch.randint(num_modes, (n,), generator=generator)
+        noise = torch.randn(n, dim, generator=generator) * (spread / dim ** 0.5)
+        vectors[start:start + n] = F.normalize(modes[mode] + noise, dim=1).half()
+    return vectors, modes
+
+
+def time_queries(index, queries: torch.Tensor, k: int, **kwargs) -> tuple:
+    """Per-query latencies (seconds) and result ids of single-vector searches"""
+    index.search(queries[:1], k, **kwargs)  # warm-up
+    latencies, ids = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, found = index.search(query[None], k, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        ids.append(found[0])
+    return latencies, torch.stack(ids)
+
+
+def recall(found: torch.Tensor, true: torch.Tensor) -> float:
+    """Fraction of the exact top-k found"""
+    hits = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(found, true))
+    return hits / true.numel()
+
+
+def bench_size(num_vectors: int, args, generator: torch.Generator) -> dict:
+    """Flat and IVF timings for one index size"""
+    dtype = search_dtype(args.device)
+    vectors, modes = synthetic_embeddings(num_vectors, args.dim, args.modes, args.spread, generator)
+    # Queries are new images: fresh draws from the same modes
+    query_modes = modes[torch.randint(args.modes, (args.queries,), generator=generator)]
+    noise = torch.randn(args.queries, args.dim, generator=generator) * (args.spread / args.dim ** 0.5)
+    queries = F.normalize(query_modes + noise, dim=1).to(dtype)
+
+    results = {"store_mb": vectors.numel() * 2 / (1024 * 1024)}
+
+    flat = FlatIndex(vectors.to(dtype), args.device)
+    latencies, true_ids = time_queries(flat, queries, args.k)
+    start = time.perf_counter()
+    for batch in queries.split(args.batch_size):
+        flat.search(batch, args.k)
+    results["flat_query_ms_p50"] = percentile_ms(latencies, 50)
+    results["flat_query_ms_p99"] = percentile_ms(latencies, 99)
+    results["flat_batch_queries_per_s"] = len(queries) / (time.perf_counter() - start)
+    del flat
+
+    start = time.perf_counter()
+    ivf = IVFIndex.train(vectors.to(dtype), nlist=args.nlist, device=args.device)
+    results["ivf_build_s"] = time.perf_counter() - start
+    print(f"  IVF: {len(ivf.centroids)} lists, built in {results['ivf_build_s']:.1f} s")
+    for nprobe in args.nprobe:
+        latencies, ids = time_queries(ivf, queries, args.k, nprobe=nprobe)
+        results[f"ivf_nprobe{nprobe}_query_ms_p50"] = percentile_ms(latencies, 50)
+        results[f"ivf_nprobe{nprobe}_query_ms_p99"] = percentile_ms(latencies, 99)
+        results[f"ivf_nprobe{nprobe}_recall_at_{args.k}"] = recall(ids, true_ids)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nearest-neighbour query latency vs. index size")
+    parser.add_argument("--output", type=str, default="benchmarks/results/retrieval.json", help="Results JSON path")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000], help="Index sizes")
+    parser.add_argument("--dim", type=int, default=1024, help="Embedding dimension (densenet121: 1024, resnet50: 2048)")
+    parser.add_argument("--modes", type=int, default=1000, help="Clusters the synthetic embeddings are drawn around")
+    parser.add_argument("--spread", type=float, default=0.75, help="Noise norm around each cluster direction")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--batch-size", type=int, default=64, help="Queries per batch for the batched flat search")
+    parser.add_argument("--nlist", type=int, help="IVF lists (default: 2 * sqrt(N))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16], help="IVF lists searched per query")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], default="cpu", help="Device to search on")
+    parser.add_argument("--threads", type=int, default=4, help="torch intra-op threads")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+
+    args = parser.parse_args()
+
+    if args.device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        args.device = "cpu"
+    torch.set_num_threads(args.threads)
+    generator = torch.Generator().manual_seed(0)
+
+    results = {
+        "environment": environment(),
+        "settings": {
+            "device": args.device,
+            "threads": args.threads,
+            "dim": args.dim,
+            "modes": args.modes,
+            "spread": args.spread,
+            "k": args.k,
+            "nlist": args.nlist,
+            "nprobe": args.nprobe,
+        },
+        "results": {},
+    }
+
+    for size in args.sizes:
+        print(f"\nBenchmarking {size} vectors...")
+        results["results"][f"n{size}"] = bench_size(size, args, generator)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print(f"RETRIEVAL BENCHMARK ({args.dim}-d, k={args.k}, {args.threads} threads)")
+    print("=" * 60)
+    for group, metrics in results["results"].items():
+        for name, value in metrics.items():
+            print(f"{group + '.' + name:<48} {value:>10.3f}")
+    print("=" * 60)
+    print(f"\nResults written to: {output_path}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        try:
+            rows, regressions = compare_results(results, baseline, args.threshold)
+        except ValueError as e:
+            print(f"\nERROR: {e}\n")
+            exit(1)
+        print_comparison(rows, args.threshold)
+        if regressions:
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
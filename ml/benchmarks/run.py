@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Training and inference benchmarks on a synthetic ImageFolder tree.
+
+Measures data loading throughput, training step time, evaluator throughput
+and single-image / batched inference latency for each supported
+architecture, and writes the results to JSON for `compare.py`.
+
+Usage:
+    python benchmarks/run.py --output benchmarks/results/latest.json
+    python benchmarks/run.py --architectures mobilenet_v3_small --compare benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+import torch.nn as nn
+from datetime import datetime, timezone
+from pathlib import Path
+from ignite.engine import Events
+
+# Add ml/src and ml/benchmarks to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from data import create_data_loaders
+from models import create_model
+from training import create_trainer
+from synthetic import make_synthetic_imagefolder
+from compare import compare_results, print_comparison
+
+ARCHITECTURES = ["densenet121", "resnet50", "mobilenet_v3_small"]
+
+
+def percentile_ms(samples: list, q: float) -> float:
+    return float(np.percentile(np.array(samples) * 1000, q))
+
+
+def bench_data_loading(data_root: Path, args) -> dict:
+    """Images/s through the augmented training loader (decode + transforms)"""
+    train_loader, _, _, _ = create_data_loaders(
+        train_dir=str(data_root / "Train"),
+        test_dir=str(data_root / "Test"),
+        batch_size=args.batch_size,
+        img_size=args.img_size,
+        num_workers=args.num_workers,
+    )
+
+    # Warm-up pass (file system cache, worker start-up)
+    for _ in train_loader:
+        pass
+
+    images = 0
+    start = time.perf_counter()
+    for _ in range(args.loader_epochs):
+        for x, _ in train_loader:
+            images += x.shape[0]
+    elapsed = time.perf_counter() - start
+
+    return {"images_per_s": images / elapsed}
+
+
+def synthetic_batches(num_batches: int, batch_size: int, img_size: int, num_classes: int) -> list:
+    generator = torch.Generator().manual_seed(0)
+    return [
+        (
+            torch.randn(batch_size, 3, img_size, img_size, generator=generator),
+            torch.randint(0, num_classes, (batch_size,), generator=generator),
+        )
+        for _ in range(num_batches)
+    ]
+
+
+def bench_architecture(architecture: str, args) -> dict:
+    """Training step, evaluator and inference timings for one architecture"""
+    torch.manual_seed(0)
+    model = create_model(
+        architecture=architecture,
+        num_classes=args.num_classes,
+        pretrained=False,
+        device=args.device,
+    )
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-3)
+    trainer, evaluator = create_trainer(model, optimizer, nn.CrossEntropyLoss(), args.device)
+
+    batches = synthetic_batches(
+        args.warmup + args.iterations, args.batch_size, args.img_size, args.num_classes
+    )
+
+    # Training step time (model on pre-built batches, no data loading)
+    step_times = []
+
+    @trainer.on(Events.ITERATION_STARTED)
+    def start_timer(engine):
+        engine.step_start = time.perf_counter()
+
+    @trainer.on(Events.ITERATION_COMPLETED)
+    def stop_timer(engine):
+        if engine.state.iteration > args.warmup:
+            step_times.append(time.perf_counter() - engine.step_start)
+
+    trainer.run(batches, max_epochs=1)
+
+    # Evaluator throughput
+    evaluator.run(batches[:args.warmup])
+    start = time.perf_counter()
+    evaluator.run(batches[args.warmup:])
+    eval_elapsed = time.perf_counter() - start
+
+    # Inference latency
+    model.eval()
+    single = torch.randn(1, 3, args.img_size, args.img_size, device=args.device)
+    batch = torch.randn(args.batch_size, 3, args.img_size, args.img_size, device=args.device)
+
+    def timed(x: torch.Tensor, runs: int) -> list:
+        samples = []
+        with torch.inference_mode():
+            for _ in range(args.warmup):
+                model(x)
+            for _ in range(runs):
+                start = time.perf_counter()
+                model(x)
+                if args.device == "cuda":
+                    torch.cuda.synchronize()
+                samples.append(time.perf_counter() - start)
+        return samples
+
+    single_times = timed(single, args.latency_runs)
+    batch_times = timed(batch, args.iterations)
+
+    return {
+        "train_step_ms": percentile_ms(step_times, 50),
+        "train_images_per_s": args.batch_size / float(np.median(step_times)),
+        "eval_images_per_s": args.iterations * args.batch_size / eval_elapsed,
+        "latency_single_ms_p50": percentile_ms(single_times, 50),
+        "latency_single_ms_p90": percentile_ms(single_times, 90),
+        "latency_batch_ms_p50": percentile_ms(batch_times, 50),
+        "batch_images_per_s": args.batch_size / float(np.median(batch_times)),
+    }
+
+
+def environment() -> dict:
+    """Host and library details stored alongside results"""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "threads": torch.get_num_threads(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run training/inference benchmarks")
+    parser.add_argument("--output", type=str, default="benchmarks/results/latest.json", help="Results JSON path")
+    parser.add_argument("--architectures", type=str, nargs="+", default=ARCHITECTURES, choices=ARCHITECTURES)
+    parser.add_argument("--data-dir", type=str, help="Synthetic dataset location (default: temp dir)")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], default="cpu", help="Device to use")
+    parser.add_argument("--threads", type=int, default=1, help="torch intra-op threads (baseline.json uses 1)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Batch size")
+    parser.add_argument("--img-size", type=int, default=224, help="Image size")
+    parser.add_argument("--num-classes", type=int, default=5, help="Synthetic classes")
+    parser.add_argument("--num-workers", type=int, default=0, help="DataLoader workers")
+    parser.add_argument("--iterations", type=int, default=10, help="Timed iterations per measurement")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed warm-up iterations")
+    parser.add_argument("--latency-runs", type=int, default=30, help="Single-image latency samples")
+    parser.add_argument("--loader-epochs", type=int, default=2, help="Timed passes over the synthetic tree")
+    parser.add_argument("--compare", type=str, help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression")
+
+    args = parser.parse_args()
+
+    if args.device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        args.device = "cpu"
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    data_dir = Path(args.data_dir or Path(tempfile.gettempdir()) / "pacerid-bench-data")
+    data_root = make_synthetic_imagefolder(data_dir, num_classes=args.num_classes)
+
+    results = {
+        "environment": environment(),
+        "settings": {
+            "device": args.device,
+            "threads": args.threads,
+            "batch_size": args.batch_size,
+            "img_size": args.img_size,
+            "num_workers": args.num_workers,
+            "iterations": args.iterations,
+        },
+        "results": {},
+    }
+
+    print("\nBenchmarking data loading...")
+    results["results"]["data_loading"] = bench_data_loading(data_root, args)
+
+    for architecture in args.architectures:
+        print(f"\nBenchmarking {architecture}...")
+        results["results"][architecture] = bench_architecture(architecture, args)
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("BENCHMARK RESULTS")
+    print("=" * 60)
+    for group, metrics in results["results"].items():
+        for name, value in metrics.items():
+            print(f"{group + '.' + name:<48} {value:>10.2f}")
+    print("=" * 60)
+    print(f"\nResults written to: {output_path}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        try:
+            rows, regressions = compare_results(results, baseline, args.threshold)
+        except ValueError as e:
+            print(f"\nERROR: {e}\n")
+            exit(1)
+        print_comparison(rows, args.threshold)
+        if regressions:
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Deterministic synthetic ImageFolder tree for benchmarks"""
+
+import numpy as np
+from PIL import Image
+from pathlib import Path
+
+
+def make_synthetic_imagefolder(
+    root: str,
+    num_classes: int = 5,
+    images_per_class: int = 16,
+    min_size: int = 320,
+    max_size: int = 480,
+    seed: int = 0,
+) -> Path:
+    """
+    Write a reproducible ImageFolder tree of JPEG radiograph stand-ins.
+
+    Images are square (the test transforms keep aspect ratio, so square
+    images keep test batches stackable) with a size drawn from
+    [min_size, max_size], and mix smooth gradients with noise so JPEG
+    decode cost is similar to real photos. The tree is only written once;
+    a `.complete` marker makes later calls reuse it.
+
+    Args:
+        root: Directory to create `Train/` and `Test/` in
+        num_classes: Number of class directories
+        images_per_class: Training images per class (test gets a quarter)
+        min_size: Smallest image side in pixels
+        max_size: Largest image side in pixels
+        seed: Random seed
+
+    Returns:
+        Path to the root directory
+    """
+    root = Path(root)
+    marker = root / ".complete"
+    if marker.exists():
+        return root
+
+    rng = np.random.default_rng(seed)
+    splits = {"Train": images_per_class, "Test": max(1, images_per_class // 4)}
+
+    for split, count in splits.items():
+        for c in range(num_classes):
+            class_dir = root / split / f"class_{c:02d}"
+            class_dir.mkdir(parents=True, exist_ok=True)
+            for i in range(count):
+                size = int(rng.integers(min_size, max_size + 1))
+                ramp = np.linspace(0, 255, size, dtype=np.float32)
+                base = (ramp[None, :] * 0.5 + ramp[:, None] * 0.5)[..., None]
+                noise = rng.normal(0, 25, (size, size, 3))
+                pixels = np.clip(base + noise + c * 10, 0, 255).astype(np.uint8)
+                Image.fromarray(pixels).save(class_dir / f"img_{i:04d}.jpg", quality=90)
+
+    marker.touch()
+    return root
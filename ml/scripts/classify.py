@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Classify images with a running model server (see scripts/serve.py).
+
+Uses only the standard library, so it starts instantly; the model stays
+warm in the server. Multiple images are sent concurrently so the server
+can batch them.
+
+Usage:
+    python scripts/classify.py image.png
+    python scripts/classify.py scans/*.png --url http://127.0.0.1:8765 --json
+"""
+
+import argparse
+import json
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def classify(url: str, path: str, timeout: float) -> dict:
+    """POST one image file to the server's /predict endpoint"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    request = urllib.request.Request(
+        url.rstrip("/") + "/predict",
+        data=data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classify images with a running model server")
+    parser.add_argument("images", type=str, nargs="+", help="Image files")
+    parser.add_argument("--url", type=str, default="http://127.0.0.1:8765", help="Server URL")
+    parser.add_argument("--top-k", type=int, default=1, help="Predictions to print per image")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Request timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print one JSON record per image")
+
+    args = parser.parse_args()
+
+    def run(path):
+        try:
+            return path, classify(args.url, path, args.timeout)
+        except (OSError, urllib.error.URLError) as e:
+            return path, {"error": str(getattr(e, 'reason', e))}
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        for path, result in pool.map(run, args.images):
+            if "error" in result:
+                failed += 1
+            if args.json:
+                print(json.dumps({"path": path, **result}))
+            elif "error" in result:
+                print(f"{path}: ERROR {result['error']}")
+            else:
+                predictions = ", ".join(
+                    f"{p['label']} ({p['probability']:.3f})"
+                    for p in result["predictions"][:args.top_k]
+                )
+                print(f"{path}: {predictions}")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
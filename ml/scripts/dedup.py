@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Find duplicate and near-duplicate radiographs and train/test leakage.
+
+Every image of the manifest's splits gets a 64-bit perceptual hash
+(computed in a process pool and cached by content hash, so re-runs only
+hash new images). Near-duplicates are pairs within --max-distance bits,
+found with a multi-index Hamming search instead of comparing every pair
+(see data.dedup). The report lists duplicate clusters, images with a copy
+in the other split and clusters whose copies carry different labels.
+
+With --write-manifest a filtered manifest is written: one image per
+(split, class) of each cluster, and no training copies of test images.
+Point data.manifest at it to train and evaluate on the deduplicated set.
+
+Usage:
+    python scripts/dedup.py
+    python scripts/dedup.py --max-distance 6 --report dedup_report.json
+    python scripts/dedup.py --write-manifest datasets/manifest_dedup.json
+    python scripts/dedup.py --write-manifest datasets/manifest_dedup.json --leakage test
+"""
+
+import argparse
+import json
+import sys
+import yaml
+from collections import Counter
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data.dedup import filter_manifest, find_duplicates, update_hashes
+from data.manifest import MANIFEST_VERSION, read_manifest, scan_split, write_manifest
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def load_splits(config: dict, ml_dir: Path, workers: int) -> dict:
+    """The dataset manifest, or one built by scanning the split directories if there is none"""
+    manifest_path = config['data'].get('manifest')
+    if manifest_path and (ml_dir / manifest_path).exists():
+        print(f"Manifest: {ml_dir / manifest_path}")
+        return read_manifest(ml_dir / manifest_path)
+
+    print("No manifest found; scanning the split directories...")
+    manifest = {"version": MANIFEST_VERSION, "splits": {}}
+    for key in ("train_dir", "test_dir"):
+        split_dir = ml_dir / config['data'][key]
+        if not split_dir.exists():
+            print(f"  WARNING: {split_dir} does not exist, skipping")
+            continue
+        manifest["splits"][split_dir.name] = {
+            "root": str(split_dir.resolve()),
+            "files": scan_split(split_dir, workers=workers),
+        }
+    return manifest
+
+
+def print_summary(summary: dict, clusters: list, show: int):
+    print("\n" + "=" * 60)
+    print("DUPLICATES")
+    print("=" * 60)
+    for split, count in summary["images"].items():
+        print(f"{split + ' images:':<22}{count}")
+    print(f"{'Clusters:':<22}{summary['clusters']} ({summary['exact_clusters']} byte-identical)")
+    for split, count in summary["redundant"].items():
+        print(f"{'Redundant ' + split + ':':<22}{count}")
+    print(f"{'Leaked clusters:':<22}{summary['leaked_clusters']} "
+          f"({summary['leaked_test_images']} test images with a training copy)")
+    print(f"{'Label conflicts:':<22}{summary['label_conflicts']}")
+    print("=" * 60)
+
+    if show and clusters:
+        # Leaks and label conflicts first, then the largest clusters
+        ranked = sorted(
+            clusters,
+            key=lambda c: (-(len(c["splits"]) > 1), -(len(c["classes"]) > 1), -len(c["members"])),
+        )
+        print(f"\nTop {min(show, len(ranked))} clusters:")
+        for cluster in ranked[:show]:
+            kind = "exact" if cluster["exact"] else f"<= {cluster['max_distance']} bits"
+            tags = []
+            if len(cluster["splits"]) > 1:
+                tags.append("LEAK")
+            if len(cluster["classes"]) > 1:
+                tags.append("LABEL CONFLICT")
+            print(f"  {len(cluster['members'])} images, {kind}{' [' + ', '.join(tags) + ']' if tags else ''}")
+            for member in cluster["members"][:6]:
+                print(f"    {member['split']}/{member['path']}")
+            if len(cluster["members"]) > 6:
+                print(f"    ... {len(cluster['members']) - 6} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find duplicate images and train/test leakage")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument(
+        "--max-distance",
+        type=int,
+        default=4,
+        help="Largest Hamming distance (of 64 bits) counted as a near-duplicate (0: visually identical)"
+    )
+    parser.add_argument("--workers", type=int, help="Hashing processes (default: every core)")
+    parser.add_argument("--report", type=str, help="Report JSON path (default: <dedup_dir>/report.json)")
+    parser.add_argument("--write-manifest", type=str, help="Write the deduplicated manifest here")
+    parser.add_argument(
+        "--leakage",
+        type=str,
+        default="train",
+        choices=["train", "test"],
+        help="Split that loses its copies of images found in both (default keeps the test set intact)"
+    )
+    parser.add_argument("--show", type=int, default=10, help="Clusters to print")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    dedup_dir = ml_dir / config['data'].get('dedup_dir', 'datasets/dedup')
+
+    manifest = load_splits(config, ml_dir, args.workers or config['data'].get('ingest_workers', 8))
+    entries = [
+        {**entry, "file": str(Path(info["root"]) / entry["path"])}
+        for info in manifest["splits"].values()
+        for entry in info["files"]
+    ]
+    hashes = update_hashes(entries, dedup_dir, workers=args.workers)
+    clusters = find_duplicates(manifest, hashes, max_distance=args.max_distance)
+
+    splits = list(manifest["splits"])
+    train_split = Path(config['data']['train_dir']).name
+    test_split = Path(config['data']['test_dir']).name
+    redundant = Counter()
+    for cluster in clusters:
+        per_split = Counter(member["split"] for member in cluster["members"])
+        for split, count in per_split.items():
+            redundant[split] += count - 1
+    leaked = [c for c in clusters if train_split in c["splits"] and test_split in c["splits"]]
+    summary = {
+        "images": {split: len(manifest["splits"][split]["files"]) for split in splits},
+        "unhashed": len(entries) - sum(entry["sha256"] in hashes for entry in entries),
+        "clusters": len(clusters),
+        "exact_clusters": sum(c["exact"] for c in clusters),
+        "redundant": {split: redundant[split] for split in splits},
+        "leaked_clusters": len(leaked),
+        "leaked_test_images": sum(m["split"] == test_split for c in leaked for m in c["members"]),
+        "label_conflicts": sum(len(c["classes"]) > 1 for c in clusters),
+    }
+    print_summary(summary, clusters, args.show)
+
+    report = {"max_distance": args.max_distance, "summary": summary, "clusters": clusters}
+    if args.write_manifest:
+        filtered, removed = filter_manifest(
+            manifest, clusters, leakage=args.leakage, train_split=train_split, test_split=test_split
+        )
+        filtered["dedup"] = {"max_distance": args.max_distance, "leakage": args.leakage, "removed": len(removed)}
+        write_manifest(args.write_manifest, filtered)
+        report["removed"] = [{"split": m["split"], "path": m["path"]} for m in removed]
+        counts = Counter(m["split"] for m in removed)
+        print(f"\nFiltered manifest written to: {args.write_manifest}")
+        print("  Removed: " + ", ".join(f"{counts[split]} {split}" for split in splits))
+        print(f"  Use it with data.manifest: \"{args.write_manifest}\"")
+
+    report_path = Path(args.report) if args.report else dedup_dir / "report.json"
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Report saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,17 @@ Download pacemaker training data from Kaggle.
 This script downloads the dataset specified in the config file and
 organizes it into the expected directory structure.
 
+Re-running is incremental: files whose size and mtime already match are
+skipped, and content hashes are only recomputed for new or changed files.
+
+Afterwards each split is also written as a pre-resized JPEG copy (shorter
+side data.resize_short_side) that the data loaders pick up automatically;
+again only new or changed images are re-encoded.
+
 Usage:
     python scripts/download_data.py --config configs/base.yaml
+    python scripts/download_data.py --config configs/base.yaml --workers 16 --link
+    python scripts/download_data.py --config configs/base.yaml --resize-only
 
 Requirements:
     - Kaggle API credentials set up (~/.kaggle/kaggle.json)
@@ -14,10 +23,18 @@ Requirements:
 """
 
 import argparse
+import os
+import sys
 import yaml
 import shutil
-import kagglehub
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data.manifest import MANIFEST_VERSION, read_manifest, scan_split, write_manifest
+from data.resized import build_resized_variant, resized_root_for
 
 
 def load_config(config_path: str) -> dict:
@@ -27,13 +44,109 @@ def load_config(config_path: str) -> dict:
     return config
 
 
-def download_and_setup(config: dict, ml_dir: Path):
+def _sync_file(src: Path, dst: Path, link: bool) -> bool:
+    """Copy or hardlink one file unless dst already matches; returns True if written"""
+    src_stat = src.stat()
+    try:
+        dst_stat = dst.stat()
+        if dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+            return False
+        dst.unlink()
+    except FileNotFoundError:
+        pass
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if link:
+        try:
+            os.link(src, dst)
+            return True
+        except OSError:
+            pass  # Cross-device or unsupported: fall back to copying
+    shutil.copy2(src, dst)  # copy2 keeps mtime so the next run can skip it
+    return True
+
+
+def sync_tree(src_root: Path, dst_root: Path, workers: int = 8, link: bool = False) -> dict:
+    """
+    Mirror src_root into dst_root with a thread pool.
+
+    Files whose size and mtime already match are skipped; files no longer in
+    src_root are removed from dst_root.
+
+    Args:
+        src_root: Source directory
+        dst_root: Destination directory
+        workers: Number of copy threads
+        link: Hardlink instead of copying where the filesystem allows it
+
+    Returns:
+        Dict with 'written', 'skipped' and 'removed' file counts
+    """
+    sources = [Path(dirpath) / name for dirpath, _, names in os.walk(src_root) for name in names]
+    rel_paths = {src.relative_to(src_root) for src in sources}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        written = sum(pool.map(
+            lambda src: _sync_file(src, dst_root / src.relative_to(src_root), link),
+            sources,
+        ))
+
+    removed = 0
+    if dst_root.exists():
+        for dirpath, _, names in os.walk(dst_root):
+            for name in names:
+                dst = Path(dirpath) / name
+                if dst.relative_to(dst_root) not in rel_paths:
+                    dst.unlink()
+                    removed += 1
+
+    return {"written": written, "skipped": len(sources) - written, "removed": removed}
+
+
+def resize_dataset(config: dict, ml_dir: Path, workers: int = None, manifest: dict = None):
+    """
+    Write the pre-resized variant of the train and test splits.
+
+    Args:
+        config: Configuration dictionary
+        ml_dir: Path to ml/ directory
+        workers: Encoder processes (None uses every core)
+        manifest: Manifest of the splits, used instead of walking them
+    """
+    short_side = config['data'].get('resize_short_side')
+    resized_dir = config['data'].get('resized_dir')
+    if not short_side or not resized_dir:
+        return
+    quality = config['data'].get('resize_quality', 90)
+
+    print(f"\nWriting resized variants (short side {short_side}, JPEG q{quality})...")
+    for key in ("train_dir", "test_dir"):
+        split_dir = ml_dir / config['data'][key]
+        if not split_dir.exists():
+            print(f"  WARNING: {split_dir} does not exist, skipping")
+            continue
+        entries = None
+        if manifest is not None:
+            entries = manifest["splits"].get(split_dir.name, {}).get("files")
+        dst = resized_root_for(split_dir, ml_dir / resized_dir, short_side)
+        stats = build_resized_variant(
+            split_dir, dst, short_side=short_side, quality=quality, workers=workers, entries=entries
+        )
+        print(
+            f"  {split_dir.name}: {stats['written']} written, {stats['skipped']} unchanged, "
+            f"{stats['removed']} removed, {stats['failed']} failed -> {dst}"
+        )
+
+
+def download_and_setup(config: dict, ml_dir: Path, workers: int = 8, link: bool = False):
     """
     Download Kaggle dataset and set up directory structure.
 
     Args:
         config: Configuration dictionary
         ml_dir: Path to ml/ directory
+        workers: Threads used to copy/link and hash files
+        link: Hardlink files from the Kaggle cache instead of copying them
     """
     kaggle_dataset = config['data']['kaggle_dataset']
     raw_dir = ml_dir / config['data']['raw_dir']
@@ -54,6 +167,8 @@ def download_and_setup(config: dict, ml_dir: Path):
     print("(This may take a few minutes...)\n")
 
     try:
+        import kagglehub
+
         download_path = kagglehub.dataset_download(kaggle_dataset)
         print(f"\nDataset downloaded to: {download_path}\n")
     except Exception as e:
@@ -76,18 +191,28 @@ def download_and_setup(config: dict, ml_dir: Path):
     download_path = Path(download_path)
 
     # The Kaggle download contains Train/ and Test/ subdirectories
-    # Copy them to our raw directory
-    if (download_path / "Train").exists():
-        print(f"  Copying Train data...")
-        if (raw_dir / "Train").exists():
-            shutil.rmtree(raw_dir / "Train")
-        shutil.copytree(download_path / "Train", raw_dir / "Train")
-
-    if (download_path / "Test").exists():
-        print(f"  Copying Test data...")
-        if (raw_dir / "Test").exists():
-            shutil.rmtree(raw_dir / "Test")
-        shutil.copytree(download_path / "Test", raw_dir / "Test")
+    # Mirror them into our raw directory (only new or changed files are written)
+    splits = [split for split in ("Train", "Test") if (download_path / split).exists()]
+    for split in splits:
+        print(f"  {'Linking' if link else 'Copying'} {split} data...")
+        stats = sync_tree(download_path / split, raw_dir / split, workers=workers, link=link)
+        print(
+            f"    {stats['written']} written, {stats['skipped']} unchanged, "
+            f"{stats['removed']} removed"
+        )
+
+    # Record path, class, size and content hash of every file
+    manifest_path = ml_dir / config['data'].get('manifest', 'datasets/manifest.json')
+    print(f"\nWriting manifest to {manifest_path}...")
+    previous = read_manifest(manifest_path)
+    manifest = {"version": MANIFEST_VERSION, "splits": {}}
+    for split in splits:
+        old_files = previous["splits"].get(split, {}).get("files")
+        manifest["splits"][split] = {
+            "root": str((raw_dir / split).resolve()),
+            "files": scan_split(raw_dir / split, previous=old_files, workers=workers),
+        }
+    write_manifest(manifest_path, manifest)
 
     # Create processed directories (symlink or copy from raw)
     print("\nSetting up processed dataset directories...")
@@ -106,10 +231,14 @@ def download_and_setup(config: dict, ml_dir: Path):
     print(f"  Train -> {raw_dir / 'Train'}")
     print(f"  Test  -> {raw_dir / 'Test'}")
 
-    # Count files
-    train_count = len(list((raw_dir / "Train").rglob("*.*")))
-    test_count = len(list((raw_dir / "Test").rglob("*.*")))
-    num_classes = len(list((raw_dir / "Train").iterdir()))
+    resize_dataset(config, ml_dir, manifest=manifest)
+
+    # Count files from the manifest instead of walking the tree again
+    train_files = manifest["splits"].get("Train", {}).get("files", [])
+    test_files = manifest["splits"].get("Test", {}).get("files", [])
+    train_count = len(train_files)
+    test_count = len(test_files)
+    num_classes = len({entry["class"] for entry in train_files})
 
     print("\n" + "="*60)
     print("DATASET READY!")
@@ -134,6 +263,17 @@ def main():
         default="configs/base.yaml",
         help="Path to config file"
     )
+    parser.add_argument("--workers", type=int, help="Copy/hash threads (overrides config)")
+    parser.add_argument(
+        "--link",
+        action="store_true",
+        help="Hardlink files from the Kaggle cache instead of copying"
+    )
+    parser.add_argument(
+        "--resize-only",
+        action="store_true",
+        help="Only (re)build the resized variants of the existing dataset"
+    )
     args = parser.parse_args()
 
     # Load config
@@ -142,8 +282,18 @@ def main():
     # Get ml/ directory (parent of scripts/)
     ml_dir = Path(__file__).parent.parent
 
+    if args.resize_only:
+        manifest = config['data'].get('manifest')
+        if manifest and (ml_dir / manifest).exists():
+            manifest = read_manifest(ml_dir / manifest)
+        else:
+            manifest = None
+        resize_dataset(config, ml_dir, manifest=manifest)
+        return
+
     # Download and set up data
-    success = download_and_setup(config, ml_dir)
+    workers = args.workers or config['data'].get('ingest_workers', 8)
+    success = download_and_setup(config, ml_dir, workers=workers, link=args.link)
 
     if not success:
         exit(1)
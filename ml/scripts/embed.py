@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Embed labelled radiographs and build a nearest-neighbour index over them.
+
+Runs a trained classifier over whole ImageFolder splits and stores each
+image's penultimate-layer features (the input of the classification head,
+L2-normalized) as float16, then builds an exact or IVF index for cosine
+top-k search (see inference.embeddings and inference.vector_index). The
+store is reused while the checkpoint and the images are unchanged.
+
+scripts/predict.py --neighbors <store> then lists the most similar
+labelled radiographs next to each prediction, which helps with rare or
+unknown devices the classifier is unsure about.
+
+Usage:
+    python scripts/embed.py --checkpoint output/best.pt
+    python scripts/embed.py --checkpoint output/best.pt --split train test --index ivf --nprobe 16
+    python scripts/embed.py --checkpoint output/best.pt --image-dir /archive/labelled --output-dir datasets/embeddings/archive
+"""
+
+import argparse
+import os
+import sys
+import time
+import yaml
+import numpy as np
+import torch
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data import create_eval_loader
+from inference import EmbeddingModel, EmbeddingStore, build_embedding_store, build_index, load_model
+from inference.vector_index import ANN_FILE, FLAT_MAX_VECTORS, FlatIndex, save_index
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def check_index(store: EmbeddingStore, index, k: int, queries: int = 200) -> dict:
+    """Single-query latency of the index and, for an IVF index, its recall@k against exact search"""
+    generator = torch.Generator().manual_seed(0)
+    rows = torch.randperm(len(store), generator=generator)[:queries]
+    query_vectors = store.tensor()[rows].to(index.vectors.dtype)
+
+    index.search(query_vectors[:1], k)  # warm-up
+    latencies = []
+    results = []
+    for query in query_vectors:
+        start = time.perf_counter()
+        _, ids = index.search(query[None], k)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    stats = {
+        "query_ms_p50": float(np.percentile(latencies, 50) * 1000),
+        "query_ms_p99": float(np.percentile(latencies, 99) * 1000),
+    }
+
+    if index.kind != "flat":
+        exact = FlatIndex(index.vectors, index.device)
+        _, true_ids = exact.search(query_vectors, k)
+        hits = sum(len(set(found.tolist()) & set(true.tolist())) for found, true in zip(results, true_ids))
+        stats["recall_at_k"] = hits / true_ids.numel()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an embedding store and nearest-neighbour index")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    parser.add_argument(
+        "--split",
+        type=str,
+        nargs="+",
+        default=["train"],
+        choices=["train", "test"],
+        help="Config splits to embed (default: train)"
+    )
+    parser.add_argument("--image-dir", type=str, nargs="+", help="ImageFolder directories to embed instead of splits")
+    parser.add_argument("--output-dir", type=str, help="Store directory (default: <data.embedding_dir>/<architecture>)")
+    parser.add_argument(
+        "--index",
+        type=str,
+        default="auto",
+        choices=["auto", "flat", "ivf", "none"],
+        help=f"Nearest-neighbour index (auto: exact up to {FLAT_MAX_VECTORS} images, IVF above)"
+    )
+    parser.add_argument("--nlist", type=int, help="IVF lists (default: 2 * sqrt(N))")
+    parser.add_argument("--nprobe", type=int, default=8, help="IVF lists searched per query")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours used for the latency/recall check")
+    parser.add_argument("--batch-size", type=int, help="Batch size (default: data.batch_size)")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Device (default: training.device)")
+    parser.add_argument("--precision", type=str, choices=["fp32", "bf16", "fp16"], help="Forward pass precision")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch default)")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    architecture = args.architecture or config['model']['architecture']
+    img_size = config['data']['img_size']
+    output_dir = Path(args.output_dir) if args.output_dir else (
+        ml_dir / config['data'].get('embedding_dir', 'datasets/embeddings') / architecture
+    )
+
+    device = args.device or config['training']['device']
+    if device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        device = "cpu"
+    precision = args.precision or config['training'].get('precision', 'fp32')
+    if precision == "fp16" and device != "cuda":
+        print("WARNING: fp16 autocast requires CUDA. Using bf16 on CPU.")
+        precision = "bf16"
+    channels_last = config['training'].get('channels_last', False)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    if args.image_dir:
+        image_dirs = {Path(d).name: Path(d) for d in args.image_dir}
+    else:
+        image_dirs = {split: ml_dir / config['data'][f'{split}_dir'] for split in args.split}
+    for image_dir in image_dirs.values():
+        if not image_dir.exists():
+            print(f"\nERROR: Image directory does not exist: {image_dir}\n")
+            exit(1)
+
+    manifest = config['data'].get('manifest')
+    manifest = str(ml_dir / manifest) if manifest and (ml_dir / manifest).exists() and not args.image_dir else None
+    cache_dir = config['data'].get('cache_dir')
+    resized_dir = config['data'].get('resized_dir')
+
+    # Sequential batching: rows of the store follow each dataset's sample order
+    loaders = {
+        split: create_eval_loader(
+            image_dir=str(image_dir),
+            batch_size=args.batch_size or config['data']['batch_size'],
+            img_size=img_size,
+            num_workers=config['data']['num_workers'],
+            cache_dir=str(ml_dir / cache_dir) if cache_dir else None,
+            cache_size=config['data'].get('cache_size'),
+            manifest=manifest,
+            resized_dir=str(ml_dir / resized_dir) if resized_dir else None,
+        )
+        for split, image_dir in image_dirs.items()
+    }
+
+    model = load_model(args.checkpoint, architecture, device=device, channels_last=channels_last)
+    model = EmbeddingModel(model, architecture)
+
+    stat = os.stat(args.checkpoint)
+    key = {
+        "weights": {"path": str(Path(args.checkpoint).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "architecture": architecture,
+        "img_size": img_size,
+        "precision": precision,
+    }
+
+    print("=" * 60)
+    print("EMBEDDING STORE")
+    print("=" * 60)
+    print(f"Checkpoint:   {args.checkpoint}")
+    print(f"Architecture: {architecture} ({model.dim}-d embeddings)")
+    for split, loader in loaders.items():
+        print(f"{split + ':':<14}{len(loader.dataset)} images from {image_dirs[split]}")
+    print(f"Store:        {output_dir}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    build_embedding_store(model, loaders, output_dir, key, device=device, precision=precision, channels_last=channels_last)
+    store = EmbeddingStore(output_dir)
+    print(f"Embeddings ready in {time.perf_counter() - start:.1f} s ({len(store)} x {store.dim} float16)")
+
+    if args.index == "none":
+        return
+
+    print(f"\nBuilding {args.index} index...")
+    start = time.perf_counter()
+    index = build_index(store.tensor(), args.index, nlist=args.nlist, nprobe=args.nprobe)
+    save_index(index, output_dir / ANN_FILE)
+    print(f"  {index.kind} index over {len(index)} vectors built in {time.perf_counter() - start:.1f} s")
+
+    stats = check_index(store, index, args.k)
+    line = f"  Single query (k={args.k}): p50 {stats['query_ms_p50']:.2f} ms | p99 {stats['query_ms_p99']:.2f} ms"
+    if "recall_at_k" in stats:
+        line += f" | recall@{args.k} {stats['recall_at_k']:.3f} (nprobe {index.nprobe})"
+    print(line)
+    print(f"\nQuery with: python scripts/predict.py --checkpoint {args.checkpoint} "
+          f"--input <images> --output preds.jsonl --neighbors {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
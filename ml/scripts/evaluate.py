@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Evaluate a trained checkpoint on an image split with a per-class report.
+
+Reports accuracy, top-k accuracy, balanced accuracy, macro F1, per-class
+recall/precision/F1 and the most frequent confusions. Metrics are
+accumulated batch by batch on the device (a confusion matrix and a few
+counters), so memory stays constant however large the split is.
+
+With --tta the split is evaluated once per number of test-time views K
+(flips, center/corner crops, small rotations; see inference.tta), each
+image's K views going through the model as one batch with the logits
+averaged. A table compares accuracy against cost per K; the per-class
+report is for the last K.
+
+Usage:
+    python scripts/evaluate.py --checkpoint output/best.pt
+    python scripts/evaluate.py --checkpoint output/best.pt --split train --top-k 3 5 10 --output train_report.json
+    python scripts/evaluate.py --checkpoint output/best.pt --image-dir datasets/Holdout --device cuda --precision bf16
+    python scripts/evaluate.py --checkpoint output/best.pt --tta 1 2 5 9
+"""
+
+import argparse
+import sys
+import time
+import yaml
+import torch
+import torch.nn as nn
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data import create_eval_loader
+from inference import TTAModel, get_tta_transforms, load_model
+from inference.tta import TTA_VIEWS, tta_base_size, tta_views
+from models.classifier import get_head
+from models.quantization import measure_latency
+from training.trainer import autocast
+from training import create_evaluator
+from training.metrics import classification_report, print_classification_report, write_report
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def print_tta_table(rows: list):
+    """Print accuracy against cost for each number of TTA views"""
+    top_k = [key for key in rows[0] if key.startswith("top")]
+    print("\n" + "=" * 72)
+    print("TEST-TIME AUGMENTATION (views per image: accuracy vs. cost)")
+    print("=" * 72)
+    header = f"{'K':>3} {'accuracy':>9}" + "".join(f" {key:>7}" for key in top_k)
+    print(header + f" {'bal.acc':>8} {'ms/img':>8} {'batch ms':>9} {'cost':>6}")
+    for row in rows:
+        print(
+            f"{row['views']:>3} {row['accuracy']:>9.3f}"
+            + "".join(f" {row[key]:>7.3f}" for key in top_k)
+            + f" {row['balanced_accuracy']:>8.3f} {row['ms_per_image']:>8.2f}"
+            f" {row['batch_latency_ms']:>9.1f} {row['relative_cost']:>5.2f}x"
+        )
+    print("\nViews added in order: " + ", ".join(TTA_VIEWS[:rows[-1]['views']]))
+    print("ms/img is end-to-end (decode included); batch ms is the median forward latency of one batch")
+    print("=" * 72)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a trained model with per-class metrics")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    parser.add_argument("--split", type=str, default="test", choices=["test", "train"], help="Config split to evaluate")
+    parser.add_argument("--image-dir", type=str, help="ImageFolder directory to evaluate instead of a split")
+    parser.add_argument("--batch-size", type=int, help="Batch size (default: data.batch_size)")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Device (default: training.device)")
+    parser.add_argument("--precision", type=str, choices=["fp32", "bf16", "fp16"], help="Forward pass precision")
+    parser.add_argument("--top-k", type=int, nargs="+", help="k values for top-k accuracy (default: training.top_k)")
+    parser.add_argument("--worst", type=int, help="Only print the N classes with the lowest recall")
+    parser.add_argument("--output", type=str, help="Report JSON (default: eval_<split>.json next to the checkpoint)")
+    parser.add_argument(
+        "--tta",
+        type=int,
+        nargs="+",
+        help=f"Evaluate with K test-time views per image, for each K given (1-{len(TTA_VIEWS)})"
+    )
+    parser.add_argument("--crop-fraction", type=float, default=0.875, help="Fraction of the image each TTA crop covers")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    architecture = args.architecture or config['model']['architecture']
+    image_dir = Path(args.image_dir) if args.image_dir else ml_dir / config['data'][f'{args.split}_dir']
+    if not image_dir.exists():
+        print(f"\nERROR: Image directory does not exist: {image_dir}\n")
+        exit(1)
+
+    device = args.device or config['training']['device']
+    if device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        device = "cpu"
+    precision = args.precision or config['training'].get('precision', 'fp32')
+    if precision == "fp16" and device != "cuda":
+        print("WARNING: fp16 autocast requires CUDA. Using bf16 on CPU.")
+        precision = "bf16"
+    channels_last = config['training'].get('channels_last', False)
+    top_k = args.top_k or config['training'].get('top_k', [3, 5])
+    img_size = config['data']['img_size']
+    if args.tta:
+        for k in args.tta:
+            tta_views(k)
+        load_size = tta_base_size(img_size, args.crop_fraction)
+        transform = get_tta_transforms(img_size, args.crop_fraction)
+    else:
+        load_size, transform = img_size, None
+
+    manifest = config['data'].get('manifest')
+    manifest = str(ml_dir / manifest) if manifest and (ml_dir / manifest).exists() and not args.image_dir else None
+    cache_dir = config['data'].get('cache_dir')
+    resized_dir = config['data'].get('resized_dir')
+    index_dir = config['data'].get('index_dir')
+
+    loader = create_eval_loader(
+        image_dir=str(image_dir),
+        batch_size=args.batch_size or config['data']['batch_size'],
+        img_size=load_size,
+        num_workers=config['data']['num_workers'],
+        cache_dir=str(ml_dir / cache_dir) if cache_dir else None,
+        cache_size=config['data'].get('cache_size'),
+        manifest=manifest,
+        resized_dir=str(ml_dir / resized_dir) if resized_dir else None,
+        eval_batching=config['data'].get('eval_batching', 'sequential'),
+        index_dir=str(ml_dir / index_dir) if index_dir else None,
+        transform=transform,
+    )
+    class_names = loader.dataset.classes
+
+    model = load_model(args.checkpoint, architecture, device=device, channels_last=channels_last)
+    num_classes = get_head(model, architecture).out_features
+    if num_classes != len(class_names):
+        print(f"\nERROR: {args.checkpoint} has {num_classes} outputs but {image_dir} has {len(class_names)} classes\n")
+        exit(1)
+
+    def evaluate(eval_model: nn.Module):
+        evaluator = create_evaluator(
+            eval_model,
+            nn.CrossEntropyLoss(),
+            device,
+            precision=precision,
+            channels_last=channels_last,
+            num_classes=len(class_names),
+            top_k=top_k,
+        )
+        start = time.perf_counter()
+        evaluator.run(loader)
+        return evaluator.state.metrics, time.perf_counter() - start
+
+    print(f"Evaluating {args.checkpoint} on {len(loader.dataset)} images from {image_dir}...")
+    if not args.tta:
+        metrics, elapsed = evaluate(model)
+        report = classification_report(metrics, class_names)
+    else:
+        sample = next(iter(loader))[0].to(device)
+        if channels_last:
+            sample = sample.contiguous(memory_format=torch.channels_last)
+
+        rows = []
+        elapsed = 0.0
+        for k in args.tta:
+            tta_model = TTAModel(model, k, img_size, channels_last=channels_last)
+            print(f"  K={k}: {', '.join(tta_model.views)}")
+            metrics, seconds = evaluate(tta_model)
+            with autocast(device, precision):
+                batch_ms = measure_latency(tta_model, sample, runs=5, warmup=1)
+            report = classification_report(metrics, class_names)
+            elapsed += seconds
+            rows.append({
+                "views": k,
+                "accuracy": report["accuracy"],
+                **{key: report[key] for key in report if key.startswith("top") and key[3:].isdigit()},
+                "balanced_accuracy": report["balanced_accuracy"],
+                "ms_per_image": round(seconds * 1000 / len(loader.dataset), 3),
+                "batch_latency_ms": round(batch_ms, 2),
+            })
+        for row in rows:
+            row["relative_cost"] = round(row["batch_latency_ms"] / rows[0]["batch_latency_ms"], 2)
+        report["tta"] = {"crop_fraction": args.crop_fraction, "batch_size": len(sample), "results": rows}
+
+    report.update({
+        "checkpoint": str(args.checkpoint),
+        "architecture": architecture,
+        "image_dir": str(image_dir),
+        "seconds": round(elapsed, 2),
+    })
+    print_classification_report(report, worst=args.worst)
+    if args.tta:
+        print_tta_table(report["tta"]["results"])
+
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        name = image_dir.name if args.image_dir else args.split
+        output_path = Path(args.checkpoint).parent / f"eval_{name}.json"
+    write_report(report, output_path)
+    print(f"\nReport written to: {output_path} ({elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,30 +5,61 @@
 #   "torch>=2.0.0",
 #   "torchvision>=0.15.0",
 #   "coremltools>=7.0",
+#   "scikit-learn>=1.1",
 #   "pyyaml>=6.0",
+#   "onnx>=1.14",
+#   "onnxruntime>=1.16",
 # ]
 # ///
 """
-Export trained PyTorch model to CoreML format for iOS integration.
+Export trained PyTorch model to CoreML format for iOS integration, plus
+TorchScript/ONNX artifacts for server-side use.
+
+Every artifact takes RGB images scaled to [0, 1] with ImageNet normalization
+baked in. Input shapes can be fixed ("224"), enumerated ("192,224,256") or
+ranged ("1-16") per dimension. Before finishing, the exported artifacts are
+run on sample test images and compared against the PyTorch model; the export
+fails if any disagrees by more than the tolerance. CoreML models can only be
+run on macOS, so on Linux they are converted and saved but not checked.
 
 Usage:
     python scripts/export.py --model output/PacemakerClassifier_final.pt --config configs/base.yaml
     python scripts/export.py --checkpoint output/checkpoint_latest.pt --architecture densenet121
+    python scripts/export.py --checkpoint output/checkpoint_latest.pt --compress palettize6
+    python scripts/export.py --checkpoint output/best.pt --formats coreml torchscript onnx \\
+        --batch 1-16 --image-size 224,256 --precision fp32 --compute-units cpu_and_ne
 """
 
 import argparse
+import json
 import os
 import sys
 import yaml
 import torch
 import torch.nn as nn
-import coremltools as ct
+from PIL import Image
 from pathlib import Path
 
 # Add ml/src to path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+from data.dataset import get_inference_transforms, list_images
 from models import create_model
+from models.export import (
+    EXPORT_FORMATS,
+    InputDim,
+    compare_outputs,
+    describe_dim,
+    dim_checkpoints,
+    dim_default,
+    export_onnx,
+    export_torchscript,
+    is_fixed,
+    onnx_runtime,
+    parse_dim,
+)
+from models.pruning import match_state_dict
+from models.quantization import measure_latency
 
 
 class NormalizedWrapper(nn.Module):
@@ -52,10 +83,88 @@ class NormalizedWrapper(nn.Module):
         return self.model(x)
 
 
+# Weight compression options for the converted CoreML model
+WEIGHT_COMPRESSION = ("int8", "palettize8", "palettize6", "palettize4")
+
+# CoreML compute precision and the hardware the model may be scheduled on
+COMPUTE_PRECISION = ("fp16", "fp32")
+COMPUTE_UNITS = ("all", "cpu_only", "cpu_and_gpu", "cpu_and_ne")
+
+
+def path_size_mb(path: str) -> float:
+    """Size of a file, or of all files in a directory such as an .mlpackage, in MB"""
+    path = Path(path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / (1024 * 1024)
+    return path.stat().st_size / (1024 * 1024)
+
+
+def compress_weights(mlmodel, method: str):
+    """
+    Compress the weights of a converted ML program.
+
+    'int8' stores weights as symmetric per-channel int8 (weight-only, compute
+    stays fp16/fp32). 'palettizeN' clusters each weight tensor into 2^N
+    k-means centroids and stores N-bit indices.
+
+    Args:
+        mlmodel: Converted CoreML model (ML program)
+        method: One of WEIGHT_COMPRESSION
+
+    Returns:
+        Compressed CoreML model
+    """
+    from coremltools.optimize.coreml import (
+        OpLinearQuantizerConfig,
+        OpPalettizerConfig,
+        OptimizationConfig,
+        linear_quantize_weights,
+        palettize_weights,
+    )
+
+    if method == "int8":
+        config = OptimizationConfig(
+            global_config=OpLinearQuantizerConfig(mode="linear_symmetric", dtype="int8")
+        )
+        return linear_quantize_weights(mlmodel, config=config)
+    if method.startswith("palettize") and method in WEIGHT_COMPRESSION:
+        nbits = int(method[len("palettize"):])
+        config = OptimizationConfig(global_config=OpPalettizerConfig(mode="kmeans", nbits=nbits))
+        return palettize_weights(mlmodel, config=config)
+    raise ValueError(f"Unsupported weight compression: {method}")
+
+
+def coreml_input(ct, batch: InputDim, image_size: InputDim):
+    """
+    CoreML image input for the given batch and image size dimensions.
+
+    All-enumerated dimensions become EnumeratedShapes of every (batch, size)
+    combination; if either is a range, each dimension becomes a RangeDim
+    (enumerated sizes are widened to their min-max range).
+    """
+    if isinstance(batch, list) and isinstance(image_size, list):
+        shapes = [(b, 3, size, size) for b in batch for size in image_size]
+        if len(shapes) == 1:
+            return ct.ImageType(name="image", shape=shapes[0])
+        return ct.ImageType(name="image", shape=ct.EnumeratedShapes(shapes=shapes, default=shapes[0]))
+
+    def dim(d):
+        if is_fixed(d):
+            return d[0]
+        return ct.RangeDim(lower_bound=min(d), upper_bound=max(d), default=dim_default(d))
+
+    return ct.ImageType(name="image", shape=ct.Shape(shape=(dim(batch), 3, dim(image_size), dim(image_size))))
+
+
 def export_to_coreml(
     model: torch.nn.Module,
     output_path: str,
     class_labels: list = None,
+    weight_compression: str = None,
+    batch: InputDim = None,
+    image_size: InputDim = None,
+    compute_precision: str = "fp16",
+    compute_units: str = "all",
 ):
     """
     Export PyTorch model to CoreML format.
@@ -64,7 +173,24 @@ def export_to_coreml(
         model: Trained PyTorch model
         output_path: Path to save .mlpackage file
         class_labels: List of class labels (optional)
+        weight_compression: Optional weight compression ('int8', 'palettize8',
+            'palettize6' or 'palettize4')
+        batch: Batch size dimension (see models.export.parse_dim; default 1)
+        image_size: Square image size dimension (default 224)
+        compute_precision: 'fp16' or 'fp32' ML program compute precision
+        compute_units: Hardware CoreML may use: 'all', 'cpu_only',
+            'cpu_and_gpu' or 'cpu_and_ne'
+
+    Returns:
+        The saved CoreML model
     """
+    # Imported here: coremltools takes seconds to load and quantize.py only
+    # needs it when CoreML variants are requested
+    import coremltools as ct
+
+    batch = batch or [1]
+    image_size = image_size or [224]
+
     print("\nExporting to CoreML...")
 
     # Wrap with ImageNet normalization so CoreML receives properly normalized inputs.
@@ -74,29 +200,176 @@ def export_to_coreml(
     wrapped.eval()
 
     # Example input in [0, 1] range (what CoreML ImageType provides after /255 conversion)
-    example_input = torch.rand(1, 3, 224, 224)
+    example_input = torch.rand(dim_default(batch), 3, dim_default(image_size), dim_default(image_size))
 
     # Trace the wrapped model
     print("  Tracing model with normalization wrapper...")
     traced_model = torch.jit.trace(wrapped, example_input)
 
+    # A classifier model predicts one label per call, so it needs a fixed batch of one;
+    # otherwise the model outputs logits and the labels are stored in the metadata
+    classify = bool(class_labels) and batch == [1]
+
     # Convert to CoreML
-    print("  Converting to CoreML format...")
+    print(f"  Converting to CoreML format ({compute_precision}, compute units: {compute_units})...")
     mlmodel = ct.convert(
         traced_model,
-        inputs=[ct.ImageType(name="image", shape=(1, 3, 224, 224))],
-        classifier_config=ct.ClassifierConfig(class_labels) if class_labels else None,
+        inputs=[coreml_input(ct, batch, image_size)],
+        classifier_config=ct.ClassifierConfig(class_labels) if classify else None,
+        convert_to="mlprogram",
+        compute_precision=ct.precision.FLOAT16 if compute_precision == "fp16" else ct.precision.FLOAT32,
+        compute_units=getattr(ct.ComputeUnit, compute_units.upper()),
     )
 
+    if weight_compression:
+        print(f"  Compressing weights ({weight_compression})...")
+        mlmodel = compress_weights(mlmodel, weight_compression)
+
     # Add metadata
     mlmodel.author = "PacerID ML Pipeline"
     mlmodel.short_description = "Pacemaker image classifier"
     mlmodel.license = "Proprietary"
+    if class_labels and not classify:
+        mlmodel.user_defined_metadata["classes"] = json.dumps(class_labels)
 
     # Save
     mlmodel.save(output_path)
     print(f"\nCoreML model saved to: {output_path}")
-    print(f"  Model size: {Path(output_path).stat().st_size / (1024*1024):.2f} MB")
+    print(f"  Model size: {path_size_mb(output_path):.2f} MB")
+    return mlmodel
+
+
+def coreml_runtime(mlmodel, class_labels: list = None):
+    """
+    Run a CoreML model on batches of [0, 1] image tensors, one image per call.
+
+    Only available on macOS, where CoreML can execute models.
+
+    Returns:
+        Function mapping an input batch to logits (log-probabilities for
+        classifier models, which output probabilities)
+    """
+    from torchvision.transforms.functional import to_pil_image
+
+    spec = mlmodel.get_spec()
+    probabilities_name = spec.description.predictedProbabilitiesName
+    output_name = spec.description.output[0].name
+
+    def run(x: torch.Tensor) -> torch.Tensor:
+        rows = []
+        for image in x:
+            out = mlmodel.predict({"image": to_pil_image(image)})
+            if probabilities_name:
+                probs = torch.tensor([out[probabilities_name][label] for label in class_labels])
+                rows.append(probs.clamp(min=1e-12).log())
+            else:
+                rows.append(torch.as_tensor(out[output_name]).reshape(-1))
+        return torch.stack(rows)
+
+    return run
+
+
+def load_parity_images(image_dir: Path, count: int, size: int) -> torch.Tensor:
+    """
+    Up to `count` test images, spread over the sorted file list (and so over
+    classes), resized and center-cropped to `size` and scaled to [0, 1].
+    """
+    paths = list_images([str(image_dir)]) if image_dir is not None and image_dir.exists() else []
+    if not paths:
+        print("  WARNING: no test images found, checking parity on random inputs")
+        return torch.rand(count, 3, size, size)
+
+    step = max(1, len(paths) // count)
+    transform = get_inference_transforms(size, mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0))
+    images = []
+    for path in paths[::step][:count]:
+        with Image.open(path) as img:
+            images.append(transform(img.convert("RGB")))
+    return torch.stack(images)
+
+
+def check_parity(
+    wrapped: nn.Module,
+    runtimes: dict,
+    batch: InputDim,
+    image_size: InputDim,
+    image_dir: Path,
+    num_images: int,
+    tolerances: dict,
+) -> dict:
+    """
+    Compare every exported runtime with the PyTorch model on sample images.
+
+    Runs at every enumerated image size (or both ends of a range), in
+    batches of the largest allowed batch size, and times each runtime at
+    the default input shape.
+
+    Args:
+        wrapped: NormalizedWrapper around the PyTorch model
+        runtimes: {artifact name: function from input batch to outputs};
+            a string value is the reason the artifact can't be run here
+        batch: Batch size dimension
+        image_size: Image size dimension
+        image_dir: Directory of sample images (e.g. the test split)
+        num_images: Sample images per image size
+        tolerances: {artifact name: max allowed probability difference}
+
+    Returns:
+        {artifact name: {"max_abs_diff", "top1_agreement", "latency_ms",
+        "status"}}, including a "pytorch" reference row
+    """
+    if isinstance(batch, tuple):
+        batch_size = max(batch[0], min(batch[1], num_images))
+    else:
+        batch_size = max([b for b in batch if b <= num_images] or [min(batch)])
+
+    results = {name: {"status": runtime} for name, runtime in runtimes.items() if isinstance(runtime, str)}
+    runnable = {name: runtime for name, runtime in runtimes.items() if not isinstance(runtime, str)}
+    for name in runnable:
+        results[name] = {"max_abs_diff": 0.0, "top1_agreement": [], "status": "ok"}
+
+    for size in dim_checkpoints(image_size):
+        images = load_parity_images(image_dir, max(num_images, batch_size), size)
+        if len(images) < batch_size:
+            # Fixed-batch exports need full batches; pad a small split with random inputs
+            print(f"  WARNING: only {len(images)} test images, padding to {batch_size} with random inputs")
+            images = torch.cat([images, torch.rand(batch_size - len(images), 3, size, size)])
+        images = images[:len(images) - len(images) % batch_size]
+        print(f"  Parity at {batch_size}x3x{size}x{size} on {len(images)} images...")
+        with torch.inference_mode():
+            for start in range(0, len(images), batch_size):
+                x = images[start:start + batch_size]
+                reference = wrapped(x)
+                for name, runtime in runnable.items():
+                    if results[name]["status"] != "ok":
+                        continue
+                    try:
+                        stats = compare_outputs(reference, runtime(x))
+                    except Exception as e:
+                        results[name]["status"] = f"error: {type(e).__name__}: {e}"
+                        continue
+                    results[name]["max_abs_diff"] = max(results[name]["max_abs_diff"], stats["max_abs_diff"])
+                    results[name]["top1_agreement"].append(stats["top1_agreement"])
+
+    for name in runnable:
+        row = results[name]
+        agreements = row.pop("top1_agreement")
+        if row["status"] != "ok":
+            continue
+        if not agreements:
+            row["status"] = "skipped (no parity batches ran)"
+            continue
+        row["top1_agreement"] = sum(agreements) / len(agreements)
+        if row["max_abs_diff"] > tolerances[name]:
+            row["status"] = f"FAILED (max |dp| > {tolerances[name]:g})"
+
+    # Latency at the default input shape
+    x = torch.rand(dim_default(batch), 3, dim_default(image_size), dim_default(image_size))
+    results = {"pytorch": {"status": "reference", "latency_ms": measure_latency(wrapped, x)}, **results}
+    for name, runtime in runnable.items():
+        if results[name]["status"] == "ok" or results[name]["status"].startswith("FAILED"):
+            results[name]["latency_ms"] = measure_latency(runtime, x)
+    return results
 
 
 def main():
@@ -133,6 +406,56 @@ def main():
         type=str,
         help="Output path for .mlmodel file"
     )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        choices=WEIGHT_COMPRESSION,
+        help="Weight-only compression of the CoreML model"
+    )
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        default=["coreml", "torchscript"],
+        choices=EXPORT_FORMATS,
+        help="Artifacts to export (TorchScript/ONNX are written next to the CoreML output)"
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        default="1",
+        help="Batch sizes: fixed (1), enumerated (1,4,8) or a range (1-16)"
+    )
+    parser.add_argument(
+        "--image-size",
+        type=str,
+        help="Square image sizes: fixed, enumerated or a range (default: data.img_size)"
+    )
+    parser.add_argument(
+        "--precision",
+        type=str,
+        default="fp16",
+        choices=COMPUTE_PRECISION,
+        help="CoreML compute precision"
+    )
+    parser.add_argument(
+        "--compute-units",
+        type=str,
+        default="all",
+        choices=COMPUTE_UNITS,
+        help="Hardware CoreML may run the model on"
+    )
+    parser.add_argument(
+        "--parity-images",
+        type=int,
+        default=16,
+        help="Test images per image size for the parity check (0 skips the check)"
+    )
+    parser.add_argument(
+        "--atol",
+        type=float,
+        help="Max allowed softmax probability difference (default: 1e-3, 2e-2 for fp16 CoreML)"
+    )
 
     args = parser.parse_args()
 
@@ -140,6 +463,7 @@ def main():
         parser.error("Either --model or --checkpoint is required")
 
     # Load config for architecture if not specified
+    config = None
     if args.config and Path(args.config).exists():
         with open(args.config, 'r') as f:
             config = yaml.safe_load(f)
@@ -149,6 +473,12 @@ def main():
             parser.error("--architecture is required when config file is not available")
         architecture = args.architecture
 
+    try:
+        batch = parse_dim(args.batch)
+        image_size = parse_dim(args.image_size or (config['data']['img_size'] if config else 224))
+    except ValueError as e:
+        parser.error(str(e))
+
     # Determine output path
     ml_dir = Path(__file__).parent.parent
     if args.output:
@@ -156,9 +486,18 @@ def main():
     else:
         output_path = ml_dir / "output" / "PacerIDClassifier.mlpackage"
 
+    output_stem = str(output_path)[:-len(".mlpackage")] if str(output_path).endswith(".mlpackage") \
+        else str(Path(output_path).with_suffix(""))
+    Path(output_stem).parent.mkdir(parents=True, exist_ok=True)
+    artifact_paths = {
+        "coreml": str(output_path),
+        "torchscript": output_stem + ".torchscript.pt",
+        "onnx": output_stem + ".onnx",
+    }
+
     # Load class labels from training directory
     class_labels = None
-    if args.config and Path(args.config).exists():
+    if config:
         train_dir = ml_dir / config['data']['train_dir']
         if train_dir.exists():
             class_labels = sorted(os.listdir(train_dir))
@@ -175,7 +514,12 @@ def main():
     print(f"Num classes:  {num_classes}")
     print(f"Class labels: {'yes (' + str(len(class_labels)) + ')' if class_labels else 'no'}")
     print(f"Normalization: ImageNet (baked in)")
-    print(f"Output path:  {output_path}")
+    print(f"Compression:  {args.compress or 'none'}")
+    print(f"Batch size:   {describe_dim(batch)}")
+    print(f"Image size:   {describe_dim(image_size)}")
+    print(f"Precision:    {args.precision} (CoreML), compute units: {args.compute_units}")
+    for fmt in args.formats:
+        print(f"{fmt + ':':<13} {artifact_paths[fmt]}")
     print("="*60)
 
     # Create model architecture
@@ -187,17 +531,100 @@ def main():
         device="cpu",  # Export on CPU
     )
 
-    # Load weights
+    # Load weights (shrinking the model first if they are pruned)
     if args.checkpoint:
         print(f"Loading checkpoint: {args.checkpoint}")
         checkpoint = torch.load(args.checkpoint, map_location="cpu")
-        model.load_state_dict(checkpoint['model_state_dict'])
+        state_dict = checkpoint['model_state_dict']
     else:
         print(f"Loading model: {args.model}")
-        model.load_state_dict(torch.load(args.model, map_location="cpu"))
-
-    # Export
-    export_to_coreml(model, str(output_path), class_labels=class_labels)
+        state_dict = torch.load(args.model, map_location="cpu")
+    match_state_dict(model, architecture, state_dict)
+    model.load_state_dict(state_dict)
+
+    model.eval()
+    wrapped = NormalizedWrapper(model).eval()
+    example_input = torch.rand(dim_default(batch), 3, dim_default(image_size), dim_default(image_size))
+
+    # Export, keeping a runner for each artifact (or why it can't run here)
+    runtimes = {}
+    if "coreml" in args.formats:
+        mlmodel = export_to_coreml(
+            model,
+            artifact_paths["coreml"],
+            class_labels=class_labels,
+            weight_compression=args.compress,
+            batch=batch,
+            image_size=image_size,
+            compute_precision=args.precision,
+            compute_units=args.compute_units,
+        )
+        runtimes["coreml"] = (
+            coreml_runtime(mlmodel, class_labels) if sys.platform == "darwin"
+            else "skipped (CoreML runs on macOS only)"
+        )
+    if "torchscript" in args.formats:
+        print("\nExporting to TorchScript...")
+        export_torchscript(wrapped, example_input, artifact_paths["torchscript"])
+        print(f"TorchScript model saved to: {artifact_paths['torchscript']}")
+        runtimes["torchscript"] = torch.jit.load(artifact_paths["torchscript"]).eval()
+    if "onnx" in args.formats:
+        print("\nExporting to ONNX...")
+        export_onnx(
+            wrapped,
+            example_input,
+            artifact_paths["onnx"],
+            dynamic_batch=not is_fixed(batch),
+            dynamic_size=not is_fixed(image_size),
+        )
+        print(f"ONNX model saved to: {artifact_paths['onnx']}")
+        runtimes["onnx"] = onnx_runtime(artifact_paths["onnx"]) or "skipped (onnxruntime not installed)"
+
+    if args.parity_images <= 0:
+        print("\nExport complete! (parity check skipped)")
+        return
+
+    # Parity check against the PyTorch model
+    print("\nChecking exported models against PyTorch...")
+    lossy_coreml = args.precision == "fp16" or args.compress
+    tolerances = {
+        name: args.atol if args.atol is not None else 2e-2 if name == "coreml" and lossy_coreml else 1e-3
+        for name in runtimes
+    }
+    test_dir = ml_dir / config['data']['test_dir'] if config else None
+    results = check_parity(wrapped, runtimes, batch, image_size, test_dir, args.parity_images, tolerances)
+
+    print("\n" + "="*72)
+    print("EXPORT PARITY (softmax probabilities vs PyTorch)")
+    print("="*72)
+    print(f"{'artifact':<12} {'size MB':>8} {'max |dp|':>10} {'top-1 agree':>12} {'latency ms':>11}  status")
+    for name, row in results.items():
+        size = f"{path_size_mb(artifact_paths[name]):.2f}" if name in artifact_paths else "-"
+        diff = f"{row['max_abs_diff']:.2e}" if "max_abs_diff" in row else "-"
+        agree = f"{row['top1_agreement']:.3f}" if "top1_agreement" in row else "-"
+        latency = f"{row['latency_ms']:.2f}" if "latency_ms" in row else "-"
+        print(f"{name:<12} {size:>8} {diff:>10} {agree:>12} {latency:>11}  {row['status']}")
+    print("="*72)
+    print(f"Latency: median at {dim_default(batch)}x3x{dim_default(image_size)}x{dim_default(image_size)} on this machine")
+
+    report_path = output_stem + "_export_report.json"
+    with open(report_path, 'w') as f:
+        json.dump({
+            "architecture": architecture,
+            "batch": describe_dim(batch),
+            "image_size": describe_dim(image_size),
+            "precision": args.precision,
+            "compute_units": args.compute_units,
+            "compression": args.compress,
+            "artifacts": {name: artifact_paths[name] for name in args.formats},
+            "parity": results,
+        }, f, indent=2)
+    print(f"Report written to: {report_path}")
+
+    failed = [name for name, row in results.items() if row["status"].startswith(("FAILED", "error"))]
+    if failed:
+        print(f"\nERROR: exported {', '.join(failed)} disagree with the PyTorch model; see above.\n")
+        exit(1)
 
     print("\nExport complete!")
     print(f"\nNext steps:")
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Batch-score image directories with a trained pacemaker classifier.
+
+Streams images through a prefetching DataLoader, runs batched forward passes
+under torch.inference_mode() and writes top-k predictions as JSONL or CSV.
+
+Usage:
+    python scripts/predict.py --checkpoint output/checkpoint_latest.pt --input archive/ --output preds.jsonl
+    python scripts/predict.py --checkpoint output/PacemakerClassifier_final.pt \
+        --input files.txt --output preds.csv --batch-size 64 --threads 16 --num-workers 4
+    python scripts/predict.py --checkpoint output/best.pt --input archive/ --output preds.jsonl --tta 5
+    python scripts/predict.py --checkpoint output/best.pt --input unknown/ --output preds.jsonl \
+        --neighbors datasets/embeddings/densenet121 --num-neighbors 5
+
+With --tta K each image is scored on K deterministic views (flips,
+center/corner crops, small rotations) that go through the model as one
+batch; the logits are averaged. Use scripts/evaluate.py --tta to pick K.
+
+With --neighbors STORE each record also lists the most similar labelled
+radiographs of an embedding store built by scripts/embed.py (cosine
+similarity of penultimate-layer features, from the same forward pass).
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+import yaml
+import numpy as np
+import torch
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data.dataset import ImageFileDataset, get_inference_transforms, list_images
+from inference import EmbeddingModel, EmbeddingStore, TTAModel, get_tta_transforms, load_model, predict_batches
+from inference.tta import TTA_VIEWS, tta_base_size
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def load_class_names(config: dict, ml_dir: Path) -> list:
+    """Class names from the training directory (ImageFolder order), if available"""
+    train_dir = ml_dir / config['data']['train_dir']
+    if not train_dir.exists():
+        print(f"WARNING: Train dir not found at {train_dir}, writing class indices")
+        return None
+    return sorted(d.name for d in train_dir.iterdir() if d.is_dir())
+
+
+class PredictionWriter:
+    """Writes one prediction record per image as JSONL or CSV"""
+
+    def __init__(self, path: str, fmt: str, top_k: int, num_neighbors: int = 0):
+        self.fmt = fmt
+        self.top_k = top_k
+        self.file = open(path, 'w', newline='')
+        if fmt == "csv":
+            self.csv = csv.writer(self.file)
+            header = ["path", "status"]
+            for rank in range(1, top_k + 1):
+                header += [f"label_{rank}", f"prob_{rank}"]
+            for rank in range(1, num_neighbors + 1):
+                header += [f"neighbor_{rank}", f"neighbor_label_{rank}", f"similarity_{rank}"]
+            self.csv.writerow(header)
+
+    def write(self, path: str, ok: bool, labels: list, probs: list, neighbors: list = None):
+        if self.fmt == "csv":
+            row = [path, "ok" if ok else "error"]
+            if ok:
+                for label, prob in zip(labels, probs):
+                    row += [label, f"{prob:.6f}"]
+                row += [""] * (2 * (self.top_k - len(labels)))
+                for neighbor in neighbors or []:
+                    row += [neighbor["path"], neighbor["label"], f"{neighbor['similarity']:.6f}"]
+            self.csv.writerow(row)
+        else:
+            record = {"path": path, "status": "ok" if ok else "error"}
+            if ok:
+                record["predictions"] = [
+                    {"label": label, "probability": round(prob, 6)}
+                    for label, prob in zip(labels, probs)
+                ]
+                if neighbors is not None:
+                    record["neighbors"] = neighbors
+            self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-score images with a trained model")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file")
+    parser.add_argument(
+        "--input",
+        type=str,
+        nargs="+",
+        required=True,
+        help="Image directories, image files or .txt files listing image paths"
+    )
+    parser.add_argument("--output", type=str, required=True, help="Output .jsonl or .csv file")
+    parser.add_argument("--format", type=str, choices=["jsonl", "csv"], help="Output format (default: from extension)")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    parser.add_argument("--batch-size", type=int, default=32, help="Images per forward pass")
+    parser.add_argument("--num-workers", type=int, default=2, help="DataLoader decode workers")
+    parser.add_argument("--prefetch-factor", type=int, default=2, help="Batches prefetched per worker")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch default)")
+    parser.add_argument("--top-k", type=int, default=5, help="Predictions per image")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], default="cpu", help="Device to use")
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=["fp32", "bf16", "fp16"],
+        default="fp32",
+        help="Forward pass precision"
+    )
+    parser.add_argument("--channels-last", action="store_true", help="Use channels_last memory format")
+    parser.add_argument(
+        "--tta",
+        type=int,
+        default=1,
+        choices=range(1, len(TTA_VIEWS) + 1),
+        metavar="K",
+        help=f"Test-time views per image, averaged in logit space (1-{len(TTA_VIEWS)}, default: 1 = off)"
+    )
+    parser.add_argument("--crop-fraction", type=float, default=0.875, help="Fraction of the image each TTA crop covers")
+    parser.add_argument("--neighbors", type=str, metavar="STORE", help="Embedding store of scripts/embed.py to search")
+    parser.add_argument("--num-neighbors", type=int, default=5, help="Similar labelled images per prediction")
+    parser.add_argument("--nprobe", type=int, help="IVF lists searched per query (default: as built)")
+
+    args = parser.parse_args()
+    if args.neighbors and args.tta > 1:
+        parser.error("--neighbors cannot be combined with --tta")
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    architecture = args.architecture or config['model']['architecture']
+    img_size = config['data']['img_size']
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+
+    device = args.device
+    if device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        device = "cpu"
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    paths = list_images(args.input)
+    if not paths:
+        print("ERROR: No images found in --input")
+        exit(1)
+
+    class_names = load_class_names(config, ml_dir)
+
+    print("=" * 60)
+    print("BATCH PREDICTION")
+    print("=" * 60)
+    print(f"Checkpoint:   {args.checkpoint}")
+    print(f"Architecture: {architecture}")
+    print(f"Images:       {len(paths)}")
+    print(f"Batch size:   {args.batch_size}")
+    print(f"Workers:      {args.num_workers}")
+    print(f"Threads:      {torch.get_num_threads()}")
+    print(f"Device:       {device} ({args.precision})")
+    if args.tta > 1:
+        print(f"TTA views:    {args.tta} ({', '.join(TTA_VIEWS[:args.tta])})")
+    if args.neighbors:
+        print(f"Neighbors:    {args.num_neighbors} from {args.neighbors}")
+    print(f"Output:       {args.output} ({fmt})")
+    print("=" * 60)
+
+    model = load_model(
+        args.checkpoint,
+        architecture,
+        num_classes=len(class_names) if class_names else None,
+        device=device,
+        channels_last=args.channels_last,
+    )
+
+    store = index = None
+    num_neighbors = 0
+    if args.neighbors:
+        store = EmbeddingStore(args.neighbors)
+        if store.key["architecture"] != architecture:
+            print(f"ERROR: {args.neighbors} holds {store.key['architecture']} embeddings, not {architecture}")
+            exit(1)
+        index = store.load_index(device=device, nprobe=args.nprobe)
+        num_neighbors = args.num_neighbors
+        print(f"Loaded {index.kind} index over {len(store)} embeddings")
+        model = EmbeddingModel(model, architecture)
+
+    if args.tta > 1:
+        model = TTAModel(model, args.tta, img_size, channels_last=args.channels_last)
+        load_size = tta_base_size(img_size, args.crop_fraction)
+        dataset = ImageFileDataset(paths, get_tta_transforms(img_size, args.crop_fraction), img_size=load_size)
+    else:
+        dataset = ImageFileDataset(paths, get_inference_transforms(img_size), img_size=img_size)
+    loader = torch.utils.data.DataLoader(
+        dataset,
+        batch_size=args.batch_size,
+        shuffle=False,
+        num_workers=args.num_workers,
+        prefetch_factor=args.prefetch_factor if args.num_workers > 0 else None,
+        pin_memory=device == "cuda",
+    )
+
+    writer = PredictionWriter(args.output, fmt, args.top_k, num_neighbors)
+    latencies = []
+    search_latencies = []
+    failed = 0
+    start = time.perf_counter()
+
+    for indices, ok, top_probs, top_idx, latency, *embeddings in predict_batches(
+        model,
+        loader,
+        device=device,
+        top_k=args.top_k,
+        precision=args.precision,
+        channels_last=args.channels_last,
+        embeddings=store is not None,
+    ):
+        latencies.append(latency)
+        neighbors = [None] * len(indices)
+        if store is not None:
+            search_start = time.perf_counter()
+            scores, ids = index.search(embeddings[0], num_neighbors)
+            search_latencies.append(time.perf_counter() - search_start)
+            neighbors = [
+                [
+                    {
+                        "path": store.items[j]["path"],
+                        "label": store.classes[store.items[j]["label"]],
+                        "similarity": round(score, 6),
+                    }
+                    for score, j in zip(row_scores, row_ids) if j >= 0
+                ]
+                for row_scores, row_ids in zip(scores.tolist(), ids.tolist())
+            ]
+        for i, image_ok, probs, classes, image_neighbors in zip(
+            indices.tolist(), ok.tolist(), top_probs.tolist(), top_idx.tolist(), neighbors
+        ):
+            labels = [class_names[c] if class_names else c for c in classes]
+            writer.write(str(paths[i]), image_ok, labels, probs, image_neighbors)
+            failed += not image_ok
+
+        done = min(len(latencies) * args.batch_size, len(paths))
+        print(f"\r  Scored {done}/{len(paths)}", end='')
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000
+
+    print("\n\n" + "=" * 60)
+    print("THROUGHPUT")
+    print("=" * 60)
+    print(f"Images:            {len(paths)} ({failed} failed to decode)")
+    print(f"Wall time:         {elapsed:.2f} s")
+    print(f"Throughput:        {len(paths) / elapsed:.1f} images/s")
+    print(
+        f"Batch latency:     p50 {np.percentile(latencies_ms, 50):.1f} ms | "
+        f"p90 {np.percentile(latencies_ms, 90):.1f} ms | "
+        f"p99 {np.percentile(latencies_ms, 99):.1f} ms"
+    )
+    print(f"Per-image compute: {latencies_ms.sum() / len(paths):.2f} ms")
+    if search_latencies:
+        print(f"Neighbor search:   {sum(search_latencies) * 1000 / len(paths):.2f} ms per image ({index.kind})")
+    print("=" * 60)
+    print(f"\nPredictions written to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
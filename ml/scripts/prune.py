@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Prune a trained model to a FLOPs or CPU latency budget and fine-tune it.
+
+Removes the least important channels of every block's inner width (ranked
+by batch norm |gamma|, see models.pruning) until the model fits the
+budget, then fine-tunes the smaller model for a few epochs with train.py's
+training loop. The result is a dense model with physically fewer channels:
+scripts/export.py, evaluate.py, predict.py and serve.py load it from its
+checkpoint like any other.
+
+Usage:
+    python scripts/prune.py --checkpoint output/best.pt --target-flops 0.5
+    python scripts/prune.py --checkpoint output/best.pt --target-latency-ms 40 --epochs 5 --distill
+    python scripts/prune.py --checkpoint output/best.pt --ratio 0.3 --epochs 0
+"""
+
+import argparse
+import json
+import sys
+import torch
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from train import check_config, load_config, training
+from inference import load_model
+from models.classifier import count_parameters
+from models.pruning import prune_model, prune_to_budget
+
+
+def describe_cost(counts: dict) -> str:
+    return (
+        f"{counts['total'] / 1e6:.2f}M params, {counts['flops'] / 1e9:.2f} GFLOPs, "
+        f"{counts['cpu_latency_ms']:.1f} ms CPU"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune and fine-tune a trained pacemaker classifier")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file to prune")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Config the model was trained with")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    budget = parser.add_mutually_exclusive_group(required=True)
+    budget.add_argument(
+        "--target-flops",
+        type=float,
+        help="FLOPs budget per image: absolute (e.g. 1.5e9) or, if <= 1, a fraction of the original"
+    )
+    budget.add_argument("--target-latency-ms", type=float, help="Median single-image CPU latency budget")
+    budget.add_argument("--ratio", type=float, help="Fraction of each block's channels to remove")
+    parser.add_argument("--multiple", type=int, default=8, help="Round kept channel counts to this multiple")
+    parser.add_argument("--threads", type=int, help="torch threads for latency measurements (default: torch default)")
+    parser.add_argument("--epochs", type=int, default=5, help="Fine-tuning epochs (0 saves the pruned model only)")
+    parser.add_argument("--learning-rate", type=float, default=1e-4, help="Fine-tuning learning rate")
+    parser.add_argument("--distill", action="store_true", help="Fine-tune with the unpruned model as the teacher")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Fine-tuning device")
+    parser.add_argument("--output-dir", type=str, help="Output directory (default: <checkpoint dir>/pruned)")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    architecture = args.architecture or config['model']['architecture']
+    config['model']['architecture'] = architecture
+    img_size = config['data']['img_size']
+    output_dir = Path(args.output_dir) if args.output_dir else Path(args.checkpoint).parent / "pruned"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    model = load_model(args.checkpoint, architecture, device="cpu")
+    before = count_parameters(model, img_size, latency_runs=20)
+
+    print("=" * 60)
+    print("PRUNING")
+    print("=" * 60)
+    print(f"Checkpoint:   {args.checkpoint}")
+    print(f"Architecture: {architecture}")
+    print(f"Original:     {describe_cost(before)}")
+
+    if args.ratio is not None:
+        print(f"Budget:       {args.ratio:.0%} of each block's channels")
+        pruned, ratio = prune_model(model, architecture, args.ratio, args.multiple), args.ratio
+    else:
+        target_flops = args.target_flops
+        if target_flops is not None and target_flops <= 1:
+            target_flops *= before['flops']
+        if target_flops is not None:
+            print(f"Budget:       {target_flops / 1e9:.2f} GFLOPs per image")
+        else:
+            print(f"Budget:       {args.target_latency_ms:.1f} ms CPU latency")
+        print("Searching for the pruning ratio...")
+        pruned, ratio, _ = prune_to_budget(
+            model,
+            architecture,
+            img_size,
+            target_flops=target_flops,
+            target_latency_ms=args.target_latency_ms,
+            multiple=args.multiple,
+        )
+
+    after = count_parameters(pruned, img_size, latency_runs=20)
+    print(f"Pruned:       {describe_cost(after)} (ratio {ratio:.3f})")
+    print("=" * 60)
+
+    pruned_path = output_dir / "pruned_init.pt"
+    torch.save(pruned.state_dict(), pruned_path)
+    print(f"\nPruned model saved to: {pruned_path}")
+
+    summary = None
+    if args.epochs > 0:
+        # Fine-tune with the regular training loop, initialized from the pruned weights
+        config['model']['init_checkpoint'] = str(pruned_path)
+        config['model']['pretrained'] = False
+        config['training']['epochs'] = args.epochs
+        config['training']['learning_rate'] = args.learning_rate
+        config['training']['nproc'] = 1
+        config['training']['freeze_backbone'] = False
+        config['training']['distill_teacher'] = args.checkpoint if args.distill else None
+        config['training']['distill_teacher_architecture'] = architecture
+        config['output']['dir'] = str(output_dir)
+        if args.device is not None:
+            config['training']['device'] = args.device
+        config = check_config(config)
+
+        print(f"\nFine-tuning for {args.epochs} epochs{' with distillation' if args.distill else ''}...")
+        summary = training(0, config)
+
+    report = {
+        "checkpoint": str(args.checkpoint),
+        "architecture": architecture,
+        "img_size": img_size,
+        "ratio": round(ratio, 4),
+        "original": before,
+        "pruned": after,
+        "pruned_model": str(pruned_path),
+        "fine_tuning": summary,
+    }
+    with open(output_dir / "prune_report.json", 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("PRUNING SUMMARY")
+    print("=" * 60)
+    print(f"Original: {describe_cost(before)}")
+    print(f"Pruned:   {describe_cost(after)}")
+    print(
+        f"Saved:    {1 - after['flops'] / before['flops']:.0%} FLOPs, "
+        f"{1 - after['cpu_latency_ms'] / before['cpu_latency_ms']:.0%} CPU latency"
+    )
+    if summary and summary['best_accuracy'] is not None:
+        print(f"Fine-tuned test accuracy: {summary['best_accuracy']:.3f} (epoch {summary['best_epoch']})")
+        print(f"Export with: python scripts/export.py --checkpoint {output_dir / 'best.pt'} "
+              f"--architecture {architecture}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
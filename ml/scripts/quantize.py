@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Produce quantized variants of a trained checkpoint and compare them.
+
+PyTorch variants (CPU inference):
+    fp32     - the original model (reference)
+    dynamic  - dynamic INT8 Linear layers, no calibration
+    static   - post-training static INT8, calibrated on training images
+
+CoreML variants (app bundle), weight-only:
+    int8, palettize8, palettize6, palettize4
+
+Reports size, CPU latency and test accuracy change for every PyTorch variant,
+and size for every CoreML variant (CoreML predictions need macOS).
+
+Usage:
+    python scripts/quantize.py --checkpoint output/checkpoint_latest.pt
+    python scripts/quantize.py --checkpoint output/checkpoint_latest.pt --variants static --coreml int8 palettize4
+"""
+
+import argparse
+import json
+import sys
+import yaml
+import torch
+from pathlib import Path
+from ignite.engine import create_supervised_evaluator
+from ignite.metrics import Accuracy
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data import create_data_loaders, create_train_eval_loader
+from inference import load_model
+from models.quantization import (
+    measure_latency,
+    model_size_mb,
+    quantize_dynamic_int8,
+    quantize_static_int8,
+)
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def evaluate_accuracy(model: torch.nn.Module, loader, max_batches: int = None) -> float:
+    """Top-1 accuracy on CPU, optionally over the first max_batches batches"""
+    evaluator = create_supervised_evaluator(model, metrics={'accuracy': Accuracy()}, device="cpu")
+    evaluator.run(loader, epoch_length=min(max_batches or len(loader), len(loader)))
+    return evaluator.state.metrics['accuracy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize a trained model")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    parser.add_argument(
+        "--variants",
+        type=str,
+        nargs="+",
+        default=["dynamic", "static"],
+        choices=["dynamic", "static"],
+        help="PyTorch quantized variants to build"
+    )
+    parser.add_argument(
+        "--coreml",
+        type=str,
+        nargs="*",
+        default=[],
+        choices=["int8", "palettize8", "palettize6", "palettize4"],
+        help="CoreML weight compression variants to export"
+    )
+    parser.add_argument("--backend", type=str, default="x86", choices=["x86", "fbgemm", "qnnpack"], help="Quantized engine")
+    parser.add_argument("--calibration-samples", type=int, default=256, help="Training images used to calibrate")
+    parser.add_argument("--eval-batches", type=int, help="Limit test batches for accuracy (default: all)")
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--output-dir", type=str, default="output/quantized", help="Where to write variants")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    architecture = args.architecture or config['model']['architecture']
+    img_size = config['data']['img_size']
+    batch_size = config['data']['batch_size']
+    output_dir = ml_dir / args.output_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    train_dir = ml_dir / config['data']['train_dir']
+    test_dir = ml_dir / config['data']['test_dir']
+    manifest = config['data'].get('manifest')
+    manifest = str(ml_dir / manifest) if manifest and (ml_dir / manifest).exists() else None
+    resized_dir = config['data'].get('resized_dir')
+    resized_dir = str(ml_dir / resized_dir) if resized_dir else None
+
+    _, test_loader, num_classes, class_names = create_data_loaders(
+        train_dir=str(train_dir),
+        test_dir=str(test_dir),
+        batch_size=batch_size,
+        img_size=img_size,
+        num_workers=config['data']['num_workers'],
+        manifest=manifest,
+        resized_dir=resized_dir,
+    )
+    calibration_loader = create_train_eval_loader(
+        train_dir=str(train_dir),
+        num_samples=args.calibration_samples,
+        batch_size=batch_size,
+        img_size=img_size,
+        num_workers=config['data']['num_workers'],
+        manifest=manifest,
+        resized_dir=resized_dir,
+    )
+
+    model = load_model(args.checkpoint, architecture, num_classes=num_classes, device="cpu")
+    input_shape = (1, 3, img_size, img_size)
+
+    variants = {"fp32": model}
+    if "dynamic" in args.variants:
+        print("\nBuilding dynamic INT8 variant...")
+        variants["dynamic"] = quantize_dynamic_int8(model)
+    if "static" in args.variants:
+        print("\nCalibrating static INT8 variant...")
+        variants["static"] = quantize_static_int8(
+            model,
+            calibration_loader,
+            num_batches=len(calibration_loader),
+            backend=args.backend,
+            img_size=img_size,
+        )
+
+    report = {"architecture": architecture, "checkpoint": args.checkpoint, "variants": {}}
+    for name, variant in variants.items():
+        print(f"\nEvaluating {name}...")
+        report["variants"][name] = {
+            "format": "torch",
+            "size_mb": model_size_mb(variant),
+            "latency_ms": measure_latency(variant, input_shape),
+            "accuracy": evaluate_accuracy(variant, test_loader, args.eval_batches),
+        }
+        if name != "fp32":
+            path = output_dir / f"{architecture}_{name}.torchscript.pt"
+            torch.jit.save(torch.jit.trace(variant, torch.randn(*input_shape)), str(path))
+            report["variants"][name]["path"] = str(path)
+
+    if args.coreml:
+        from export import export_to_coreml, path_size_mb
+
+        for method in args.coreml:
+            path = output_dir / f"{architecture}_{method}.mlpackage"
+            export_to_coreml(
+                model, str(path), class_labels=class_names, weight_compression=method, image_size=[img_size]
+            )
+            report["variants"][f"coreml_{method}"] = {
+                "format": "coreml",
+                "size_mb": path_size_mb(path),
+                "path": str(path),
+            }
+
+    reference = report["variants"]["fp32"]
+    print("\n" + "=" * 72)
+    print(f"QUANTIZATION REPORT ({architecture})")
+    print("=" * 72)
+    print(f"{'variant':<20} {'size MB':>9} {'latency ms':>11} {'speed-up':>9} {'accuracy':>9} {'Δacc':>7}")
+    for name, stats in report["variants"].items():
+        if stats["format"] == "coreml":
+            print(f"{name:<20} {stats['size_mb']:>9.2f} {'n/a':>11} {'n/a':>9} {'n/a':>9} {'n/a':>7}")
+            continue
+        speedup = reference["latency_ms"] / stats["latency_ms"]
+        delta = stats["accuracy"] - reference["accuracy"]
+        print(
+            f"{name:<20} {stats['size_mb']:>9.2f} {stats['latency_ms']:>11.2f} "
+            f"{speedup:>8.2f}x {stats['accuracy']:>9.3f} {delta:>+7.3f}"
+        )
+    print("=" * 72)
+
+    report_path = output_dir / "quantization_report.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Serve a trained pacemaker classifier on localhost with a warm model.
+
+The model is loaded once and kept in memory; concurrent requests arriving
+within --max-wait-ms of each other are run as one batched forward pass.
+Classify images against it with scripts/classify.py (no torch import) or
+any HTTP client:
+
+    curl --data-binary @image.png http://127.0.0.1:8765/predict
+
+Usage:
+    python scripts/serve.py --checkpoint output/best.pt
+    python scripts/serve.py --checkpoint output/best.pt --port 8765 --max-batch-size 16 --max-wait-ms 10
+"""
+
+import argparse
+import sys
+import time
+import yaml
+import torch
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from data.dataset import get_inference_transforms
+from inference import MicroBatcher, load_model, serve
+
+
+def load_config(config_path: str) -> dict:
+    """Load configuration from YAML file"""
+    with open(config_path, 'r') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def load_class_names(config: dict, ml_dir: Path) -> list:
+    """Class names from the training directory (ImageFolder order), if available"""
+    train_dir = ml_dir / config['data']['train_dir']
+    if not train_dir.exists():
+        print(f"WARNING: Train dir not found at {train_dir}, returning class indices")
+        return None
+    return sorted(d.name for d in train_dir.iterdir() if d.is_dir())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a trained model over HTTP on localhost")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Checkpoint or model .pt file")
+    parser.add_argument("--config", type=str, default="configs/base.yaml", help="Path to config file")
+    parser.add_argument("--architecture", type=str, help="Model architecture (overrides config)")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="Most images per forward pass")
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5.0,
+        help="How long the first queued request waits for others to batch with"
+    )
+    parser.add_argument("--threads", type=int, help="torch intra-op threads (default: torch default)")
+    parser.add_argument("--top-k", type=int, default=5, help="Predictions per image")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], default="cpu", help="Device to use")
+    parser.add_argument(
+        "--precision",
+        type=str,
+        choices=["fp32", "bf16", "fp16"],
+        default="fp32",
+        help="Forward pass precision"
+    )
+    parser.add_argument("--channels-last", action="store_true", help="Use channels_last memory format")
+
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    ml_dir = Path(__file__).parent.parent
+    architecture = args.architecture or config['model']['architecture']
+    img_size = config['data']['img_size']
+
+    device = args.device
+    if device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        device = "cpu"
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    class_names = load_class_names(config, ml_dir)
+
+    start = time.perf_counter()
+    model = load_model(
+        args.checkpoint,
+        architecture,
+        num_classes=len(class_names) if class_names else None,
+        device=device,
+        channels_last=args.channels_last,
+    )
+    batcher = MicroBatcher(
+        model,
+        device=device,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        top_k=args.top_k,
+        precision=args.precision,
+        channels_last=args.channels_last,
+    )
+    batcher.warmup(img_size)
+
+    server = serve(
+        batcher,
+        get_inference_transforms(img_size),
+        host=args.host,
+        port=args.port,
+        class_names=class_names,
+        info={"architecture": architecture, "checkpoint": args.checkpoint, "device": device},
+    )
+
+    print("=" * 60)
+    print("MODEL SERVER")
+    print("=" * 60)
+    print(f"Checkpoint:   {args.checkpoint}")
+    print(f"Architecture: {architecture}")
+    print(f"Device:       {device} ({args.precision})")
+    print(f"Threads:      {torch.get_num_threads()}")
+    print(f"Batching:     up to {args.max_batch_size} images, {args.max_wait_ms} ms window")
+    print(f"Ready in:     {time.perf_counter() - start:.2f} s")
+    print(f"Listening on: http://{args.host}:{args.port} (POST /predict, GET /health)")
+    print("=" * 60)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        server.server_close()
+        batcher.close()
+        print(f"Served {batcher.images} images in {batcher.batches} batches")
+
+
+if __name__ == "__main__":
+    main()
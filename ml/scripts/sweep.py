@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter sweep: parallel training trials with ASHA early stopping.
+
+Trials are drawn from the search space in configs/sweep.yaml and trained
+with train.py's training loop in a pool of worker processes, each limited
+to --threads-per-trial CPU threads. At the ASHA rungs (e.g. epochs 1, 3, 9)
+a trial whose test accuracy is not in the top third of the trials that
+reached that epoch is stopped, so most of the epoch budget goes to the
+promising configurations.
+
+Each trial writes its config, log and checkpoints to
+<output_dir>/<name>/trial_NNN/; results.csv and results.json compare all
+trials. Re-train the winner with:
+
+    python scripts/train.py --config output/sweeps/<name>/trial_NNN/config.yaml
+
+Usage:
+    python scripts/sweep.py --config configs/sweep.yaml
+    python scripts/sweep.py --config configs/sweep.yaml --name lr-search --trials 24 --parallel 8
+"""
+
+import argparse
+import contextlib
+import multiprocessing
+import sys
+import time
+import traceback
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+# Add ml/src to path so we can import our modules
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from train import check_config, load_config, training
+from training.sweep import ASHARule, apply_params, attach_asha, print_results, sample_trials, write_results
+
+
+def run_trial(job: dict) -> dict:
+    """
+    Train one trial in this worker process.
+
+    Output goes to the trial's train.log; the returned row holds the
+    trial's parameters, outcome and best test accuracy.
+    """
+    import torch
+
+    name = job["name"]
+    config = job["config"]
+    trial_dir = Path(config['output']['dir'])
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    torch.set_num_threads(job["threads"])
+
+    hooks = []
+    outcomes = []
+    asha = job["asha"]
+    if asha:
+        rule = ASHARule(
+            job["asha_state"],
+            max_epochs=config['training']['epochs'],
+            min_epochs=asha.get('min_epochs', 1),
+            reduction_factor=asha.get('reduction_factor', 3),
+            mode=asha.get('mode', 'max'),
+        )
+        metric = asha.get('metric', 'accuracy')
+        hooks.append(lambda trainer, evaluator: outcomes.append(attach_asha(trainer, rule, name, metric)))
+
+    row = {"trial": name, **job["params"]}
+    start = time.perf_counter()
+    with open(trial_dir / "train.log", 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            summary = training(0, config, hooks)
+            if any("stopped_at" in outcome for outcome in outcomes):
+                status = "pruned"
+            elif summary["epochs"] < config['training']['epochs']:
+                status = "early-stopped"
+            else:
+                status = "completed"
+            row.update(status=status, **summary)
+        except Exception as e:
+            traceback.print_exc()
+            row.update(status="failed", error=f"{type(e).__name__}: {e}")
+    row["minutes"] = round((time.perf_counter() - start) / 60, 2)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the pacemaker classifier")
+    parser.add_argument("--config", type=str, default="configs/sweep.yaml", help="Sweep config")
+    parser.add_argument("--name", type=str, help="Sweep name (default: current date and time)")
+    parser.add_argument("--trials", type=int, help="Number of random trials")
+    parser.add_argument("--parallel", type=int, help="Trials trained at the same time")
+    parser.add_argument("--threads-per-trial", type=int, help="CPU threads per trial")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Device to use")
+
+    args = parser.parse_args()
+
+    ml_dir = Path(__file__).parent.parent
+    print(f"Loading sweep config from: {args.config}")
+    sweep = load_config(args.config)
+    for key in ("trials", "parallel", "threads_per_trial"):
+        if getattr(args, key) is not None:
+            sweep[key] = getattr(args, key)
+
+    base_config = load_config(ml_dir / sweep.get('base_config', 'configs/base.yaml'))
+    overrides = dict(sweep.get('overrides') or {})
+    if args.device is not None:
+        overrides['training.device'] = args.device
+    base_config = check_config(apply_params(base_config, overrides))
+
+    name = args.name or datetime.now().strftime("%Y%m%d-%H%M%S")
+    sweep_dir = ml_dir / sweep.get('output_dir', 'output/sweeps') / name
+    asha_state = sweep_dir / "asha.json"
+    if asha_state.exists() or (sweep_dir / "results.csv").exists():
+        print(f"\nERROR: Sweep directory already used: {sweep_dir}")
+        print("Pick another --name.\n")
+        exit(1)
+
+    search_space = sweep['search_space']
+    trials = sample_trials(search_space, sweep.get('trials'), seed=sweep.get('seed', 0))
+    parallel = max(1, sweep.get('parallel') or 1)
+    threads = sweep.get('threads_per_trial') or 1
+    asha = sweep.get('asha')
+
+    jobs = []
+    for i, params in enumerate(trials):
+        trial_name = f"trial_{i:03d}"
+        config = apply_params(base_config, params)
+        config['output']['dir'] = str(sweep_dir / trial_name)
+        jobs.append({
+            "name": trial_name,
+            "params": params,
+            "config": config,
+            "threads": threads,
+            "asha": asha,
+            "asha_state": str(asha_state),
+        })
+        (sweep_dir / trial_name).mkdir(parents=True, exist_ok=True)
+        with open(sweep_dir / trial_name / "config.yaml", 'w') as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+
+    with open(sweep_dir / "sweep.yaml", 'w') as f:
+        yaml.safe_dump({**sweep, "name": name}, f, sort_keys=False)
+
+    # Print configuration
+    epochs = base_config['training']['epochs']
+    print("\n" + "="*60)
+    print("SWEEP CONFIGURATION")
+    print("="*60)
+    print(f"Output directory: {sweep_dir}")
+    print(f"Trials:          {len(jobs)} ({'grid' if sweep.get('trials') is None else 'random'})")
+    print(f"Parallel trials: {parallel} x {threads} threads")
+    print(f"Device:          {base_config['training']['device']}")
+    print(f"Epoch budget:    {epochs} per trial")
+    if asha:
+        rungs = ASHARule(asha_state, max_epochs=epochs, min_epochs=asha.get('min_epochs', 1),
+                         reduction_factor=asha.get('reduction_factor', 3)).rungs
+        print(f"ASHA rungs:      epochs {', '.join(map(str, rungs)) or '-'} "
+              f"(keep top 1/{asha.get('reduction_factor', 3)} by test {asha.get('metric', 'accuracy')})")
+    for key, space in search_space.items():
+        print(f"  {key}: {space}")
+    print("="*60 + "\n")
+
+    # Fresh interpreters: trials must not inherit the parent's torch thread pools
+    results = []
+    start = time.perf_counter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=parallel, mp_context=context) as pool:
+        futures = [pool.submit(run_trial, job) for job in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = future.result()
+            results.append(row)
+            if row["status"] == "failed":
+                detail = row["error"]
+            else:
+                detail = (
+                    f"{row['epochs']} epochs, best acc {row['best_accuracy']:.3f}"
+                    if row["best_accuracy"] is not None else f"{row['epochs']} epochs"
+                )
+            print(f"[{done}/{len(jobs)}] {row['trial']} {row['status']}: {detail} ({row['minutes']:.1f} min)")
+            write_results(results, sweep_dir)
+
+    print_results(results, list(search_space))
+    print(f"Sweep took {(time.perf_counter() - start) / 60:.1f} min")
+    print(f"Results saved to {sweep_dir / 'results.csv'}")
+
+    best = next((r for r in sorted(results, key=lambda r: -(r.get('best_accuracy') or -1))
+                 if r.get('best_accuracy') is not None), None)
+    if best is not None:
+        print(f"Best trial: {best['trial']} (test accuracy {best['best_accuracy']:.3f})")
+        print(f"  python scripts/train.py --config {sweep_dir / best['trial'] / 'config.yaml'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,40 @@ Main training script for pacemaker classifier.
 Usage:
     python scripts/train.py --config configs/base.yaml
     python scripts/train.py --config configs/base.yaml --epochs 30 --batch-size 64
+
+    # Data-parallel on one machine: 8 processes (gloo on CPU, NCCL on GPUs)
+    python scripts/train.py --config configs/base.yaml --nproc 8 --device cpu
+
+    # Or under torchrun
+    torchrun --nproc_per_node 8 scripts/train.py --config configs/base.yaml
 """
 
 import argparse
+import os
 import sys
 import yaml
 import torch
 import torch.nn as nn
+import ignite.distributed as idist
 from pathlib import Path
+from typing import Callable, Sequence
 
 # Add ml/src to path so we can import our modules
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from data import create_data_loaders
+from data import BatchAugment, create_data_loaders, create_eval_loader, create_train_eval_loader
+from data.cache import samples_fingerprint
+from inference import load_model
+from inference.predictor import load_state_dict
 from models import create_model
-from training import create_trainer, setup_callbacks
+from models.classifier import HEAD_LAYERS, freeze_backbone
+from models.pruning import match_state_dict
+from training import AsyncCheckpointWriter, create_trainer, setup_callbacks
+from training.distillation import CachedTeacher, DistillationLoss, OnlineTeacher, build_teacher_cache
+from training.features import build_feature_cache, fit_head, load_feature_cache
+from training.profiling import StageTimer, attach_profiling
+from training.resume import attach_resume_checkpoints, find_resume_checkpoint
+from training.trainer import load_checkpoint
 
 
 def load_config(config_path: str) -> dict:
@@ -39,75 +58,236 @@ def override_config(config: dict, args: argparse.Namespace) -> dict:
         config['training']['learning_rate'] = args.learning_rate
     if args.device is not None:
         config['training']['device'] = args.device
+    if args.nproc is not None:
+        config['training']['nproc'] = args.nproc
+    if args.resume is not None:
+        config['training']['resume'] = args.resume
     return config
 
 
-def main():
-    parser = argparse.ArgumentParser(description="Train pacemaker classifier")
-    parser.add_argument(
-        "--config",
-        type=str,
-        default="configs/base.yaml",
-        help="Path to config file"
+def load_backbone(model: nn.Module, architecture: str, path: str):
+    """
+    Initialize a model from a trained checkpoint.
+
+    The head is only loaded if its number of classes matches, so a model
+    trained on fewer pacemaker classes can seed one with new classes. A
+    pruned checkpoint shrinks the model to its channel widths, which is how
+    scripts/prune.py fine-tunes pruned models.
+    """
+    state_dict = load_state_dict(path)
+    match_state_dict(model, architecture, state_dict)
+    head = HEAD_LAYERS[architecture]
+    if state_dict[f"{head}.weight"].shape != model.get_submodule(head).weight.shape:
+        state_dict = {k: v for k, v in state_dict.items() if not k.startswith(f"{head}.")}
+        print(f"  Initialized backbone from {path} (new {head} layer)")
+    else:
+        print(f"  Initialized from {path}")
+    model.load_state_dict(state_dict, strict=False)
+
+
+def train_head_on_features(
+    config: dict,
+    model: nn.Module,
+    train_dir: Path,
+    test_dir: Path,
+    source_kwargs: dict,
+    device: str,
+    precision: str,
+    channels_last: bool,
+):
+    """
+    freeze_backbone mode: train the head on cached penultimate features.
+
+    Features of the non-augmented train and test images are computed once
+    per backbone and cached as float16; re-runs (e.g. after adding classes
+    or changing head hyperparameters) only re-train the linear layer.
+
+    Returns:
+        Tuple of (best test accuracy, best epoch) of the head
+    """
+    ml_dir = Path(__file__).parent.parent
+    architecture = config['model']['architecture']
+    img_size = config['data']['img_size']
+    feature_cache_dir = ml_dir / config['training'].get('feature_cache_dir', 'datasets/features')
+
+    # The features depend on the backbone weights, not just the architecture
+    init_checkpoint = config['model'].get('init_checkpoint')
+    if init_checkpoint:
+        stat = os.stat(init_checkpoint)
+        weights = {"path": str(Path(init_checkpoint).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    else:
+        weights = "imagenet"
+    key = {"architecture": architecture, "weights": weights, "img_size": img_size, "precision": precision}
+
+    splits = {}
+    for split, image_dir in (("train", train_dir), ("test", test_dir)):
+        loader = create_eval_loader(
+            image_dir=str(image_dir),
+            batch_size=config['data']['batch_size'],
+            img_size=img_size,
+            num_workers=config['data']['num_workers'],
+            **source_kwargs,
+        )
+        cache_path = build_feature_cache(
+            model, architecture, loader, feature_cache_dir / architecture / split, key,
+            device=device, precision=precision, channels_last=channels_last,
+        )
+        splits[split] = load_feature_cache(cache_path)
+
+    print(f"\nTraining head on cached features ({len(splits['train'])} train, {len(splits['test'])} test)...\n")
+    best_accuracy, best_epoch = fit_head(
+        model,
+        architecture,
+        splits['train'],
+        splits['test'],
+        epochs=config['training'].get('head_epochs', 50),
+        learning_rate=config['training'].get('head_learning_rate', 0.001),
+        device=device,
+        verbose=config['training']['verbose'],
+        early_stopping_patience=config['training'].get('early_stopping_patience'),
+        early_stopping_min_delta=config['training'].get('early_stopping_min_delta', 0.0),
     )
-    parser.add_argument("--epochs", type=int, help="Number of epochs")
-    parser.add_argument("--batch-size", type=int, help="Batch size")
-    parser.add_argument("--learning-rate", type=float, help="Learning rate")
-    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Device to use")
+    print(f"\nHead trained: best test accuracy {best_accuracy:.3f} (epoch {best_epoch:03d})")
+    return best_accuracy, best_epoch
 
-    args = parser.parse_args()
 
-    # Load and override config
-    print(f"Loading config from: {args.config}")
-    config = load_config(args.config)
-    config = override_config(config, args)
+def setup_teacher(
+    config: dict,
+    train_loader,
+    train_dir: Path,
+    source_kwargs: dict,
+    num_classes: int,
+    device: str,
+    precision: str,
+    channels_last: bool,
+):
+    """
+    Distillation: load the teacher and return what supplies its logits.
+
+    With augmentation the teacher runs on every training batch. With
+    data.augment false every epoch sees the same images, so the teacher's
+    logits for each training image are computed once, cached on disk, and
+    looked up by sample index; the teacher is then not kept in memory.
+    """
+    ml_dir = Path(__file__).parent.parent
+    path = config['training']['distill_teacher']
+    architecture = config['training'].get('distill_teacher_architecture', 'densenet121')
+    print(f"\nLoading teacher ({architecture}) from {path}...")
+    teacher = load_model(path, architecture, num_classes=num_classes, device=device, channels_last=channels_last)
+
+    if config['data'].get('augment', True):
+        print("  Teacher runs on every augmented training batch")
+        return OnlineTeacher(teacher, device, precision)
+
+    loader = create_eval_loader(
+        image_dir=str(train_dir),
+        batch_size=config['data']['batch_size'],
+        img_size=config['data']['img_size'],
+        num_workers=config['data']['num_workers'],
+        **source_kwargs,
+    )
+    if samples_fingerprint(loader.dataset.samples) != samples_fingerprint(train_loader.dataset.samples):
+        raise RuntimeError("Teacher cache loader and train loader list different samples")
+
+    stat = os.stat(path)
+    key = {
+        "teacher": {"path": str(Path(path).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        "architecture": architecture,
+        "img_size": config['data']['img_size'],
+        "precision": precision,
+    }
+    cache_path = ml_dir / config['training'].get('distill_cache_dir', 'datasets/teacher_logits') / architecture / "train"
+
+    # Rank 0 fills the cache; the other ranks then read it
+    if idist.get_rank() == 0:
+        logits = build_teacher_cache(teacher, loader, cache_path, key, device, precision, channels_last)
+    if idist.get_world_size() > 1:
+        idist.barrier()
+    if idist.get_rank() != 0:
+        logits = build_teacher_cache(teacher, loader, cache_path, key, device, precision, channels_last)
+    return CachedTeacher(logits, device)
+
+
+def training(local_rank: int, config: dict, hooks: Sequence[Callable] = ()) -> dict:
+    """
+    Train in one process; under idist.Parallel this runs once per rank.
+
+    Args:
+        local_rank: Process index on this machine
+        config: Training configuration (validated by `check_config`)
+        hooks: Callables `hook(trainer, evaluator)` run after the standard
+            callbacks are attached, e.g. to add handlers that read
+            `trainer.state.val_metrics` (see scripts/sweep.py)
+
+    Returns:
+        Dict with 'best_accuracy', 'best_epoch' and 'epochs' (epochs run)
+    """
+    rank = idist.get_rank()
+    world_size = idist.get_world_size()
+    distributed = world_size > 1
+
+    if rank != 0:
+        # Only rank 0 reports progress; errors still go to stderr
+        sys.stdout = open(os.devnull, 'w')
 
     # Set up paths from config (relative to ml/ directory)
     ml_dir = Path(__file__).parent.parent
     train_dir = ml_dir / config['data']['train_dir']
     test_dir = ml_dir / config['data']['test_dir']
+    cache_dir = config['data'].get('cache_dir')
+    manifest = config['data'].get('manifest')
+    resized_dir = config['data'].get('resized_dir')
+    index_dir = config['data'].get('index_dir')
     output_dir = ml_dir / config['output']['dir']
 
-    # Verify directories exist
-    if not train_dir.exists():
-        print(f"\nERROR: Training directory does not exist: {train_dir}")
-        print("Run 'make download-data' to download the dataset first.\n")
-        exit(1)
-    if not test_dir.exists():
-        print(f"\nERROR: Test directory does not exist: {test_dir}")
-        print("Run 'make download-data' to download the dataset first.\n")
-        exit(1)
-
-    # Print configuration
-    print("\n" + "="*60)
-    print("TRAINING CONFIGURATION")
-    print("="*60)
-    print(f"Train directory: {train_dir}")
-    print(f"Test directory:  {test_dir}")
-    print(f"Output directory: {output_dir}")
-    print(f"Architecture:    {config['model']['architecture']}")
-    print(f"Batch size:      {config['data']['batch_size']}")
-    print(f"Epochs:          {config['training']['epochs']}")
-    print(f"Learning rate:   {config['training']['learning_rate']}")
-    print(f"Device:          {config['training']['device']}")
-    print("="*60 + "\n")
+    # Dataset source options shared by every loader
+    source_kwargs = {
+        'cache_dir': str(ml_dir / cache_dir) if cache_dir else None,
+        'cache_size': config['data'].get('cache_size'),
+        'manifest': str(ml_dir / manifest) if manifest else None,
+        'resized_dir': str(ml_dir / resized_dir) if resized_dir else None,
+    }
 
-    # Check device availability
     device = config['training']['device']
-    if device == "cuda" and not torch.cuda.is_available():
-        print("WARNING: CUDA requested but not available. Falling back to CPU.")
-        device = "cpu"
-        config['training']['device'] = device
+    if device == "cuda" and distributed:
+        device = str(idist.device())
+    elif distributed:
+        # Split the cores between processes instead of oversubscribing them
+        threads = config['training'].get('threads_per_process') or max(1, os.cpu_count() // world_size)
+        torch.set_num_threads(threads)
+        print(f"Threads per process: {threads} ({world_size} processes)")
+
+    augment_backend = config['data'].get('augment_backend', 'pil')
+    augment = config['data'].get('augment', True)
+    distill = bool(config['training'].get('distill_teacher'))
+    precision = config['training'].get('precision', 'fp32')
+    channels_last = config['training'].get('channels_last', False)
 
     # Create data loaders
     print("Loading dataset...")
-    train_loader, test_loader, num_classes, class_names = create_data_loaders(
-        train_dir=str(train_dir),
-        test_dir=str(test_dir),
-        batch_size=config['data']['batch_size'],
-        img_size=config['data']['img_size'],
-        num_workers=config['data']['num_workers'],
-    )
+    loader_kwargs = {
+        'train_dir': str(train_dir),
+        'test_dir': str(test_dir),
+        'batch_size': config['data']['batch_size'],
+        'img_size': config['data']['img_size'],
+        'num_workers': config['data']['num_workers'],
+        'augment_backend': augment_backend,
+        'distributed': distributed,
+        'sampling': config['data'].get('sampling', 'shuffle'),
+        'eval_batching': config['data'].get('eval_batching', 'sequential'),
+        'index_dir': str(ml_dir / index_dir) if index_dir else None,
+        'augment': augment,
+        'with_indices': distill and not augment,
+        'seed': config['training'].get('seed', 0),
+        **source_kwargs,
+    }
+    # Rank 0 builds missing image caches and sample indexes; the other ranks then read them
+    if rank == 0:
+        train_loader, test_loader, num_classes, class_names = create_data_loaders(**loader_kwargs)
+    if distributed:
+        idist.barrier()
+    if rank != 0:
+        train_loader, test_loader, num_classes, class_names = create_data_loaders(**loader_kwargs)
 
     # Create model
     print("\nCreating model...")
@@ -116,17 +296,92 @@ def main():
         num_classes=num_classes,
         pretrained=config['model']['pretrained'],
         device=device,
+        channels_last=channels_last,
     )
+    if config['model'].get('init_checkpoint'):
+        load_backbone(model, config['model']['architecture'], config['model']['init_checkpoint'])
+
+    if config['training'].get('freeze_backbone'):
+        best_accuracy, best_epoch = train_head_on_features(
+            config, model, train_dir, test_dir, source_kwargs, device, precision, channels_last
+        )
+
+        finetune_blocks = config['training'].get('finetune_blocks', 0)
+        if not finetune_blocks:
+            final_model_path = output_dir / f"{config['output']['model_name']}_final.pt"
+            output_dir.mkdir(parents=True, exist_ok=True)
+            torch.save(model.state_dict(), final_model_path)
+            print(f"\nFinal model saved to: {final_model_path}")
+            print("\nTraining complete!")
+            return {"best_accuracy": best_accuracy, "best_epoch": best_epoch, "epochs": 0}
+
+        # Continue on images with the last backbone stages unfrozen
+        freeze_backbone(model, config['model']['architecture'], finetune_blocks)
+        config['training']['learning_rate'] = config['training'].get('finetune_learning_rate', 0.0001)
+        print(f"\nFine-tuning the head and last {finetune_blocks} backbone stages...")
+
+    # Checkpoints and the final model store the plain (unwrapped) model
+    model_without_ddp = model
+    if distributed:
+        model = nn.parallel.DistributedDataParallel(
+            model, device_ids=[local_rank] if device.startswith("cuda") else None
+        )
+
+    teacher = None
+    loss_fn = nn.CrossEntropyLoss()
+    if distill:
+        teacher = setup_teacher(
+            config, train_loader, train_dir, source_kwargs, num_classes, device, precision, channels_last
+        )
+        loss_fn = DistillationLoss(
+            alpha=config['training'].get('distill_alpha', 0.7),
+            temperature=config['training'].get('distill_temperature', 4.0),
+        )
 
     # Set up training
     print("\nSetting up training...")
-    loss_fn = nn.CrossEntropyLoss()
     optimizer = torch.optim.Adam(
         (p for p in model.parameters() if p.requires_grad),
         lr=config['training']['learning_rate']
     )
 
-    trainer, evaluator = create_trainer(model, optimizer, loss_fn, device)
+    # Per-phase timing report (rank 0 only; the phases are the same on every rank)
+    timer = None
+    if config['training'].get('profile') and rank == 0:
+        timer = StageTimer(device, synchronize=config['training'].get('profile_sync_cuda', True))
+
+    train_metrics = config['training'].get('train_metrics', 'full')
+    trainer, evaluator = create_trainer(
+        model, optimizer, loss_fn, device,
+        train_metrics=train_metrics,
+        precision=precision,
+        channels_last=channels_last,
+        batch_transform=(
+            BatchAugment(img_size=config['data']['img_size']).to(device)
+            if augment_backend == "tensor" else None
+        ),
+        timer=timer,
+        num_classes=num_classes,
+        top_k=config['training'].get('top_k', [3, 5]),
+        teacher=teacher,
+    )
+
+    train_eval_loader = None
+    if train_metrics == "subsample":
+        train_eval_loader = create_train_eval_loader(
+            train_dir=str(train_dir),
+            num_samples=config['training']['train_eval_samples'],
+            batch_size=config['data']['batch_size'],
+            img_size=config['data']['img_size'],
+            num_workers=config['data']['num_workers'],
+            distributed=distributed,
+            **source_kwargs,
+        )
+
+    # Only rank 0 writes checkpoints
+    checkpoint_writer = None
+    if rank == 0 and config['output'].get('async_checkpoints'):
+        checkpoint_writer = AsyncCheckpointWriter()
 
     # Set up callbacks
     setup_callbacks(
@@ -136,22 +391,248 @@ def main():
         test_loader=test_loader,
         output_dir=str(output_dir),
         verbose=config['training']['verbose'],
+        train_metrics=train_metrics,
+        train_eval_loader=train_eval_loader,
+        keep_last=config['output'].get('keep_last'),
+        early_stopping_patience=config['training'].get('early_stopping_patience'),
+        early_stopping_min_delta=config['training'].get('early_stopping_min_delta', 0.0),
+        checkpoint_writer=checkpoint_writer,
+        save_checkpoints=rank == 0,
+        eval_reports=config['training'].get('eval_reports', False),
+        class_names=class_names,
     )
 
+    if timer is not None:
+        attach_profiling(
+            trainer,
+            evaluator,
+            timer,
+            str(output_dir),
+            trace_start=config['training'].get('profile_trace_start'),
+            trace_iterations=config['training'].get('profile_trace_iterations', 5),
+        )
+
+    for hook in hooks:
+        hook(trainer, evaluator)
+
     # Store model and optimizer in engine state for checkpointing
-    trainer.state.model = model
+    trainer.state.model = model_without_ddp
     trainer.state.optimizer = optimizer
 
+    attach_resume_checkpoints(
+        trainer,
+        str(output_dir),
+        every=config['output'].get('checkpoint_every'),
+        checkpoint_writer=checkpoint_writer,
+        save_checkpoints=rank == 0,
+        handle_sigterm=not distributed,
+    )
+
+    # Continue an interrupted run exactly where its checkpoint left off
+    epochs = config['training']['epochs']
+    resume = config['training'].get('resume')
+    if resume:
+        resume_path = find_resume_checkpoint(output_dir) if resume == "latest" else Path(resume)
+        load_checkpoint(model_without_ddp, optimizer, str(resume_path), trainer=trainer, train_loader=train_loader)
+        if trainer.state.iteration >= epochs * len(train_loader):
+            print(f"Checkpoint already completed {trainer.state.epoch} epochs; raise --epochs to train further")
+            if checkpoint_writer is not None:
+                checkpoint_writer.close()
+            return {
+                "best_accuracy": trainer.state.best_accuracy,
+                "best_epoch": trainer.state.best_epoch,
+                "epochs": trainer.state.epoch,
+            }
+        print(
+            f"Resuming at epoch {trainer.state.epoch + 1:03d}, batch "
+            f"{trainer.state.iteration % len(train_loader)} of {len(train_loader)}"
+        )
+
     # Train!
     print("\nStarting training...\n")
-    trainer.run(train_loader, max_epochs=config['training']['epochs'])
+    try:
+        trainer.run(train_loader, max_epochs=epochs)
+    finally:
+        if checkpoint_writer is not None:
+            checkpoint_writer.close()
+
+    if trainer.state.interrupted:
+        print("\nTraining interrupted. Continue with: python scripts/train.py --config <config> --resume")
+        return {
+            "best_accuracy": trainer.state.best_accuracy,
+            "best_epoch": trainer.state.best_epoch,
+            "epochs": trainer.state.epoch,
+        }
 
     # Save final model
-    final_model_path = output_dir / f"{config['output']['model_name']}_final.pt"
-    torch.save(model.state_dict(), final_model_path)
-    print(f"\nFinal model saved to: {final_model_path}")
+    if rank == 0:
+        final_model_path = output_dir / f"{config['output']['model_name']}_final.pt"
+        torch.save(model_without_ddp.state_dict(), final_model_path)
+        print(f"\nFinal model saved to: {final_model_path}")
+    if trainer.state.best_epoch is not None:
+        print(
+            f"Best test accuracy: {trainer.state.best_accuracy:.3f} "
+            f"(epoch {trainer.state.best_epoch:03d}, {output_dir / 'best.pt'})"
+        )
 
     print("\nTraining complete!")
+    return {
+        "best_accuracy": trainer.state.best_accuracy,
+        "best_epoch": trainer.state.best_epoch,
+        "epochs": trainer.state.epoch,
+    }
+
+
+def check_config(config: dict) -> dict:
+    """
+    Check data paths and fall back to what this machine supports.
+
+    Exits if a split directory is missing; drops a missing manifest, and
+    switches CUDA to CPU and fp16 to bf16 when no GPU is available.
+    """
+    # Set up paths from config (relative to ml/ directory)
+    ml_dir = Path(__file__).parent.parent
+    train_dir = ml_dir / config['data']['train_dir']
+    test_dir = ml_dir / config['data']['test_dir']
+    manifest = config['data'].get('manifest')
+
+    # Verify directories exist
+    if not train_dir.exists():
+        print(f"\nERROR: Training directory does not exist: {train_dir}")
+        print("Run 'make download-data' to download the dataset first.\n")
+        exit(1)
+    if not test_dir.exists():
+        print(f"\nERROR: Test directory does not exist: {test_dir}")
+        print("Run 'make download-data' to download the dataset first.\n")
+        exit(1)
+    if manifest and not (ml_dir / manifest).exists():
+        print(f"WARNING: Manifest not found at {ml_dir / manifest}, walking image directories")
+        config['data']['manifest'] = None
+
+    # Check device availability
+    device = config['training']['device']
+    if device == "cuda" and not torch.cuda.is_available():
+        print("WARNING: CUDA requested but not available. Falling back to CPU.")
+        device = "cpu"
+        config['training']['device'] = device
+
+    if config['training'].get('precision') == "fp16" and device != "cuda":
+        print("WARNING: fp16 autocast requires CUDA. Using bf16 on CPU.")
+        config['training']['precision'] = "bf16"
+
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train pacemaker classifier")
+    parser.add_argument(
+        "--config",
+        type=str,
+        default="configs/base.yaml",
+        help="Path to config file"
+    )
+    parser.add_argument("--epochs", type=int, help="Number of epochs")
+    parser.add_argument("--batch-size", type=int, help="Batch size")
+    parser.add_argument("--learning-rate", type=float, help="Learning rate")
+    parser.add_argument("--device", type=str, choices=["cuda", "cpu"], help="Device to use")
+    parser.add_argument("--nproc", type=int, help="Data-parallel worker processes on this machine")
+    parser.add_argument(
+        "--resume",
+        type=str,
+        nargs="?",
+        const="latest",
+        help="Continue from a checkpoint (default: the newest in output.dir), restoring "
+             "the epoch, batch position, RNG states and optimizer"
+    )
+
+    args = parser.parse_args()
+
+    # Load and override config
+    print(f"Loading config from: {args.config}")
+    config = load_config(args.config)
+    config = override_config(config, args)
+    config = check_config(config)
+
+    # Set up paths from config (relative to ml/ directory)
+    ml_dir = Path(__file__).parent.parent
+    train_dir = ml_dir / config['data']['train_dir']
+    test_dir = ml_dir / config['data']['test_dir']
+    output_dir = ml_dir / config['output']['dir']
+    device = config['training']['device']
+
+    # Launch mode: a single process, N spawned data-parallel processes, or an
+    # external launcher such as torchrun (detected from its WORLD_SIZE variable)
+    nproc = config['training'].get('nproc') or 1
+    launched = "WORLD_SIZE" in os.environ
+    backend = None
+    if nproc > 1 or launched:
+        backend = "nccl" if device == "cuda" else "gloo"
+
+    if config['training'].get('distill_teacher'):
+        if config['training'].get('freeze_backbone'):
+            print("\nERROR: distillation trains the whole student; disable freeze_backbone.\n")
+            exit(1)
+        if not Path(config['training']['distill_teacher']).exists():
+            print(f"\nERROR: Teacher checkpoint not found: {config['training']['distill_teacher']}\n")
+            exit(1)
+
+    resume = config['training'].get('resume')
+    if resume:
+        if config['training'].get('freeze_backbone'):
+            print("\nERROR: --resume continues image training; it does not apply to freeze_backbone.\n")
+            exit(1)
+        resume_path = find_resume_checkpoint(output_dir) if resume == "latest" else Path(resume)
+        if resume_path is None or not resume_path.exists():
+            print(f"\nERROR: No checkpoint to resume from ({resume if resume != 'latest' else output_dir})\n")
+            exit(1)
+        config['training']['resume'] = str(resume_path)
+
+    if config['training'].get('freeze_backbone'):
+        if backend:
+            print("\nERROR: freeze_backbone trains in a single process; drop --nproc / torchrun.\n")
+            exit(1)
+        if not config['model']['pretrained'] and not config['model'].get('init_checkpoint'):
+            print("WARNING: freeze_backbone with a randomly initialized backbone; "
+                  "set model.pretrained or model.init_checkpoint")
+
+    # Print configuration
+    print("\n" + "="*60)
+    print("TRAINING CONFIGURATION")
+    print("="*60)
+    print(f"Train directory: {train_dir}")
+    print(f"Test directory:  {test_dir}")
+    print(f"Output directory: {output_dir}")
+    print(f"Architecture:    {config['model']['architecture']}")
+    print(f"Batch size:      {config['data']['batch_size']}" + (" per process" if backend else ""))
+    print(f"Epochs:          {config['training']['epochs']}")
+    print(f"Learning rate:   {config['training']['learning_rate']}")
+    print(f"Device:          {device}")
+    print(f"Precision:       {config['training'].get('precision', 'fp32')}")
+    print(f"Channels last:   {config['training'].get('channels_last', False)}")
+    print(f"Train metrics:   {config['training'].get('train_metrics', 'full')}")
+    if config['training'].get('freeze_backbone'):
+        print(
+            f"Frozen backbone: head on cached features, then "
+            f"{config['training'].get('finetune_blocks', 0)} stages fine-tuned"
+        )
+    if config['training'].get('distill_teacher'):
+        print(
+            f"Distillation:    {config['training'].get('distill_teacher_architecture', 'densenet121')} teacher, "
+            f"alpha {config['training'].get('distill_alpha', 0.7)}, "
+            f"T {config['training'].get('distill_temperature', 4.0)}, "
+            f"{'online' if config['data'].get('augment', True) else 'cached logits'}"
+        )
+    if backend:
+        print(f"Distributed:     {backend}, {'torchrun' if launched else nproc} processes")
+    if resume:
+        print(f"Resume from:     {resume_path}")
+    print("="*60 + "\n")
+
+    with idist.Parallel(
+        backend=backend,
+        nproc_per_node=nproc if backend and not launched else None,
+    ) as parallel:
+        parallel.run(training, config)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,19 @@
 """Data loading and preprocessing modules"""
 
-from .dataset import create_data_loaders
+import importlib
 
-__all__ = ["create_data_loaders"]
+# Resolved on first access, so importing one submodule does not import the others
+_EXPORTS = {
+    "BatchAugment": ".batch_augment",
+    "create_data_loaders": ".dataset",
+    "create_eval_loader": ".dataset",
+    "create_train_eval_loader": ".dataset",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,125 @@
+"""Vectorized batch augmentation on the training device"""
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from typing import Tuple
+
+# ITU-R 601-2 luma weights, as used by torchvision's rgb_to_grayscale
+_LUMA = (0.2989, 0.587, 0.114)
+
+
+def _uniform(n: int, low: float, high: float, device) -> torch.Tensor:
+    return torch.empty(n, device=device).uniform_(low, high)
+
+
+class BatchAugment(nn.Module):
+    """
+    Batched equivalent of the training transforms in `get_transforms` after the crop.
+
+    The loader of the 'tensor' backend takes the same square
+    RandomResizedCrop as the PIL pipeline (so the aspect ratio is kept) and
+    yields uint8 (B, 3, img_size, img_size) batches. On the training device
+    this module then applies, with independent parameters per sample:
+
+        RandomAffine(degrees=5, translate=(0.05, 0.05), scale=(0.95, 1.05), shear=5)
+        ColorJitter(brightness=0.3, contrast=0.3, saturation=0.3)
+        ToTensor + Normalize
+
+    Parameters are drawn from the same distributions as torchvision. The
+    affine is resampled with bilinear interpolation and zero fill. Color
+    jitter ops run in an independent random order per sample, like
+    ColorJitter.
+    """
+
+    def __init__(
+        self,
+        img_size: int = 224,
+        mean: Tuple[float, float, float] = (0.485, 0.456, 0.406),
+        std: Tuple[float, float, float] = (0.229, 0.224, 0.225),
+        degrees: float = 5.0,
+        translate: float = 0.05,
+        scale: Tuple[float, float] = (0.95, 1.05),
+        shear: float = 5.0,
+        jitter: float = 0.3,
+    ):
+        super().__init__()
+        self.img_size = img_size
+        self.degrees = degrees
+        self.translate = translate
+        self.scale = scale
+        self.shear = shear
+        self.jitter = jitter
+        self.register_buffer("mean", torch.tensor(mean).view(1, 3, 1, 1))
+        self.register_buffer("std", torch.tensor(std).view(1, 3, 1, 1))
+        self.register_buffer("luma", torch.tensor(_LUMA).view(1, 3, 1, 1))
+
+    def _sampling_grid(self, x: torch.Tensor) -> torch.Tensor:
+        """Grid mapping output pixels through the inverse affine to input pixels"""
+        n, device = x.shape[0], x.device
+
+        # RandomAffine: rotation, x-shear, scale and translation (normalized coords span 2)
+        angle = torch.deg2rad(_uniform(n, -self.degrees, self.degrees, device))
+        shear = torch.deg2rad(_uniform(n, -self.shear, self.shear, device))
+        zoom = _uniform(n, *self.scale, device)
+        shift = 2 * self.translate * _uniform(2 * n, -1.0, 1.0, device).view(n, 2)
+
+        # Forward affine A = zoom * R(angle) @ [[1, -tan(shear)], [0, 1]] (torchvision's RSS)
+        cos, sin, tan = torch.cos(angle), torch.sin(angle), torch.tan(shear)
+        a = torch.stack([
+            torch.stack([cos, -cos * tan - sin], dim=1),
+            torch.stack([sin, -sin * tan + cos], dim=1),
+        ], dim=1) * zoom.view(n, 1, 1)
+        a_inv = torch.linalg.inv(a)
+
+        # Output v -> input coords u = A^-1 (v - t)
+        theta = torch.empty(n, 2, 3, device=device)
+        theta[:, :, :2] = a_inv
+        theta[:, :, 2] = -torch.bmm(a_inv, shift.unsqueeze(2)).squeeze(2)
+
+        size = (n, x.shape[1], self.img_size, self.img_size)
+        return F.affine_grid(theta, size, align_corners=False)
+
+    def _grayscale(self, x: torch.Tensor) -> torch.Tensor:
+        return (x * self.luma).sum(dim=1, keepdim=True)
+
+    def _color_jitter(self, x: torch.Tensor) -> torch.Tensor:
+        n, device = x.shape[0], x.device
+        low, high = max(0.0, 1 - self.jitter), 1 + self.jitter
+        factors = _uniform(3 * n, low, high, device).view(3, n, 1, 1, 1)
+
+        # Independent op order per sample: rank of random keys gives a permutation
+        order = torch.rand(n, 3, device=device).argsort(dim=1)
+
+        for step in range(3):
+            op = order[:, step].view(n, 1, 1, 1)
+
+            # brightness: blend with black
+            bright = x * factors[0]
+            # contrast: blend with the mean gray level of each image
+            gray_mean = self._grayscale(x).mean(dim=(2, 3), keepdim=True)
+            contrast = factors[1] * x + (1 - factors[1]) * gray_mean
+            # saturation: blend with the grayscale image
+            saturated = factors[2] * x + (1 - factors[2]) * self._grayscale(x)
+
+            x = torch.where(op == 0, bright, torch.where(op == 1, contrast, saturated))
+            x = x.clamp(0.0, 1.0)
+
+        return x
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        """
+        Augment and normalize a batch.
+
+        Args:
+            x: uint8 tensor of shape (B, 3, img_size, img_size)
+
+        Returns:
+            Normalized float tensor of shape (B, 3, img_size, img_size)
+        """
+        x = x.float().div_(255)
+        x = F.grid_sample(
+            x, self._sampling_grid(x), mode="bilinear", padding_mode="zeros", align_corners=False
+        )
+        x = self._color_jitter(x)
+        return (x - self.mean) / self.std
@@ -0,0 +1,250 @@
+"""Manifest-backed ImageFolder and a memory-mapped cache of pre-decoded images"""
+
+import fcntl
+import json
+import os
+import hashlib
+import numpy as np
+import torch
+import torchvision
+from PIL import Image
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .manifest import manifest_classes, manifest_entries, variant_entries
+from .resized import VARIANT_INDEX
+
+CACHE_VERSION = 1
+IMAGES_FILE = "images.u8"
+INDEX_FILE = "index.json"
+
+
+def samples_fingerprint(samples: List[Tuple[str, int]]) -> str:
+    """Hash of every sample's path, label, size and mtime"""
+    digest = hashlib.sha256()
+    for path, label in samples:
+        stat = os.stat(path)
+        digest.update(f"{path}\0{label}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Exclusive lock on `<path>.lock` shared by every process on the machine.
+
+    Cache builders hold it while they check and (re)build a cache, so
+    processes sharing a cache directory (DDP ranks, parallel sweep trials)
+    build it once and the others then find it ready.
+    """
+    lock_path = Path(f"{path}.lock")
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _decode(path: str, size: int) -> np.ndarray:
+    """Decode an image file to a (size, size, 3) uint8 array"""
+    with Image.open(path) as img:
+        # Let the JPEG decoder downscale in DCT space before the real resize
+        img.draft("RGB", (size, size))
+        img = img.convert("RGB").resize((size, size), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def root_key(root: str) -> str:
+    """
+    Name for per-root caches: the directory name plus a short hash of its path.
+
+    Split roots and their resized variants share a name (`.../256/Train`),
+    so the name alone would make them overwrite each other's caches.
+    """
+    root = Path(root).resolve()
+    return f"{root.name}_{hashlib.sha256(str(root).encode()).hexdigest()[:8]}"
+
+
+def cache_path_for(root: str, cache_dir: str, size: int) -> Path:
+    """Directory holding the cache of `root` at canonical `size`"""
+    return Path(cache_dir) / f"{root_key(root)}_{size}"
+
+
+class ManifestImageFolder(torchvision.datasets.ImageFolder):
+    """
+    ImageFolder whose classes and samples come from a manifest.
+
+    Avoids walking and stat-ing the class directories on every start-up;
+    the manifest can also be a filtered subset of the files on disk (e.g.
+    the deduplicated manifest of scripts/dedup.py). `root` may be a
+    pre-resized variant of the split, whose copies then stand in for the
+    manifest's files. The class list is that of the whole manifest, so every
+    split maps class names to the same indices.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        manifest_path: str,
+        split: Optional[str] = None,
+        transform: Optional[Callable] = None,
+    ):
+        self._classes = manifest_classes(manifest_path)
+        self._entries = manifest_entries(manifest_path, split or Path(root).name)
+        if (Path(root) / VARIANT_INDEX).exists():
+            self._entries = variant_entries(root, self._entries)
+        super().__init__(root, transform=transform)
+
+    def find_classes(self, directory: str):
+        return self._classes, {name: i for i, name in enumerate(self._classes)}
+
+    def make_dataset(
+        self,
+        directory: str,
+        class_to_idx: Dict[str, int],
+        extensions=None,
+        is_valid_file=None,
+        allow_empty: bool = False,
+    ):
+        return [
+            (os.path.join(directory, entry["path"]), class_to_idx[entry["class"]])
+            for entry in self._entries
+        ]
+
+
+def build_tensor_cache(
+    root: str,
+    cache_dir: str,
+    size: int = 224,
+    num_threads: int = 8,
+    manifest: Optional[str] = None,
+) -> Path:
+    """
+    Decode an ImageFolder tree once into a memory-mapped uint8 array.
+
+    Every image is converted to RGB, resized to (size, size) and written to
+    a single `images.u8` file of shape (N, size, size, 3). `index.json`
+    stores the class list, labels and a fingerprint of the source files;
+    it is written last, so a cache without it is treated as incomplete.
+    The cache is reused as long as the fingerprint still matches. Processes
+    building the same cache at once are serialized by `file_lock`, so only
+    the first one decodes the images.
+
+    Args:
+        root: ImageFolder root directory (one subdirectory per class)
+        cache_dir: Directory to store caches in
+        size: Canonical square size images are resized to
+        num_threads: Decoder threads (PIL releases the GIL while decoding)
+        manifest: Manifest to take the sample list from instead of walking `root`
+
+    Returns:
+        Path to the cache directory
+    """
+    if manifest is not None:
+        folder = ManifestImageFolder(root, manifest)
+    else:
+        folder = torchvision.datasets.ImageFolder(root)
+    cache_path = cache_path_for(root, cache_dir, size)
+    index_path = cache_path / INDEX_FILE
+    fingerprint = samples_fingerprint(folder.samples)
+
+    with file_lock(cache_path):
+        if index_path.exists():
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            if (
+                index.get("version") == CACHE_VERSION
+                and index.get("size") == size
+                and index.get("fingerprint") == fingerprint
+            ):
+                return cache_path
+
+        print(f"Building image cache for {root} ({len(folder)} images at {size}x{size})...")
+        cache_path.mkdir(parents=True, exist_ok=True)
+        index_path.unlink(missing_ok=True)
+
+        # Per-process temp names, so concurrent builders never rename each other's files
+        shape = (len(folder), size, size, 3)
+        tmp_images = cache_path / f"{IMAGES_FILE}.{os.getpid()}.tmp"
+        images = np.memmap(tmp_images, dtype=np.uint8, mode='w+', shape=shape)
+
+        def fill(i: int):
+            images[i] = _decode(folder.samples[i][0], size)
+
+        with ThreadPoolExecutor(max_workers=max(1, num_threads)) as pool:
+            for done, _ in enumerate(pool.map(fill, range(len(folder))), start=1):
+                if done % 500 == 0 or done == len(folder):
+                    print(f"\r  Decoded {done}/{len(folder)}", end='')
+        print()
+
+        images.flush()
+        del images
+        os.replace(tmp_images, cache_path / IMAGES_FILE)
+
+        index = {
+            "version": CACHE_VERSION,
+            "root": str(Path(root).resolve()),
+            "size": size,
+            "shape": list(shape),
+            "classes": folder.classes,
+            "samples": [[path, label] for path, label in folder.samples],
+            "fingerprint": fingerprint,
+        }
+        tmp_index = cache_path / f"{INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_index, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_index, index_path)
+
+        print(f"  Cache written to {cache_path}")
+        return cache_path
+
+
+class CachedImageFolder(torch.utils.data.Dataset):
+    """
+    ImageFolder-compatible dataset backed by a `build_tensor_cache` array.
+
+    The array is opened read-only with np.memmap, so samples are zero-copy
+    slices of the page cache shared by the main process and every DataLoader
+    worker. The memmap is opened lazily and dropped when pickled, so each
+    worker maps the file itself instead of receiving a copy of it.
+    """
+
+    def __init__(self, cache_path: str, transform: Optional[Callable] = None):
+        self.cache_path = Path(cache_path)
+        self.transform = transform
+
+        with open(self.cache_path / INDEX_FILE, 'r') as f:
+            index = json.load(f)
+
+        self.root = index["root"]
+        self.shape = tuple(index["shape"])
+        self.classes = index["classes"]
+        self.class_to_idx = {name: i for i, name in enumerate(self.classes)}
+        self.samples = [(path, label) for path, label in index["samples"]]
+        self.targets = [label for _, label in self.samples]
+        self._images = None
+
+    def _array(self) -> np.memmap:
+        if self._images is None:
+            self._images = np.memmap(
+                self.cache_path / IMAGES_FILE, dtype=np.uint8, mode='r', shape=self.shape
+            )
+        return self._images
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, idx: int):
+        img = Image.fromarray(self._array()[idx])
+        if self.transform is not None:
+            img = self.transform(img)
+        return img, self.targets[idx]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_images"] = None
+        return state
@@ -2,9 +2,27 @@
 
 import torch
 import torchvision
+from PIL import Image
+from torch.utils.data.distributed import DistributedSampler
 from torchvision import transforms
+from torchvision.datasets.folder import IMG_EXTENSIONS
 from pathlib import Path
-from typing import Tuple
+from typing import Callable, List, Optional, Tuple
+
+from .cache import CachedImageFolder, ManifestImageFolder, build_tensor_cache
+from .manifest import manifest_entries
+from .resized import find_resized_variant
+from .samplers import (
+    EVAL_BATCHING,
+    TRAIN_SAMPLING,
+    AspectRatioBatchSampler,
+    ClassBalancedSampler,
+    ResumableSampler,
+    build_sample_index,
+    crop_collate,
+)
+
+AUGMENT_BACKENDS = ("pil", "tensor")
 
 
 def get_transforms(
@@ -12,6 +30,7 @@ def get_transforms(
     mean: Tuple[float, float, float] = (0.485, 0.456, 0.406),
     std: Tuple[float, float, float] = (0.229, 0.224, 0.225),
     augment: bool = True,
+    backend: str = "pil",
 ) -> transforms.Compose:
     """
     Get image transforms for training or testing.
@@ -24,11 +43,25 @@ def get_transforms(
         mean: Normalization mean per channel (ImageNet default)
         std: Normalization std per channel (ImageNet default)
         augment: Whether to apply data augmentation (for training)
+        backend: Where training augmentation runs: 'pil' (per sample, in the
+            DataLoader) or 'tensor' (the loader only takes the random square
+            crop and yields uint8 img_size x img_size tensors; `BatchAugment`
+            applies the affine and color jitter and normalizes whole batches
+            on the training device)
 
     Returns:
         Composed transforms
     """
-    if augment:
+    if backend not in AUGMENT_BACKENDS:
+        raise ValueError(f"Unsupported augmentation backend: {backend}")
+
+    if augment and backend == "tensor":
+        # Same crop as the PIL pipeline, so neither backend distorts the aspect ratio
+        return transforms.Compose([
+            transforms.RandomResizedCrop(img_size, scale=(0.9, 1.0), ratio=(1.0, 1.0)),
+            transforms.PILToTensor(),
+        ])
+    elif augment:
         # Training transforms with data augmentation
         return transforms.Compose([
             transforms.RandomResizedCrop(img_size, scale=(0.9, 1.0), ratio=(1.0, 1.0)),
@@ -51,12 +84,236 @@ def get_transforms(
         ])
 
 
+def get_inference_transforms(
+    img_size: int = 224,
+    mean: Tuple[float, float, float] = (0.485, 0.456, 0.406),
+    std: Tuple[float, float, float] = (0.229, 0.224, 0.225),
+) -> transforms.Compose:
+    """
+    Get deterministic transforms for batched inference.
+
+    Same as the test transforms, plus a center crop so non-square images
+    still produce (3, img_size, img_size) tensors that can be batched.
+
+    Args:
+        img_size: Target image size (square)
+        mean: Normalization mean per channel (ImageNet default)
+        std: Normalization std per channel (ImageNet default)
+
+    Returns:
+        Composed transforms
+    """
+    return transforms.Compose([
+        transforms.Resize(img_size),
+        transforms.CenterCrop(img_size),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=mean, std=std),
+    ])
+
+
+class ImageFileDataset(torch.utils.data.Dataset):
+    """
+    Unlabelled dataset over a list of image paths.
+
+    Yields `(image, index, ok)`; files that fail to decode yield a zero
+    tensor with `ok=False` so one corrupt file does not abort a long run.
+    """
+
+    def __init__(self, paths: List[str], transform: transforms.Compose, img_size: int = 224):
+        self.paths = [str(p) for p in paths]
+        self.transform = transform
+        self.img_size = img_size
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, idx: int):
+        try:
+            with Image.open(self.paths[idx]) as img:
+                image = self.transform(img.convert("RGB"))
+            return image, idx, True
+        except (OSError, ValueError):
+            return torch.zeros(3, self.img_size, self.img_size), idx, False
+
+
+class IndexedDataset(torch.utils.data.Dataset):
+    """
+    Wraps a labelled dataset to yield `(image, label, index)`.
+
+    The index lets per-sample data computed ahead of time (e.g. cached
+    teacher logits) be looked up for each batch. Other attributes such as
+    `classes`, `samples` and `targets` are read from the wrapped dataset.
+    """
+
+    def __init__(self, dataset: torch.utils.data.Dataset):
+        self.dataset = dataset
+
+    def __len__(self) -> int:
+        return len(self.dataset)
+
+    def __getitem__(self, idx: int):
+        image, label = self.dataset[idx]
+        return image, label, idx
+
+    def __getattr__(self, name):
+        if name == "dataset":
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+
+def list_images(inputs: List[str]) -> List[Path]:
+    """
+    Expand directories and file lists into a sorted list of image paths.
+
+    Args:
+        inputs: Directories (searched recursively), image files, or .txt
+            files containing one image path per line
+
+    Returns:
+        List of image paths
+    """
+    paths = []
+    for item in inputs:
+        item = Path(item)
+        if item.is_dir():
+            paths.extend(
+                sorted(p for p in item.rglob("*") if p.suffix.lower() in IMG_EXTENSIONS)
+            )
+        elif item.suffix.lower() == ".txt":
+            with open(item, 'r') as f:
+                paths.extend(Path(line.strip()) for line in f if line.strip())
+        else:
+            paths.append(item)
+    return paths
+
+
+def resolve_image_root(
+    root: str,
+    img_size: int,
+    resized_dir: Optional[str] = None,
+    manifest: Optional[str] = None,
+) -> Path:
+    """
+    Switch an ImageFolder root to its pre-resized variant when one exists.
+
+    Args:
+        root: Original ImageFolder root
+        img_size: Image size the loader produces
+        resized_dir: Directory `download_data.py` writes resized variants to
+            (None always uses `root`)
+        manifest: Manifest of the original files, if the loader uses one; a
+            variant must still match its entries. The manifest keeps selecting
+            the samples from a variant (`ManifestImageFolder` maps its files
+            to their resized copies), so a filtered manifest applies either way.
+
+    Returns:
+        Root to load
+    """
+    if resized_dir is None:
+        return Path(root)
+    entries = manifest_entries(manifest, Path(root).name) if manifest is not None else None
+    variant = find_resized_variant(root, resized_dir, img_size, entries)
+    return variant if variant is not None else Path(root)
+
+
+def load_image_folder(
+    root: str,
+    transform: transforms.Compose,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    manifest: Optional[str] = None,
+) -> torch.utils.data.Dataset:
+    """
+    Load an ImageFolder dataset, optionally through the decoded image cache.
+
+    Args:
+        root: ImageFolder root directory
+        transform: Transforms applied to each PIL image
+        cache_dir: Directory for memory-mapped caches (None reads the files directly)
+        cache_size: Canonical square size of cached images
+        manifest: Manifest to build the sample list from (None walks `root`)
+
+    Returns:
+        Dataset with ImageFolder's `classes` and `targets` attributes
+    """
+    if cache_dir is None:
+        if manifest is not None:
+            return ManifestImageFolder(root, manifest, transform=transform)
+        return torchvision.datasets.ImageFolder(root, transform=transform)
+
+    cache_path = build_tensor_cache(root, cache_dir, size=cache_size, manifest=manifest)
+    return CachedImageFolder(cache_path, transform=transform)
+
+
+def make_eval_loader(
+    dataset: torch.utils.data.Dataset,
+    batch_size: int,
+    num_workers: int = 0,
+    sampler: Optional[torch.utils.data.Sampler] = None,
+    eval_batching: str = "sequential",
+    index_dir: Optional[str] = None,
+) -> torch.utils.data.DataLoader:
+    """
+    Wrap a non-augmented dataset in an unshuffled evaluation loader.
+
+    Args:
+        dataset: ImageFolder-like dataset using the test transforms
+        batch_size: Batch size
+        num_workers: Number of data loading workers (0 for main thread)
+        sampler: Sampler to batch from (e.g. DistributedSampler); None is sequential
+        eval_batching: 'sequential' or 'aspect' (batch images of similar
+            aspect ratio, so the aspect-preserving test resize needs no
+            common square shape)
+        index_dir: Where the sample index with image sizes is kept
+            (required for 'aspect')
+
+    Returns:
+        DataLoader
+    """
+    if eval_batching not in EVAL_BATCHING:
+        raise ValueError(f"Unsupported eval batching: {eval_batching}")
+
+    if eval_batching == "aspect":
+        if index_dir is None:
+            raise ValueError("eval_batching='aspect' requires an index_dir")
+        index = build_sample_index(dataset, index_dir)
+        batch_sampler = AspectRatioBatchSampler(
+            sampler or torch.utils.data.SequentialSampler(dataset), index["sizes"], batch_size
+        )
+        return torch.utils.data.DataLoader(
+            dataset,
+            batch_sampler=batch_sampler,
+            num_workers=num_workers,
+            collate_fn=crop_collate,
+        )
+
+    return torch.utils.data.DataLoader(
+        dataset,
+        batch_size=batch_size,
+        shuffle=False,
+        sampler=sampler,
+        num_workers=num_workers,
+    )
+
+
 def create_data_loaders(
     train_dir: str,
     test_dir: str,
     batch_size: int = 32,
     img_size: int = 224,
     num_workers: int = 0,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    manifest: Optional[str] = None,
+    augment_backend: str = "pil",
+    distributed: bool = False,
+    resized_dir: Optional[str] = None,
+    sampling: str = "shuffle",
+    eval_batching: str = "sequential",
+    index_dir: Optional[str] = None,
+    augment: bool = True,
+    with_indices: bool = False,
+    seed: int = 0,
 ) -> Tuple[torch.utils.data.DataLoader, torch.utils.data.DataLoader, int, list]:
     """
     Create training and testing data loaders from image directories.
@@ -80,6 +337,33 @@ def create_data_loaders(
         batch_size: Batch size for training
         img_size: Target image size
         num_workers: Number of data loading workers (0 for main thread)
+        cache_dir: If set, decode every image once into a memory-mapped cache
+            in this directory and train from it instead of the image files
+        cache_size: Square size of cached images (defaults to img_size)
+        manifest: Manifest written by download_data.py; samples are taken from
+            its 'Train'/'Test' splits (matched by directory name) instead of
+            walking the directories
+        augment_backend: 'pil' or 'tensor' (see `get_transforms`); with
+            'tensor' the train loader yields uint8 batches that must go
+            through `BatchAugment` on the device
+        distributed: Shard both datasets across torch.distributed ranks with
+            a DistributedSampler (batch_size is then per process). The
+            training sampler needs `set_epoch` each epoch to reshuffle.
+        resized_dir: Directory of pre-resized variants; each split is read
+            from the smallest variant with a short side >= img_size, if any
+        sampling: Training order: 'shuffle' (uniform over images) or
+            'balanced' (uniform over classes, with replacement; see
+            `ClassBalancedSampler`)
+        eval_batching: Test loader batching, 'sequential' or 'aspect'
+            (see `make_eval_loader`)
+        index_dir: Directory for the persistent sample index (labels and
+            image sizes) used by 'aspect' batching
+        augment: Augment training images (False uses the test transforms,
+            so every epoch sees the same inputs)
+        with_indices: Train loader yields `(images, labels, indices)` (see
+            `IndexedDataset`)
+        seed: Seed of the training order, which is a function of (seed,
+            epoch) only; the train loader's sampler is a `ResumableSampler`
 
     Returns:
         Tuple of (train_loader, test_loader, num_classes, class_names)
@@ -91,28 +375,53 @@ def create_data_loaders(
         raise ValueError(f"Training directory does not exist: {train_dir}")
     if not test_dir.exists():
         raise ValueError(f"Testing directory does not exist: {test_dir}")
+    if manifest is not None and not Path(manifest).exists():
+        raise ValueError(f"Manifest does not exist: {manifest}")
+    if sampling not in TRAIN_SAMPLING:
+        raise ValueError(f"Unsupported sampling: {sampling}")
 
     # Create transforms
-    train_transforms = get_transforms(img_size=img_size, augment=True)
+    train_transforms = get_transforms(img_size=img_size, augment=augment, backend=augment_backend)
     test_transforms = get_transforms(img_size=img_size, augment=False)
 
-    # Load datasets
-    train_data = torchvision.datasets.ImageFolder(train_dir, transform=train_transforms)
-    test_data = torchvision.datasets.ImageFolder(test_dir, transform=test_transforms)
+    # Load datasets (from the pre-resized variants when available)
+    cache_size = cache_size or img_size
+    train_root = resolve_image_root(train_dir, img_size, resized_dir, manifest)
+    test_root = resolve_image_root(test_dir, img_size, resized_dir, manifest)
+    train_data = load_image_folder(train_root, train_transforms, cache_dir, cache_size, manifest)
+    test_data = load_image_folder(test_root, test_transforms, cache_dir, cache_size, manifest)
+    if train_data.classes != test_data.classes:
+        raise ValueError(
+            f"Train and test splits have different classes ({len(train_data.classes)} vs "
+            f"{len(test_data.classes)}), so their label indices would not match: "
+            f"{sorted(set(train_data.classes) ^ set(test_data.classes))}"
+        )
+
+    # Create data loaders. The training order is seeded per epoch (a
+    # one-replica DistributedSampler when not distributed), so a resumed run
+    # can regenerate it and skip the part of the epoch already trained on.
+    test_sampler = None
+    if sampling == "balanced":
+        # Shards itself across ranks when distributed
+        train_sampler = ClassBalancedSampler(train_data.targets, seed=seed)
+    elif distributed:
+        train_sampler = DistributedSampler(train_data, shuffle=True, seed=seed)
+    else:
+        train_sampler = DistributedSampler(train_data, num_replicas=1, rank=0, shuffle=True, seed=seed)
+    if distributed:
+        test_sampler = DistributedSampler(test_data, shuffle=False)
+    train_sampler = ResumableSampler(train_sampler, seed=seed)
 
-    # Create data loaders
     train_loader = torch.utils.data.DataLoader(
-        train_data,
+        IndexedDataset(train_data) if with_indices else train_data,
         batch_size=batch_size,
-        shuffle=True,
+        sampler=train_sampler,
         num_workers=num_workers,
+        generator=train_sampler.generator,
     )
 
-    test_loader = torch.utils.data.DataLoader(
-        test_data,
-        batch_size=batch_size,
-        shuffle=False,
-        num_workers=num_workers,
+    test_loader = make_eval_loader(
+        test_data, batch_size, num_workers, test_sampler, eval_batching, index_dir
     )
 
     num_classes = len(train_data.classes)
@@ -123,5 +432,115 @@ def create_data_loaders(
     print(f"  Testing samples: {len(test_data)}")
     print(f"  Number of classes: {num_classes}")
     print(f"  Batch size: {batch_size}")
+    if cache_dir is not None:
+        print(f"  Image cache: {cache_dir} ({cache_size}x{cache_size})")
+    if manifest is not None:
+        print(f"  Manifest: {manifest}")
+    if train_root != train_dir:
+        print(f"  Resized variant: {train_root}")
+    print(f"  Augmentation: {augment_backend if augment else 'off'}")
+    if sampling != "shuffle":
+        print(f"  Sampling: {sampling}")
+    if eval_batching != "sequential":
+        print(f"  Eval batching: {eval_batching}")
+    if distributed:
+        print(f"  Sharded across {train_sampler.sampler.num_replicas} processes")
 
     return train_loader, test_loader, num_classes, class_names
+
+
+def create_train_eval_loader(
+    train_dir: str,
+    num_samples: int,
+    batch_size: int = 32,
+    img_size: int = 224,
+    num_workers: int = 0,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    manifest: Optional[str] = None,
+    seed: int = 0,
+    distributed: bool = False,
+    resized_dir: Optional[str] = None,
+) -> torch.utils.data.DataLoader:
+    """
+    Create a loader over a fixed random subsample of the training set.
+
+    Uses the test transforms (no augmentation), so it measures how well the
+    model fits the training data at a fraction of the cost of a full pass.
+
+    Args:
+        train_dir: Path to training images directory
+        num_samples: Number of training images to evaluate on
+        batch_size: Batch size
+        img_size: Target image size
+        num_workers: Number of data loading workers (0 for main thread)
+        cache_dir: Directory for memory-mapped caches (None reads the files directly)
+        cache_size: Square size of cached images (defaults to img_size)
+        manifest: Manifest to build the sample list from (None walks the directory)
+        seed: Seed for choosing the subsample (fixed so epochs are comparable)
+        distributed: Shard the subsample across torch.distributed ranks
+        resized_dir: Directory of pre-resized variants (see `resolve_image_root`)
+
+    Returns:
+        DataLoader over the subsample
+    """
+    eval_transforms = get_transforms(img_size=img_size, augment=False)
+    train_root = resolve_image_root(train_dir, img_size, resized_dir, manifest)
+    train_data = load_image_folder(
+        train_root, eval_transforms, cache_dir, cache_size or img_size, manifest
+    )
+
+    generator = torch.Generator().manual_seed(seed)
+    indices = torch.randperm(len(train_data), generator=generator)[:num_samples].tolist()
+
+    subset = torch.utils.data.Subset(train_data, indices)
+
+    return torch.utils.data.DataLoader(
+        subset,
+        batch_size=batch_size,
+        shuffle=False,
+        sampler=DistributedSampler(subset, shuffle=False) if distributed else None,
+        num_workers=num_workers,
+    )
+
+
+def create_eval_loader(
+    image_dir: str,
+    batch_size: int = 32,
+    img_size: int = 224,
+    num_workers: int = 0,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = None,
+    manifest: Optional[str] = None,
+    resized_dir: Optional[str] = None,
+    eval_batching: str = "sequential",
+    index_dir: Optional[str] = None,
+    transform: Optional[Callable] = None,
+) -> torch.utils.data.DataLoader:
+    """
+    Create an unshuffled, non-augmented loader over a whole ImageFolder split.
+
+    Args:
+        image_dir: ImageFolder root directory
+        batch_size: Batch size
+        img_size: Target image size
+        num_workers: Number of data loading workers (0 for main thread)
+        cache_dir: Directory for memory-mapped caches (None reads the files directly)
+        cache_size: Square size of cached images (defaults to img_size)
+        manifest: Manifest to build the sample list from (None walks the directory)
+        resized_dir: Directory of pre-resized variants (see `resolve_image_root`)
+        eval_batching: 'sequential' or 'aspect' (see `make_eval_loader`)
+        index_dir: Directory for the persistent sample index
+        transform: Per-image transforms to use instead of the test transforms
+            (e.g. `inference.tta.get_tta_transforms`)
+
+    Returns:
+        DataLoader whose dataset has ImageFolder's `classes` and `samples`
+    """
+    eval_transforms = transform or get_transforms(img_size=img_size, augment=False)
+    root = resolve_image_root(image_dir, img_size, resized_dir, manifest)
+    dataset = load_image_folder(root, eval_transforms, cache_dir, cache_size or img_size, manifest)
+
+    return make_eval_loader(
+        dataset, batch_size, num_workers, eval_batching=eval_batching, index_dir=index_dir
+    )
@@ -0,0 +1,341 @@
+"""Near-duplicate detection with perceptual hashes and a multi-index Hamming search"""
+
+import json
+import os
+import numpy as np
+from PIL import Image
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DEDUP_VERSION = 1
+HASH_BITS = 64
+HASHES_FILE = "hashes.json"
+
+
+@lru_cache(maxsize=None)
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so `D @ x @ D.T` is the 2D DCT of an (n, n) block"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def perceptual_hash(path: str, hash_size: int = 8, highfreq_factor: int = 4) -> int:
+    """
+    64-bit DCT perceptual hash (pHash) of an image file.
+
+    The image is reduced to a (hash_size * highfreq_factor)^2 grayscale
+    thumbnail and each bit records whether one of the lowest-frequency DCT
+    coefficients is above their median. Re-encoding, resizing, small
+    crops and brightness changes move only a few bits, so near-copies are
+    close in Hamming distance.
+
+    Args:
+        path: Image file
+        hash_size: Side of the block of DCT coefficients kept (hash_size^2 bits)
+        highfreq_factor: Thumbnail size relative to hash_size
+
+    Returns:
+        The hash as an integer
+    """
+    size = hash_size * highfreq_factor
+    with Image.open(path) as img:
+        # Let the JPEG decoder downscale in DCT space before the real resize
+        img.draft("L", (size, size))
+        img = img.convert("L").resize((size, size), Image.BILINEAR)
+        pixels = np.asarray(img, dtype=np.float64)
+
+    dct = _dct_matrix(size)
+    coeffs = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    bits = (coeffs > np.median(coeffs)).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count("1")
+
+
+def _hash_job(path: str):
+    try:
+        return perceptual_hash(path), None
+    except Exception as e:
+        return None, f"{path}: {e}"
+
+
+def hash_images(paths: Sequence[str], workers: Optional[int] = None) -> List[Optional[int]]:
+    """
+    Perceptual hashes of many image files, computed in a process pool.
+
+    Args:
+        paths: Image files
+        workers: Hashing processes (None uses every core)
+
+    Returns:
+        Hash of each file, None for files that could not be decoded
+    """
+    hashes = []
+    if not paths:
+        return hashes
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, (value, error) in enumerate(pool.map(_hash_job, paths, chunksize=32), start=1):
+            if error is not None:
+                print(f"\n  WARNING: could not hash {error}")
+            hashes.append(value)
+            if done % 500 == 0 or done == len(paths):
+                print(f"\r  Hashed {done}/{len(paths)}", end='')
+    print()
+    return hashes
+
+
+def update_hashes(entries: List[dict], dedup_dir: str, workers: Optional[int] = None) -> Dict[str, int]:
+    """
+    Perceptual hashes of manifest entries, cached by content hash.
+
+    `hashes.json` in `dedup_dir` maps each file's SHA-256 to its perceptual
+    hash, so re-runs only decode new or changed images and byte-identical
+    copies are hashed once.
+
+    Args:
+        entries: Manifest entries (see data.manifest) with an absolute
+            'file' path added to each
+        dedup_dir: Directory of the hash cache
+        workers: Hashing processes (None uses every core)
+
+    Returns:
+        Dict of SHA-256 -> perceptual hash for every entry that could be decoded
+    """
+    cache_path = Path(dedup_dir) / HASHES_FILE
+    known = {}
+    if cache_path.exists():
+        with open(cache_path, 'r') as f:
+            cache = json.load(f)
+        if cache.get("version") == DEDUP_VERSION:
+            known = {sha256: int(value, 16) for sha256, value in cache["hashes"].items()}
+
+    todo = {}
+    for entry in entries:
+        if entry["sha256"] not in known:
+            todo.setdefault(entry["sha256"], entry["file"])
+    if todo:
+        print(f"Hashing {len(todo)} images ({len(known)} cached)...")
+        for sha256, value in zip(todo, hash_images(list(todo.values()), workers)):
+            if value is not None:
+                known[sha256] = value
+
+    hashes = {entry["sha256"]: known[entry["sha256"]] for entry in entries if entry["sha256"] in known}
+    Path(dedup_dir).mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(cache_path.suffix + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump({"version": DEDUP_VERSION, "hashes": {k: f"{v:016x}" for k, v in known.items()}}, f)
+    os.replace(tmp_path, cache_path)
+    return hashes
+
+
+class HashIndex:
+    """
+    Hamming-radius search over 64-bit hashes without comparing every pair.
+
+    Multi-index hashing: the bits are split into `max_distance + 1` bands
+    and every hash is filed under the value of each band. Two hashes within
+    `max_distance` bits of each other must agree exactly on at least one
+    band (pigeonhole), so only the hashes sharing a bucket with the query
+    are compared. With well-spread hashes the buckets stay small and a
+    query costs roughly O(bands) instead of O(n).
+    """
+
+    def __init__(self, hashes: Sequence[int], max_distance: int = 4, bits: int = HASH_BITS):
+        if not 0 <= max_distance < bits:
+            raise ValueError(f"max_distance must be in [0, {bits}), got {max_distance}")
+        self.hashes = list(hashes)
+        self.max_distance = max_distance
+        num_bands = max_distance + 1
+        edges = [round(i * bits / num_bands) for i in range(num_bands + 1)]
+        self._masks = [((1 << (hi - lo)) - 1) << lo for lo, hi in zip(edges, edges[1:])]
+        self._tables = [defaultdict(list) for _ in self._masks]
+        for i, value in enumerate(self.hashes):
+            for mask, table in zip(self._masks, self._tables):
+                table[value & mask].append(i)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _candidates(self, value: int) -> set:
+        candidates = set()
+        for mask, table in zip(self._masks, self._tables):
+            candidates.update(table.get(value & mask, ()))
+        return candidates
+
+    def query(self, value: int, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """
+        Indexed hashes within `max_distance` bits of `value`.
+
+        Args:
+            value: Query hash
+            max_distance: Search radius (at most the index's `max_distance`)
+
+        Returns:
+            List of (index, distance), nearest first
+        """
+        radius = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        matches = []
+        for i in self._candidates(value):
+            distance = hamming_distance(value, self.hashes[i])
+            if distance <= radius:
+                matches.append((i, distance))
+        return sorted(matches, key=lambda match: (match[1], match[0]))
+
+    def pairs(self) -> List[Tuple[int, int, int]]:
+        """Every pair (i, j, distance) with i < j within the index's `max_distance`"""
+        pairs = []
+        for i, value in enumerate(self.hashes):
+            for j in self._candidates(value):
+                if j > i:
+                    distance = hamming_distance(value, self.hashes[j])
+                    if distance <= self.max_distance:
+                        pairs.append((i, j, distance))
+        return pairs
+
+
+def duplicate_clusters(num_items: int, pairs: List[Tuple[int, int, int]]) -> List[List[int]]:
+    """
+    Connected components of the near-duplicate graph.
+
+    Near-duplication is not transitive, so a cluster can contain members
+    further apart than the threshold when a chain of close pairs links them.
+
+    Args:
+        num_items: Number of items
+        pairs: Edges (i, j, distance) from `HashIndex.pairs`
+
+    Returns:
+        Clusters of two or more item indices, each sorted, ordered by first member
+    """
+    parent = list(range(num_items))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j, _ in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    members = defaultdict(list)
+    for i in range(num_items):
+        members[find(i)].append(i)
+    return sorted((group for group in members.values() if len(group) > 1), key=lambda group: group[0])
+
+
+def find_duplicates(
+    manifest: dict,
+    hashes: Dict[str, int],
+    max_distance: int = 4,
+) -> List[dict]:
+    """
+    Clusters of exact and near-duplicate images across all splits of a manifest.
+
+    Args:
+        manifest: Manifest (see data.manifest)
+        hashes: SHA-256 -> perceptual hash (see `update_hashes`); entries
+            without a hash are skipped
+        max_distance: Largest Hamming distance counted as a near-duplicate
+
+    Returns:
+        List of clusters, each a dict with 'members' (manifest entries with
+        their 'split' and 'hash'), 'splits' and 'classes' (sorted distinct
+        values), 'exact' (every member byte-identical) and 'max_distance'
+        (largest distance of a member from the first one)
+    """
+    items = []
+    for split, info in manifest["splits"].items():
+        for entry in info["files"]:
+            if entry["sha256"] in hashes:
+                items.append({**entry, "split": split, "hash": f"{hashes[entry['sha256']]:016x}"})
+
+    values = [int(item["hash"], 16) for item in items]
+    index = HashIndex(values, max_distance)
+    clusters = []
+    for group in duplicate_clusters(len(items), index.pairs()):
+        members = [items[i] for i in group]
+        clusters.append({
+            "members": members,
+            "splits": sorted({member["split"] for member in members}),
+            "classes": sorted({member["class"] for member in members}),
+            "exact": len({member["sha256"] for member in members}) == 1,
+            "max_distance": max(hamming_distance(values[group[0]], values[i]) for i in group),
+        })
+    return clusters
+
+
+def filter_manifest(
+    manifest: dict,
+    clusters: List[dict],
+    leakage: str = "train",
+    train_split: str = "Train",
+    test_split: str = "Test",
+) -> Tuple[dict, List[dict]]:
+    """
+    Manifest with duplicate images removed.
+
+    Within each cluster one image is kept per (split, class) - the first by
+    path - so copies that agree on their label collapse to one sample while
+    members labelled differently (which need a human look) all stay. When a
+    cluster spans the train and test splits, every member of the `leakage`
+    split is removed, so no test image has a copy in training. That can
+    leave a class without images in a split (a warning is printed); the
+    class stays in the manifest's class list through the other splits.
+
+    Args:
+        manifest: Manifest the clusters were found in
+        clusters: Output of `find_duplicates`
+        leakage: Split that loses its copies of leaked images, 'train'
+            (keeps the test set unchanged apart from its own duplicates) or 'test'
+        train_split: Name of the training split
+        test_split: Name of the test split
+
+    Returns:
+        Tuple of (filtered manifest, removed entries with their 'split')
+    """
+    if leakage not in ("train", "test"):
+        raise ValueError(f"leakage must be 'train' or 'test', got {leakage}")
+    leaked_split = train_split if leakage == "train" else test_split
+
+    removed = set()
+    removed_entries = []
+    for cluster in clusters:
+        leaked = train_split in cluster["splits"] and test_split in cluster["splits"]
+        kept = set()
+        for member in sorted(cluster["members"], key=lambda m: (m["split"], m["path"])):
+            key = (member["split"], member["class"])
+            if (leaked and member["split"] == leaked_split) or key in kept:
+                removed.add((member["split"], member["path"]))
+                removed_entries.append(member)
+            else:
+                kept.add(key)
+
+    filtered = {key: value for key, value in manifest.items() if key != "splits"}
+    filtered["splits"] = {
+        split: {
+            **info,
+            "files": [entry for entry in info["files"] if (split, entry["path"]) not in removed],
+        }
+        for split, info in manifest["splits"].items()
+    }
+
+    for split, info in filtered["splits"].items():
+        emptied = (
+            {entry["class"] for entry in manifest["splits"][split]["files"]}
+            - {entry["class"] for entry in info["files"]}
+        )
+        for name in sorted(emptied):
+            print(f"WARNING: filtering removed every {split} image of class '{name}'")
+    return filtered, removed_entries
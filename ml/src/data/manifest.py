@@ -0,0 +1,149 @@
+"""Dataset manifest: per-file class, size and content hash for each split"""
+
+import json
+import os
+import hashlib
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .resized import IMG_EXTENSIONS, VARIANT_INDEX
+
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(path: str) -> dict:
+    """
+    Read a manifest file.
+
+    Args:
+        path: Manifest JSON path
+
+    Returns:
+        Manifest dict ({"version", "splits": {split: {"root", "files"}}}),
+        or an empty manifest if the file does not exist
+    """
+    path = Path(path)
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "splits": {}}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_manifest(path: str, manifest: dict):
+    """Write a manifest atomically (temp file + rename)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def scan_split(root: str, previous: Optional[List[dict]] = None, workers: int = 8) -> List[dict]:
+    """
+    Build manifest entries for every image under an ImageFolder root.
+
+    Content hashes are reused from `previous` entries whose size and mtime
+    still match, so only new or modified files are re-hashed.
+
+    Args:
+        root: ImageFolder root (one subdirectory per class)
+        previous: Entries from an earlier manifest of the same split
+        workers: Threads used for hashing
+
+    Returns:
+        List of {"path", "class", "size", "mtime_ns", "sha256"} dicts,
+        with `path` relative to `root`, sorted by path
+    """
+    root = Path(root)
+    known = {entry["path"]: entry for entry in (previous or [])}
+
+    files = []
+    for class_dir in sorted(d for d in root.iterdir() if d.is_dir()):
+        for dirpath, _, filenames in os.walk(class_dir, followlinks=True):
+            for name in filenames:
+                if name.lower().endswith(IMG_EXTENSIONS):
+                    files.append(Path(dirpath) / name)
+
+    def describe(file_path: Path) -> dict:
+        stat = file_path.stat()
+        rel_path = file_path.relative_to(root).as_posix()
+        old = known.get(rel_path)
+        if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+            sha256 = old["sha256"]
+        else:
+            sha256 = file_sha256(file_path)
+        return {
+            "path": rel_path,
+            "class": rel_path.split("/", 1)[0],
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        entries = list(pool.map(describe, files))
+
+    return sorted(entries, key=lambda entry: entry["path"])
+
+
+def manifest_entries(manifest_path: str, split: str) -> List[dict]:
+    """
+    Entries of one split of a manifest.
+
+    Args:
+        manifest_path: Manifest JSON path
+        split: Split name (the ImageFolder root's directory name, e.g. 'Train')
+
+    Returns:
+        List of manifest entries
+    """
+    manifest = read_manifest(manifest_path)
+    if split not in manifest["splits"]:
+        raise ValueError(f"Split '{split}' not found in manifest: {manifest_path}")
+    return manifest["splits"][split]["files"]
+
+
+def manifest_classes(manifest_path: str) -> List[str]:
+    """
+    Sorted class names across every split of a manifest.
+
+    Splits share this list, so a class with no images left in one split
+    (e.g. after deduplication) keeps its label index.
+    """
+    manifest = read_manifest(manifest_path)
+    return sorted({entry["class"] for info in manifest["splits"].values() for entry in info["files"]})
+
+
+def variant_entries(root: str, entries: List[dict]) -> List[dict]:
+    """
+    Manifest entries re-pointed at the files of a pre-resized variant.
+
+    Args:
+        root: Variant root written by `data.resized.build_resized_variant`
+        entries: Entries of the original split
+
+    Returns:
+        Entries whose 'path' is the resized copy, sorted by path; files
+        without a resized copy (e.g. ones that failed to encode) are dropped
+    """
+    with open(Path(root) / VARIANT_INDEX, 'r') as f:
+        files = json.load(f)["files"]
+    mapped = [
+        {**entry, "path": files[entry["path"]]["output"]}
+        for entry in entries
+        if entry["path"] in files
+    ]
+    if len(mapped) < len(entries):
+        print(f"WARNING: {len(entries) - len(mapped)} manifest files have no resized copy in {root}")
+    return sorted(mapped, key=lambda entry: entry["path"])
@@ -0,0 +1,267 @@
+"""Pre-resized copies of ImageFolder trees, so epochs decode small files"""
+
+import hashlib
+import json
+import os
+from PIL import Image
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+RESIZED_VERSION = 1
+VARIANT_INDEX = "variant.json"
+# torchvision.datasets.folder.IMG_EXTENSIONS, kept here so ingestion does not import torch
+IMG_EXTENSIONS = (".jpg", ".jpeg", ".png", ".ppm", ".bmp", ".pgm", ".tif", ".tiff", ".webp")
+
+
+def resized_root_for(root: str, resized_dir: str, short_side: int) -> Path:
+    """Directory holding the variant of `root` resized to `short_side`"""
+    return Path(resized_dir) / str(short_side) / Path(root).name
+
+
+def _output_path(rel_path: str) -> str:
+    """Variant file for a source file; everything is stored as JPEG"""
+    if rel_path.lower().endswith((".jpg", ".jpeg")):
+        return rel_path
+    # Keep the original suffix in the name so a.png and a.jpg can't collide
+    return rel_path + ".jpg"
+
+
+def scan_source(src_root: str) -> List[dict]:
+    """{"path", "size", "mtime_ns"} of every image under an ImageFolder root, sorted by path"""
+    src_root = Path(src_root)
+    entries = []
+    for class_dir in sorted(d for d in src_root.iterdir() if d.is_dir()):
+        for dirpath, _, filenames in os.walk(class_dir, followlinks=True):
+            for name in filenames:
+                if name.lower().endswith(IMG_EXTENSIONS):
+                    path = Path(dirpath) / name
+                    stat = path.stat()
+                    entries.append({
+                        "path": path.relative_to(src_root).as_posix(),
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                    })
+    return sorted(entries, key=lambda entry: entry["path"])
+
+
+def source_fingerprint(entries: List[dict]) -> str:
+    """Hash of every source file's relative path, size and mtime"""
+    digest = hashlib.sha256()
+    for entry in sorted(entries, key=lambda entry: entry["path"]):
+        digest.update(f"{entry['path']}\0{entry['size']}\0{entry['mtime_ns']}\n".encode())
+    return digest.hexdigest()
+
+
+def _read_index(dst_root: Path) -> dict:
+    index_path = dst_root / VARIANT_INDEX
+    if not index_path.exists():
+        return {}
+    with open(index_path, 'r') as f:
+        return json.load(f)
+
+
+def resize_image(src: str, dst: str, short_side: int, quality: int = 90):
+    """
+    Write a copy of `src` whose shorter side is at most `short_side` pixels.
+
+    Grayscale (mode L) images stay single-channel; everything else is
+    converted to RGB like ImageFolder's loader does. Images that are
+    already small enough are re-encoded without resizing.
+
+    Args:
+        src: Source image file
+        dst: Output JPEG path
+        short_side: Target length of the shorter side
+        quality: JPEG quality
+    """
+    with Image.open(src) as img:
+        mode = "L" if img.mode == "L" else "RGB"
+        # Let the JPEG decoder downscale by a power of two in DCT space first
+        img.draft(mode, (short_side, short_side))
+        img = img.convert(mode)
+
+        scale = short_side / min(img.size)
+        if scale < 1:
+            size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+            img = img.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+        tmp = dst + ".tmp"
+        img.save(tmp, format="JPEG", quality=quality)
+    os.replace(tmp, dst)
+
+
+def _resize_job(job: tuple):
+    src, dst, short_side, quality = job
+    try:
+        resize_image(src, dst, short_side, quality)
+        return None
+    except Exception as e:
+        return f"{src}: {e}"
+
+
+def build_resized_variant(
+    src_root: str,
+    dst_root: str,
+    short_side: int = 256,
+    quality: int = 90,
+    workers: Optional[int] = None,
+    entries: Optional[List[dict]] = None,
+) -> dict:
+    """
+    Mirror an ImageFolder tree with every image resized to `short_side`.
+
+    `variant.json` in `dst_root` records the size and mtime of each source
+    file, so re-runs only re-encode new or changed files and delete outputs
+    whose source is gone. Changing `short_side` or `quality` rebuilds all.
+    The index is written last; loaders ignore a variant without one. It
+    also holds a `source_fingerprint` of the files resized, so loaders can
+    tell when the source split changed after the variant was built.
+
+    Args:
+        src_root: ImageFolder root (one subdirectory per class)
+        dst_root: Output root (see `resized_root_for`)
+        short_side: Target length of each image's shorter side
+        quality: JPEG quality
+        workers: Encoder processes (None uses every core)
+        entries: Manifest entries for `src_root` (see data.manifest); when
+            given, the source list comes from them instead of a directory walk
+
+    Returns:
+        Dict with 'written', 'skipped', 'removed' and 'failed' file counts
+    """
+    src_root = Path(src_root)
+    dst_root = Path(dst_root)
+
+    if entries is None:
+        entries = scan_source(src_root)
+
+    index = _read_index(dst_root)
+    if (
+        index.get("version") != RESIZED_VERSION
+        or index.get("short_side") != short_side
+        or index.get("quality") != quality
+    ):
+        index = {}
+    known = index.get("files", {})
+
+    files = {}
+    jobs = []
+    for entry in entries:
+        rel_path = entry["path"]
+        output = _output_path(rel_path)
+        record = {"size": entry["size"], "mtime_ns": entry["mtime_ns"], "output": output}
+        old = known.get(rel_path)
+        if old == record and (dst_root / output).exists():
+            files[rel_path] = record
+            continue
+        (dst_root / output).parent.mkdir(parents=True, exist_ok=True)
+        jobs.append((rel_path, record))
+
+    failed = 0
+    if jobs:
+        print(f"Resizing {len(jobs)} images to short side {short_side} in {dst_root}...")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                _resize_job,
+                [
+                    (str(src_root / rel_path), str(dst_root / record["output"]), short_side, quality)
+                    for rel_path, record in jobs
+                ],
+                chunksize=16,
+            )
+            for done, ((rel_path, record), error) in enumerate(zip(jobs, results), start=1):
+                if error is None:
+                    files[rel_path] = record
+                else:
+                    print(f"\n  WARNING: could not resize {error}")
+                    failed += 1
+                if done % 500 == 0 or done == len(jobs):
+                    print(f"\r  Resized {done}/{len(jobs)}", end='')
+        print()
+
+    # Drop outputs whose source is gone (or that were written under another name)
+    outputs = {record["output"] for record in files.values()}
+    removed = 0
+    for dirpath, _, names in os.walk(dst_root):
+        for name in names:
+            path = Path(dirpath) / name
+            rel_path = path.relative_to(dst_root).as_posix()
+            if rel_path != VARIANT_INDEX and rel_path not in outputs:
+                path.unlink()
+                removed += 1
+
+    index = {
+        "version": RESIZED_VERSION,
+        "source": str(src_root.resolve()),
+        "short_side": short_side,
+        "quality": quality,
+        "fingerprint": source_fingerprint([{"path": path, **record} for path, record in files.items()]),
+        "files": files,
+    }
+    dst_root.mkdir(parents=True, exist_ok=True)
+    tmp_index = dst_root / (VARIANT_INDEX + ".tmp")
+    with open(tmp_index, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_index, dst_root / VARIANT_INDEX)
+
+    return {
+        "written": len(jobs) - failed,
+        "skipped": len(entries) - len(jobs),
+        "removed": removed,
+        "failed": failed,
+    }
+
+
+def find_resized_variant(
+    root: str,
+    resized_dir: str,
+    img_size: int,
+    entries: Optional[List[dict]] = None,
+) -> Optional[Path]:
+    """
+    Smallest complete, up-to-date variant of `root` that still covers `img_size`.
+
+    Args:
+        root: Original ImageFolder root
+        resized_dir: Directory variants are written to
+        img_size: Training/eval image size; the variant's short side must be
+            at least this large so crops are not upsampled
+        entries: Manifest entries the loader takes its samples from. Each
+            must still match the size and mtime its copy was made from
+            (entries without a copy are left to `data.manifest.variant_entries`).
+            Without entries, `root` is scanned and must match the variant's
+            source fingerprint exactly, so added, changed or deleted images
+            are never silently missed
+
+    Returns:
+        Variant root, or None if no usable variant exists
+    """
+    resized_dir = Path(resized_dir)
+    if not resized_dir.is_dir():
+        return None
+
+    sizes = sorted(int(d.name) for d in resized_dir.iterdir() if d.is_dir() and d.name.isdigit())
+    fingerprint = None
+    for short_side in sizes:
+        if short_side < img_size:
+            continue
+        variant = resized_root_for(root, resized_dir, short_side)
+        index = _read_index(variant)
+        if index.get("version") != RESIZED_VERSION or index.get("short_side") != short_side:
+            continue
+        if entries is not None:
+            records = [(entry, index["files"].get(entry["path"])) for entry in entries]
+            stale = any(
+                (record["size"], record["mtime_ns"]) != (entry["size"], entry["mtime_ns"])
+                for entry, record in records
+                if record is not None
+            )
+        else:
+            fingerprint = fingerprint or source_fingerprint(scan_source(root))
+            stale = index.get("fingerprint") != fingerprint
+        if stale:
+            print(f"WARNING: {variant} is out of date with {root}; re-run download_data.py --resize-only")
+            continue
+        return variant
+    return None
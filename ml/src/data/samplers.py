@@ -0,0 +1,222 @@
+"""Sample index, class-balanced sampling, resumable training order and aspect-ratio batching"""
+
+import itertools
+import json
+import os
+import math
+import torch
+from PIL import Image
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence
+
+from .cache import file_lock, root_key, samples_fingerprint
+
+SAMPLE_INDEX_VERSION = 1
+TRAIN_SAMPLING = ("shuffle", "balanced")
+EVAL_BATCHING = ("sequential", "aspect")
+
+
+def _image_size(path: str) -> List[int]:
+    """(width, height) from the image header, without decoding pixels"""
+    with Image.open(path) as img:
+        return list(img.size)
+
+
+def build_sample_index(dataset, index_dir: str, workers: int = 8) -> dict:
+    """
+    Labels and image dimensions of every sample, persisted across runs.
+
+    Dimensions are read from image headers only. The index is stored as
+    `<index_dir>/<root_key(root)>.json` and rebuilt when the dataset's
+    sample list (paths, labels, sizes or mtimes) changes. Concurrent
+    builders of one index are serialized by `data.cache.file_lock`.
+
+    Args:
+        dataset: ImageFolder-like dataset with `samples` and `root`
+        index_dir: Directory to store indexes in
+        workers: Threads used to read image headers
+
+    Returns:
+        Dict with 'labels', 'sizes' ([width, height] per sample) and 'classes'
+    """
+    fingerprint = samples_fingerprint(dataset.samples)
+    index_path = Path(index_dir) / f"{root_key(getattr(dataset, 'root', 'dataset'))}.json"
+
+    with file_lock(index_path):
+        if index_path.exists():
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+            if index.get("version") == SAMPLE_INDEX_VERSION and index.get("fingerprint") == fingerprint:
+                return index
+
+        print(f"Indexing {len(dataset.samples)} images for {index_path}...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            sizes = list(pool.map(_image_size, [path for path, _ in dataset.samples]))
+
+        index = {
+            "version": SAMPLE_INDEX_VERSION,
+            "fingerprint": fingerprint,
+            "classes": dataset.classes,
+            "labels": [label for _, label in dataset.samples],
+            "sizes": sizes,
+        }
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_suffix(f".json.{os.getpid()}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, index_path)
+        return index
+
+
+class ClassBalancedSampler(torch.utils.data.Sampler):
+    """
+    Draws samples with probability inversely proportional to class size.
+
+    Every class is drawn equally often in expectation, so rare classes are
+    seen as often as common ones. Each epoch draws `num_samples` indices
+    with replacement from a generator seeded by (seed, epoch). Under
+    torch.distributed every rank draws the same sequence and keeps its own
+    stride of it, like DistributedSampler; call `set_epoch` every epoch.
+    """
+
+    def __init__(
+        self,
+        labels: Sequence[int],
+        num_samples: Optional[int] = None,
+        seed: int = 0,
+        num_replicas: Optional[int] = None,
+        rank: Optional[int] = None,
+    ):
+        if num_replicas is None:
+            distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+            num_replicas = torch.distributed.get_world_size() if distributed else 1
+            rank = torch.distributed.get_rank() if distributed else 0
+
+        labels = torch.as_tensor(labels)
+        counts = torch.bincount(labels)
+        self.weights = (1.0 / counts.clamp(min=1).double())[labels]
+        self.total_samples = num_samples or len(labels)
+        self.num_replicas = num_replicas
+        self.rank = rank or 0
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __len__(self) -> int:
+        return math.ceil(self.total_samples / self.num_replicas)
+
+    def __iter__(self) -> Iterator[int]:
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        total = len(self) * self.num_replicas
+        indices = torch.multinomial(self.weights, total, replacement=True, generator=generator)
+        return iter(indices[self.rank::self.num_replicas].tolist())
+
+
+class ResumableSampler(torch.utils.data.Sampler):
+    """
+    Training order that can be regenerated, and continued part way through an epoch.
+
+    Wraps a sampler whose order depends only on its seed and `set_epoch`
+    (DistributedSampler, ClassBalancedSampler), so any epoch's order is the
+    same after a restart. `skip(n)` drops the first n indices of the next
+    pass, which resumes an interrupted epoch at the sample it stopped at.
+    `generator` is reseeded with (seed, epoch) as well; given to the
+    DataLoader, it makes the worker seeds a function of the epoch too.
+    """
+
+    def __init__(self, sampler: torch.utils.data.Sampler, seed: int = 0):
+        self.sampler = sampler
+        self.seed = seed
+        self.generator = torch.Generator().manual_seed(seed)
+        self.start = 0
+
+    def set_epoch(self, epoch: int):
+        self.sampler.set_epoch(epoch)
+        self.generator.manual_seed(self.seed + epoch)
+
+    def skip(self, num_samples: int):
+        """Start the next pass at position `num_samples` of the epoch's order"""
+        self.start = num_samples
+
+    def __len__(self) -> int:
+        return len(self.sampler)
+
+    def __iter__(self) -> Iterator[int]:
+        start, self.start = self.start, 0
+        return itertools.islice(iter(self.sampler), start, None)
+
+
+class AspectRatioBatchSampler(torch.utils.data.BatchSampler):
+    """
+    Batches images of similar aspect ratio together.
+
+    Indices from `sampler` are assigned to log-spaced aspect-ratio buckets
+    and a batch is emitted whenever a bucket fills up; leftovers are emitted
+    at the end. With an aspect-preserving resize (see `crop_collate`), the
+    images in a batch then differ by a few pixels at most instead of being
+    warped or cropped to one square shape.
+    """
+
+    def __init__(
+        self,
+        sampler: torch.utils.data.Sampler,
+        sizes: Sequence[Sequence[int]],
+        batch_size: int,
+        num_buckets: int = 8,
+        drop_last: bool = False,
+    ):
+        super().__init__(sampler, batch_size, drop_last)
+        log_ratios = [math.log(width / height) for width, height in sizes]
+        low, high = min(log_ratios), max(log_ratios)
+        width = (high - low) / num_buckets or 1.0
+        self.buckets = [min(int((r - low) / width), num_buckets - 1) for r in log_ratios]
+        self.num_buckets = num_buckets
+
+    def __iter__(self) -> Iterator[List[int]]:
+        pending = [[] for _ in range(self.num_buckets)]
+        for idx in self.sampler:
+            bucket = pending[self.buckets[idx]]
+            bucket.append(idx)
+            if len(bucket) == self.batch_size:
+                yield bucket[:]
+                bucket.clear()
+
+        leftovers = [idx for bucket in pending for idx in bucket]
+        for start in range(0, len(leftovers), self.batch_size):
+            batch = leftovers[start:start + self.batch_size]
+            if len(batch) == self.batch_size or not self.drop_last:
+                yield batch
+
+    def __len__(self) -> int:
+        # Depends only on how many indices land in each bucket, which is fixed
+        # for samplers that permute or shard a fixed set of indices
+        counts = [0] * self.num_buckets
+        for idx in self.sampler:
+            counts[self.buckets[idx]] += 1
+        full = sum(count // self.batch_size for count in counts)
+        leftover = sum(count % self.batch_size for count in counts)
+        if self.drop_last:
+            return full + leftover // self.batch_size
+        return full + math.ceil(leftover / self.batch_size)
+
+
+def crop_collate(batch):
+    """
+    Collate (image, label) pairs whose images differ slightly in size.
+
+    Each image is center-cropped to the smallest height and width in the
+    batch, which for an aspect-ratio bucket is a few pixels at most.
+    """
+    images, labels = zip(*batch)
+    height = min(image.shape[-2] for image in images)
+    width = min(image.shape[-1] for image in images)
+
+    cropped = []
+    for image in images:
+        top = (image.shape[-2] - height) // 2
+        left = (image.shape[-1] - width) // 2
+        cropped.append(image[..., top:top + height, left:left + width])
+    return torch.stack(cropped), torch.as_tensor(labels)
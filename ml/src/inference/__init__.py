@@ -0,0 +1,25 @@
+"""Batched inference with trained models"""
+
+import importlib
+
+# Resolved on first access
+_EXPORTS = {
+    "EmbeddingModel": ".embeddings",
+    "EmbeddingStore": ".embeddings",
+    "MicroBatcher": ".server",
+    "TTAModel": ".tta",
+    "build_embedding_store": ".embeddings",
+    "build_index": ".vector_index",
+    "get_tta_transforms": ".tta",
+    "load_model": ".predictor",
+    "predict_batches": ".predictor",
+    "serve": ".server",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,153 @@
+"""Penultimate-layer embeddings and a float16 store of them for similar-image retrieval"""
+
+import json
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from data.cache import samples_fingerprint
+from models.classifier import replace_head
+from training.output_cache import INDEX_FILE, build_output_cache
+from .vector_index import ANN_FILE, FlatIndex, load_index, search_dtype
+
+EMBEDDING_STORE_VERSION = 1
+EMBEDDINGS_FILE = "embeddings.f16"
+
+
+class EmbeddingModel(nn.Module):
+    """
+    Classifier that also returns its penultimate-layer features.
+
+    The final layer of the wrapped model is moved into this module (the
+    model itself keeps an nn.Identity in its place), so one forward pass
+    yields both the logits and the features the head sees. Features are
+    L2-normalized by default, making inner products cosine similarities.
+    """
+
+    def __init__(self, model: nn.Module, architecture: str, normalize: bool = True):
+        super().__init__()
+        self.head = replace_head(model, architecture, nn.Identity())
+        self.backbone = model
+        self.normalize = normalize
+
+    @property
+    def dim(self) -> int:
+        return self.head.in_features
+
+    def forward(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        features = self.backbone(x)
+        logits = self.head(features)
+        embeddings = features.float()
+        if self.normalize:
+            embeddings = F.normalize(embeddings, dim=1)
+        return logits, embeddings
+
+
+def build_embedding_store(
+    model: EmbeddingModel,
+    loaders: Dict[str, torch.utils.data.DataLoader],
+    store_path: str,
+    key: dict,
+    device: str = "cpu",
+    precision: str = "fp32",
+    channels_last: bool = False,
+) -> Path:
+    """
+    Embed every image of one or more labelled splits into a float16 store.
+
+    Embeddings of all splits go, in loader order, to `embeddings.f16`
+    (float16, shape (N, D)) by `training.output_cache.build_output_cache`;
+    `index.json` holds each row's path, label and split, the class list and
+    `key`. The store is reused while `key` and the splits' sample
+    fingerprints are unchanged; a rebuild deletes the store's `ann.pt`.
+
+    Args:
+        model: EmbeddingModel in eval mode
+        loaders: Split name -> unshuffled, non-augmented loader (see
+            `data.create_eval_loader`) whose dataset has ImageFolder's
+            `samples` and `classes`; every split must share the class list
+        store_path: Store directory
+        key: Everything else the embeddings depend on (weights,
+            architecture, image size, precision)
+        device: Device the model is on
+        precision: Forward pass precision
+        channels_last: Feed batches in channels_last memory format
+
+    Returns:
+        Path to the store directory
+    """
+    key = {
+        **key,
+        "fingerprints": {split: samples_fingerprint(loader.dataset.samples) for split, loader in loaders.items()},
+    }
+
+    classes = None
+    for split, loader in loaders.items():
+        if classes is not None and loader.dataset.classes != classes:
+            raise ValueError(f"Split '{split}' has different classes than the other splits")
+        classes = loader.dataset.classes
+
+    items = [
+        {"path": path, "label": label, "split": split}
+        for split, loader in loaders.items()
+        for path, label in loader.dataset.samples
+    ]
+    # A nearest-neighbour index over the old embeddings no longer applies after a rebuild
+    build_output_cache(
+        model, list(loaders.values()), store_path, EMBEDDINGS_FILE, EMBEDDING_STORE_VERSION, key,
+        index={"classes": classes, "items": items}, select=lambda output: output[1], invalidates=(ANN_FILE,),
+        device=device, precision=precision, channels_last=channels_last,
+    )
+    return Path(store_path)
+
+
+class EmbeddingStore:
+    """
+    Read-only view of a `build_embedding_store` directory.
+
+    `embeddings` is a float16 memory map of shape (N, D); `items[i]` holds
+    the path, label and split of row i.
+    """
+
+    def __init__(self, store_path: str):
+        self.path = Path(store_path)
+        with open(self.path / INDEX_FILE, 'r') as f:
+            index = json.load(f)
+        if index.get("version") != EMBEDDING_STORE_VERSION:
+            raise ValueError(f"Unsupported embedding store version in {self.path}")
+        self.key = index["key"]
+        self.classes = index["classes"]
+        self.items = index["items"]
+        self.embeddings = np.memmap(
+            self.path / EMBEDDINGS_FILE, dtype=np.float16, mode='r', shape=tuple(index["shape"])
+        )
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def tensor(self) -> torch.Tensor:
+        """All embeddings as a float16 tensor in memory"""
+        return torch.from_numpy(np.array(self.embeddings))
+
+    def load_index(self, device: str = "cpu", nprobe: Optional[int] = None):
+        """
+        Nearest-neighbour index over the store.
+
+        Args:
+            device: Device to search on
+            nprobe: Lists searched per query (IVF indexes only)
+
+        Returns:
+            The index saved as `ann.pt` in the store by scripts/embed.py, or
+            an exact FlatIndex if none was saved
+        """
+        if (self.path / ANN_FILE).exists():
+            return load_index(self.path / ANN_FILE, self.tensor(), device, nprobe)
+        return FlatIndex(self.tensor().to(search_dtype(device)), device)
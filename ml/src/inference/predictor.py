@@ -0,0 +1,121 @@
+"""Checkpoint loading and batched inference"""
+
+import time
+import torch
+import torch.nn as nn
+from typing import Iterator, Optional
+
+from models import create_model
+from models.classifier import num_classes_from_state_dict
+from models.pruning import match_state_dict
+from training.trainer import autocast
+
+
+def load_state_dict(path: str) -> dict:
+    """
+    Load model weights from a training checkpoint or a bare state dict.
+
+    Args:
+        path: Path to `checkpoint_*.pt` (dict with 'model_state_dict')
+            or `*_final.pt` (state dict only)
+
+    Returns:
+        Model state dict on CPU
+    """
+    checkpoint = torch.load(path, map_location="cpu")
+    if 'model_state_dict' in checkpoint:
+        return checkpoint['model_state_dict']
+    return checkpoint
+
+
+def load_model(
+    path: str,
+    architecture: str,
+    num_classes: Optional[int] = None,
+    device: str = "cpu",
+    channels_last: bool = False,
+) -> nn.Module:
+    """
+    Build a model with `create_model` and load trained weights into it.
+
+    Weights of a pruned model (see `models.pruning`) are loaded into a
+    model shrunk to their channel widths.
+
+    Args:
+        path: Checkpoint or state dict path
+        architecture: Model architecture the weights were trained with
+        num_classes: Number of output classes (read from the weights if None)
+        device: Device to move model to
+        channels_last: Convert weights to channels_last memory format
+
+    Returns:
+        Model in eval mode
+    """
+    state_dict = load_state_dict(path)
+    if num_classes is None:
+        num_classes = num_classes_from_state_dict(state_dict, architecture)
+
+    model = create_model(
+        architecture=architecture,
+        num_classes=num_classes,
+        pretrained=False,
+        device="cpu",
+    )
+    match_state_dict(model, architecture, state_dict)
+    model.load_state_dict(state_dict)
+    model = model.to(device)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    model.eval()
+    return model
+
+
+def predict_batches(
+    model: nn.Module,
+    loader: torch.utils.data.DataLoader,
+    device: str = "cpu",
+    top_k: int = 5,
+    precision: str = "fp32",
+    channels_last: bool = False,
+    embeddings: bool = False,
+) -> Iterator[tuple]:
+    """
+    Run batched forward passes over a loader of `ImageFileDataset` items.
+
+    Args:
+        model: Model in eval mode
+        loader: DataLoader yielding (images, indices, ok) batches
+        device: Device the model is on
+        top_k: Number of top predictions to return per image
+        precision: Forward pass precision ('fp32', 'bf16' or 'fp16')
+        channels_last: Feed batches in channels_last memory format
+        embeddings: `model` is an `inference.EmbeddingModel`; also yield
+            each batch's embeddings
+
+    Yields:
+        Tuples of (indices, ok, top-k probabilities, top-k class indices,
+        forward latency in seconds) per batch, on CPU, with the float32
+        embeddings (on `device`) appended when `embeddings` is set
+    """
+    non_blocking = torch.device(device).type == "cuda"
+
+    with torch.inference_mode():
+        for images, indices, ok in loader:
+            start = time.perf_counter()
+            x = images.to(device, non_blocking=non_blocking)
+            if channels_last:
+                x = x.contiguous(memory_format=torch.channels_last)
+
+            with autocast(device, precision):
+                outputs = model(x)
+            logits, batch_embeddings = outputs if embeddings else (outputs, None)
+
+            probs = torch.softmax(logits.float(), dim=1)
+            top_probs, top_idx = probs.topk(min(top_k, probs.shape[1]), dim=1)
+            top_probs, top_idx = top_probs.cpu(), top_idx.cpu()
+            latency = time.perf_counter() - start
+
+            if embeddings:
+                yield indices, ok, top_probs, top_idx, latency, batch_embeddings
+            else:
+                yield indices, ok, top_probs, top_idx, latency
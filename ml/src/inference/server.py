@@ -0,0 +1,236 @@
+"""Warm-model HTTP inference server with request micro-batching"""
+
+import io
+import json
+import queue
+import threading
+import time
+import torch
+import torch.nn as nn
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+from typing import Callable, List, Optional
+
+from training.trainer import autocast
+
+
+class MicroBatcher:
+    """
+    Groups concurrently submitted images into batched forward passes.
+
+    A single worker thread owns the model. It blocks for the first queued
+    image, then keeps collecting until `max_batch_size` images are queued or
+    `max_wait_ms` has passed since the first one, and runs them as one batch.
+    A lone request therefore waits at most `max_wait_ms` extra, while bursts
+    of concurrent requests share one forward pass.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        device: str = "cpu",
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        top_k: int = 5,
+        precision: str = "fp32",
+        channels_last: bool = False,
+    ):
+        self.model = model
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.top_k = top_k
+        self.precision = precision
+        self.channels_last = channels_last
+        self.batches = 0
+        self.images = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, image: torch.Tensor) -> Future:
+        """
+        Queue one preprocessed image.
+
+        Args:
+            image: Float tensor of shape (3, H, W)
+
+        Returns:
+            Future resolving to (top-k probabilities, top-k class indices) lists
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _collect(self) -> List[tuple]:
+        batch = [self._queue.get()]
+        if batch[0] is None:
+            return batch
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Finish this batch, then stop
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _forward(self, images: torch.Tensor):
+        x = images.to(self.device)
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        with torch.inference_mode(), autocast(self.device, self.precision):
+            logits = self.model(x)
+        probs = torch.softmax(logits.float(), dim=1)
+        top_probs, top_idx = probs.topk(min(self.top_k, probs.shape[1]), dim=1)
+        return top_probs.cpu().tolist(), top_idx.cpu().tolist()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch[-1] is None:
+                return
+
+            images, futures = zip(*batch)
+            try:
+                top_probs, top_idx = self._forward(torch.stack(images))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.images += len(batch)
+            for future, probs, classes in zip(futures, top_probs, top_idx):
+                future.set_result((probs, classes))
+
+    def warmup(self, img_size: int, runs: int = 2):
+        """Run dummy batches so the first request doesn't pay for lazy initialization"""
+        for _ in range(runs):
+            self._forward(torch.zeros(1, 3, img_size, img_size))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+def make_handler(
+    batcher: MicroBatcher,
+    transform: Callable,
+    class_names: Optional[List[str]] = None,
+    info: Optional[dict] = None,
+):
+    """
+    Build the request handler class for `ThreadingHTTPServer`.
+
+    Endpoints:
+        GET  /health   - server and model info
+        POST /predict  - body is an encoded image file; returns top-k predictions
+
+    Args:
+        batcher: MicroBatcher running the model
+        transform: Inference transform applied to each decoded image
+        class_names: Class names by index (None returns indices)
+        info: Extra fields reported by /health
+
+    Returns:
+        BaseHTTPRequestHandler subclass
+    """
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path != "/health":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+            self._send_json(200, {
+                "status": "ok",
+                "batches": batcher.batches,
+                "images": batcher.images,
+                **(info or {}),
+            })
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {"error": f"unknown path {self.path}"})
+                return
+
+            start = time.perf_counter()
+            length = int(self.headers.get("Content-Length", 0))
+            data = self.rfile.read(length)
+            try:
+                # Decode in the request thread; only the forward pass is serialized
+                with Image.open(io.BytesIO(data)) as img:
+                    image = transform(img.convert("RGB"))
+            except Exception as e:
+                self._send_json(400, {"error": f"could not decode image: {e}"})
+                return
+
+            try:
+                probs, classes = batcher.submit(image).result()
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+
+            self._send_json(200, {
+                "predictions": [
+                    {
+                        "label": class_names[c] if class_names else c,
+                        "probability": round(p, 6),
+                    }
+                    for p, c in zip(probs, classes)
+                ],
+                "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            })
+
+        def log_message(self, format, *args):
+            # Keep the console for startup and shutdown messages
+            pass
+
+    return PredictionHandler
+
+
+def serve(
+    batcher: MicroBatcher,
+    transform: Callable,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    class_names: Optional[List[str]] = None,
+    info: Optional[dict] = None,
+) -> ThreadingHTTPServer:
+    """
+    Create the HTTP server (call `serve_forever()` on the result to run it).
+
+    Args:
+        batcher: MicroBatcher running the model
+        transform: Inference transform applied to each decoded image
+        host: Interface to bind (localhost by default)
+        port: Port to bind
+        class_names: Class names by index
+        info: Extra fields reported by /health
+
+    Returns:
+        ThreadingHTTPServer, one thread per connection
+    """
+    handler = make_handler(batcher, transform, class_names, info)
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
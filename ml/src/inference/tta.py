@@ -0,0 +1,154 @@
+"""Test-time augmentation: deterministic views of each image, batched and averaged in logit space"""
+
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torchvision import transforms
+from torchvision.transforms import InterpolationMode
+from torchvision.transforms import functional as TF
+from typing import List, Tuple
+
+# Views in the order they are added as K grows. 'full' is the whole image
+# (what the plain inference transforms give), the crops cover crop_fraction
+# of it, and the rotations are small affines of the whole image.
+TTA_VIEWS = (
+    "full",
+    "hflip",
+    "center",
+    "top_left",
+    "top_right",
+    "bottom_left",
+    "bottom_right",
+    "rotate_pos",
+    "rotate_neg",
+)
+
+
+def tta_views(num_views: int) -> List[str]:
+    """The first `num_views` entries of `TTA_VIEWS`"""
+    if not 1 <= num_views <= len(TTA_VIEWS):
+        raise ValueError(f"num_views must be in [1, {len(TTA_VIEWS)}], got {num_views}")
+    return list(TTA_VIEWS[:num_views])
+
+
+def tta_base_size(img_size: int, crop_fraction: float = 0.875) -> int:
+    """Side of the square the views are cut from, so a crop of `img_size` covers `crop_fraction` of it"""
+    return int(round(img_size / crop_fraction))
+
+
+def get_tta_transforms(
+    img_size: int = 224,
+    crop_fraction: float = 0.875,
+    mean: Tuple[float, float, float] = (0.485, 0.456, 0.406),
+    std: Tuple[float, float, float] = (0.229, 0.224, 0.225),
+) -> transforms.Compose:
+    """
+    Get the per-image transforms feeding `TTAModel`.
+
+    Resizes the short side and center crops to a square of
+    `tta_base_size(img_size, crop_fraction)`, so non-square radiographs keep
+    their aspect ratio and still batch; the views are cut from that square
+    on the device.
+
+    Args:
+        img_size: Model input size (square)
+        crop_fraction: Fraction of the square each crop view covers
+        mean: Normalization mean per channel (ImageNet default)
+        std: Normalization std per channel (ImageNet default)
+
+    Returns:
+        Composed transforms
+    """
+    base_size = tta_base_size(img_size, crop_fraction)
+    return transforms.Compose([
+        transforms.Resize(base_size),
+        transforms.CenterCrop(base_size),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=mean, std=std),
+    ])
+
+
+def make_views(x: torch.Tensor, views: List[str], img_size: int, degrees: float = 5.0) -> torch.Tensor:
+    """
+    Cut the named views from a batch of square images.
+
+    Args:
+        x: Normalized images (N, C, B, B) with B >= img_size
+        views: View names from `TTA_VIEWS`
+        img_size: Output size of each view
+        degrees: Rotation of the 'rotate_pos' / 'rotate_neg' views
+
+    Returns:
+        Views (K * N, C, img_size, img_size), grouped by view: rows
+        [k * N, (k + 1) * N) are view k of every image
+    """
+    base = x.shape[-1]
+    if x.shape[-2] != base or base < img_size:
+        raise ValueError(f"Expected square inputs of at least {img_size}px, got {tuple(x.shape[-2:])}")
+
+    full = x
+    if base != img_size:
+        full = F.interpolate(x, size=(img_size, img_size), mode="bilinear", align_corners=False, antialias=True)
+    far = base - img_size
+    mid = far // 2
+    offsets = {
+        "center": (mid, mid),
+        "top_left": (0, 0),
+        "top_right": (0, far),
+        "bottom_left": (far, 0),
+        "bottom_right": (far, far),
+    }
+
+    out = []
+    for view in views:
+        if view == "full":
+            out.append(full)
+        elif view == "hflip":
+            out.append(full.flip(-1))
+        elif view in offsets:
+            top, left = offsets[view]
+            out.append(x[..., top:top + img_size, left:left + img_size])
+        elif view in ("rotate_pos", "rotate_neg"):
+            angle = degrees if view == "rotate_pos" else -degrees
+            out.append(TF.rotate(full, angle, interpolation=InterpolationMode.BILINEAR))
+        else:
+            raise ValueError(f"Unknown TTA view: {view}")
+    return torch.cat(out)
+
+
+class TTAModel(nn.Module):
+    """
+    Runs a model on K views of each image in one forward pass and averages
+    the logits.
+
+    The N images of a batch become one (K * N)-image batch, so the model
+    sees a K times larger batch instead of K separate passes; on hardware
+    that is not saturated by the original batch this costs well under K
+    times the latency. Logits rather than probabilities are averaged, which
+    keeps the output a drop-in replacement for the model's own.
+
+    Inputs are the square images of `get_tta_transforms`.
+    """
+
+    def __init__(
+        self,
+        model: nn.Module,
+        num_views: int,
+        img_size: int = 224,
+        degrees: float = 5.0,
+        channels_last: bool = False,
+    ):
+        super().__init__()
+        self.model = model
+        self.views = tta_views(num_views)
+        self.img_size = img_size
+        self.degrees = degrees
+        self.channels_last = channels_last
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        n = x.shape[0]
+        views = make_views(x, self.views, self.img_size, self.degrees)
+        if self.channels_last:
+            views = views.contiguous(memory_format=torch.channels_last)
+        logits = self.model(views)
+        return logits.float().view(len(self.views), n, -1).mean(dim=0)
@@ -0,0 +1,288 @@
+"""Exact and inverted-file (IVF) nearest-neighbour search over normalized embeddings"""
+
+import math
+import torch
+from pathlib import Path
+from typing import Optional, Tuple
+
+# Up to this many vectors an exact scan stays under ~10 ms per query on one
+# CPU thread (1024-d), so build_index picks it
+FLAT_MAX_VECTORS = 20_000
+ANN_FILE = "ann.pt"
+
+
+class FlatIndex:
+    """
+    Exact top-k inner-product search.
+
+    Scores every stored vector with one matrix product per query batch;
+    cost grows linearly with the number of vectors.
+    """
+
+    kind = "flat"
+
+    def __init__(self, vectors: torch.Tensor, device: str = "cpu"):
+        self.vectors = vectors.to(device)
+        self.device = device
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: torch.Tensor, k: int = 5) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Top-k stored vectors by inner product (cosine similarity for normalized vectors).
+
+        Args:
+            queries: Query vectors (Q, D)
+            k: Neighbours per query
+
+        Returns:
+            Tuple of (scores, ids), each (Q, min(k, N)), best first
+        """
+        queries = queries.to(self.device, self.vectors.dtype)
+        scores = (queries @ self.vectors.T).float()
+        scores, ids = scores.topk(min(k, len(self)), dim=1)
+        return scores.cpu(), ids.cpu()
+
+    def state_dict(self) -> dict:
+        return {"kind": self.kind}
+
+
+def spherical_kmeans(
+    vectors: torch.Tensor,
+    num_clusters: int,
+    iterations: int = 10,
+    seed: int = 0,
+    batch_size: int = 65536,
+) -> torch.Tensor:
+    """
+    k-means under cosine similarity (centroids are re-normalized every step).
+
+    Args:
+        vectors: Normalized vectors (N, D) to cluster
+        num_clusters: Number of centroids
+        iterations: Lloyd iterations
+        seed: Seed of the initial centroids (drawn from `vectors`)
+        batch_size: Vectors assigned per matrix product
+
+    Returns:
+        Normalized float32 centroids (num_clusters, D)
+    """
+    generator = torch.Generator().manual_seed(seed)
+    vectors = vectors.float()
+    centroids = vectors[torch.randperm(len(vectors), generator=generator)[:num_clusters]].clone()
+
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids, batch_size)
+        sums = torch.zeros_like(centroids).index_add_(0, assignment, vectors)
+        counts = torch.bincount(assignment, minlength=num_clusters)
+        # Re-seed empty clusters with random vectors so every list gets used
+        empty = (counts == 0).nonzero().flatten()
+        if len(empty):
+            sums[empty] = vectors[torch.randint(len(vectors), (len(empty),), generator=generator)]
+        centroids = torch.nn.functional.normalize(sums, dim=1)
+    return centroids
+
+
+def assign(vectors: torch.Tensor, centroids: torch.Tensor, batch_size: int = 65536) -> torch.Tensor:
+    """Index of the most similar centroid for each vector"""
+    return torch.cat([
+        (vectors[start:start + batch_size].float() @ centroids.T).argmax(dim=1)
+        for start in range(0, len(vectors), batch_size)
+    ])
+
+
+class IVFIndex:
+    """
+    Approximate top-k inner-product search with an inverted file.
+
+    Vectors are clustered into `nlist` lists by spherical k-means and stored
+    grouped by list. A query is compared with the list centroids and then
+    only with the vectors of its `nprobe` most similar lists, so it touches
+    about nprobe / nlist of the data; raising `nprobe` trades speed for
+    recall.
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        vectors: torch.Tensor,
+        centroids: torch.Tensor,
+        assignment: torch.Tensor,
+        nprobe: int = 8,
+        device: str = "cpu",
+    ):
+        self.device = device
+        self.nprobe = nprobe
+        # Drop empty lists, so every probe scores some vectors
+        counts = torch.bincount(assignment, minlength=len(centroids))
+        used = counts > 0
+        if not used.all():
+            centroids, counts = centroids[used], counts[used]
+            assignment = (torch.cumsum(used, 0) - 1)[assignment]
+        self.centroids = centroids.to(device, vectors.dtype)
+        self.assignment = assignment
+        # Stable sort keeps ids ascending within each list
+        order = torch.sort(assignment, stable=True).indices
+        self.ids = order.to(device)
+        self.vectors = vectors[order].to(device)
+        self.offsets = [0] + torch.cumsum(counts, 0).tolist()
+
+    @classmethod
+    def train(
+        cls,
+        vectors: torch.Tensor,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        sample_size: Optional[int] = None,
+        seed: int = 0,
+        device: str = "cpu",
+    ) -> "IVFIndex":
+        """
+        Cluster `vectors` and build the index.
+
+        Args:
+            vectors: Normalized vectors (N, D)
+            nlist: Number of lists (default 2 * sqrt(N), a few hundred
+                vectors per list)
+            nprobe: Lists searched per query
+            iterations: k-means iterations
+            sample_size: Vectors k-means is fitted on (default 64 per list);
+                all vectors are then assigned to the fitted centroids
+            seed: k-means seed
+            device: Device the index searches on
+
+        Returns:
+            IVFIndex
+        """
+        nlist = nlist or max(1, int(2 * math.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        sample_size = min(len(vectors), sample_size or 64 * nlist)
+        generator = torch.Generator().manual_seed(seed)
+        sample = vectors[torch.randperm(len(vectors), generator=generator)[:sample_size]]
+        centroids = spherical_kmeans(sample, nlist, iterations, seed)
+        return cls(vectors, centroids, assign(vectors, centroids), nprobe, device)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def search(
+        self,
+        queries: torch.Tensor,
+        k: int = 5,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Approximate top-k stored vectors by inner product.
+
+        Args:
+            queries: Query vectors (Q, D)
+            k: Neighbours per query
+            nprobe: Lists searched (default: the index's `nprobe`)
+
+        Returns:
+            Tuple of (scores, ids), each (Q, k), best first; ids of -1 and
+            scores of -inf pad results when the probed lists hold fewer
+            than k vectors
+        """
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        queries = queries.to(self.device, self.vectors.dtype)
+        probes = (queries @ self.centroids.T).topk(nprobe, dim=1).indices.tolist()
+
+        all_scores = torch.full((len(queries), k), -math.inf)
+        all_ids = torch.full((len(queries), k), -1, dtype=torch.int64)
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            scores, ids = [], []
+            for list_id in lists:
+                start, end = self.offsets[list_id], self.offsets[list_id + 1]
+                if end > start:
+                    scores.append(self.vectors[start:end] @ query)
+                    ids.append(self.ids[start:end])
+            if not scores:
+                continue
+            scores = torch.cat(scores).float()
+            top_scores, top = scores.topk(min(k, len(scores)))
+            all_scores[row, :len(top)] = top_scores.cpu()
+            all_ids[row, :len(top)] = torch.cat(ids)[top].cpu()
+        return all_scores, all_ids
+
+    def state_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "centroids": self.centroids.float().cpu(),
+            "assignment": self.assignment.cpu(),
+            "nprobe": self.nprobe,
+        }
+
+
+def search_dtype(device: str) -> torch.dtype:
+    """
+    Dtype vectors are searched in: float16 on CUDA, float32 on the CPU.
+
+    CPU matrix-vector products are slower in float16 than in float32, and
+    float16 scores blur the ranking of close neighbours, so stores keep
+    float16 on disk and are widened for CPU search.
+    """
+    return torch.float16 if torch.device(device).type == "cuda" else torch.float32
+
+
+def build_index(
+    vectors: torch.Tensor,
+    kind: str = "auto",
+    device: str = "cpu",
+    **ivf_kwargs,
+):
+    """
+    Build a nearest-neighbour index over normalized vectors.
+
+    Args:
+        vectors: Normalized vectors (N, D), converted to `search_dtype(device)`
+        kind: 'flat' (exact), 'ivf' (approximate) or 'auto' (flat up to
+            FLAT_MAX_VECTORS vectors, IVF above)
+        device: Device to search on
+        **ivf_kwargs: Arguments of `IVFIndex.train`
+
+    Returns:
+        FlatIndex or IVFIndex
+    """
+    vectors = vectors.to(search_dtype(device))
+    if kind == "auto":
+        kind = "flat" if len(vectors) <= FLAT_MAX_VECTORS else "ivf"
+    if kind == "flat":
+        return FlatIndex(vectors, device)
+    if kind == "ivf":
+        return IVFIndex.train(vectors, device=device, **ivf_kwargs)
+    raise ValueError(f"Unsupported index kind: {kind}")
+
+
+def save_index(index, path: str):
+    """Save an index's structure (not its vectors, which stay in the embedding store)"""
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    torch.save(index.state_dict(), tmp_path)
+    tmp_path.replace(path)
+
+
+def load_index(path: str, vectors: torch.Tensor, device: str = "cpu", nprobe: Optional[int] = None):
+    """
+    Rebuild an index saved by `save_index` over the same vectors.
+
+    Args:
+        path: File written by `save_index`
+        vectors: The vectors the index was built on, in the same order
+            (converted to `search_dtype(device)`)
+        device: Device to search on
+        nprobe: Override the saved lists searched per query (IVF only)
+
+    Returns:
+        FlatIndex or IVFIndex
+    """
+    state = torch.load(path, map_location="cpu", weights_only=True)
+    vectors = vectors.to(search_dtype(device))
+    if state["kind"] == "flat":
+        return FlatIndex(vectors, device)
+    if len(state["assignment"]) != len(vectors):
+        raise ValueError(f"Index {path} was built on {len(state['assignment'])} vectors, got {len(vectors)}")
+    return IVFIndex(vectors, state["centroids"], state["assignment"], nprobe or state["nprobe"], device)
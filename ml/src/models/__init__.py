@@ -1,5 +1,16 @@
 """Model architectures"""
 
-from .classifier import create_model
+import importlib
 
-__all__ = ["create_model"]
+# Resolved on first access
+_EXPORTS = {
+    "create_model": ".classifier",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
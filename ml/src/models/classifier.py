@@ -1,9 +1,41 @@
 """Pacemaker classifier model architectures"""
 
+import copy
 import torch
 import torch.nn as nn
 from torchvision import models
-from typing import Literal
+from typing import Literal, Optional
+
+from .quantization import measure_latency
+
+# Name of the replaced final classification layer for each architecture
+HEAD_LAYERS = {
+    "densenet121": "classifier",
+    "resnet50": "fc",
+    "mobilenet_v3_small": "classifier.3",
+}
+
+# Backbone stages in forward order, for unfreezing the last N when fine-tuning.
+# Each stage lists the modules it consists of.
+BACKBONE_BLOCKS = {
+    "densenet121": [
+        ("features.conv0", "features.norm0"),
+        ("features.denseblock1", "features.transition1"),
+        ("features.denseblock2", "features.transition2"),
+        ("features.denseblock3", "features.transition3"),
+        ("features.denseblock4", "features.norm5"),
+    ],
+    "resnet50": [
+        ("conv1", "bn1"),
+        ("layer1",),
+        ("layer2",),
+        ("layer3",),
+        ("layer4",),
+    ],
+    "mobilenet_v3_small": [(f"features.{i}",) for i in range(12)] + [
+        ("features.12", "classifier.0"),
+    ],
+}
 
 
 def create_model(
@@ -11,6 +43,7 @@ def create_model(
     num_classes: int = 45,
     pretrained: bool = True,
     device: str = "cuda",
+    channels_last: bool = False,
 ) -> nn.Module:
     """
     Create a pacemaker classifier model with transfer learning.
@@ -23,6 +56,8 @@ def create_model(
         num_classes: Number of output classes (pacemaker models)
         pretrained: Whether to use ImageNet pre-trained weights
         device: Device to move model to ('cuda' or 'cpu')
+        channels_last: Convert weights to channels_last memory format, which
+            lets cuDNN/oneDNN pick faster NHWC convolution kernels
 
     Returns:
         PyTorch model ready for training
@@ -52,30 +87,168 @@ def create_model(
 
     # Move to device
     model = model.to(device)
+    if channels_last:
+        model = model.to(memory_format=torch.channels_last)
 
     if pretrained:
         print(f"  Loaded pre-trained ImageNet weights")
     print(f"  Replaced final layer: {num_features} -> {num_classes} classes")
     print(f"  Model moved to: {device}")
+    if channels_last:
+        print(f"  Memory format: channels_last")
 
     return model
 
 
-def count_parameters(model: nn.Module) -> dict:
+def num_classes_from_state_dict(state_dict: dict, architecture: str) -> int:
     """
-    Count total and trainable parameters in a model.
+    Read the number of output classes from a model state dict.
+
+    Args:
+        state_dict: Model state dict saved from `create_model`
+        architecture: Model architecture the state dict belongs to
+
+    Returns:
+        Number of output classes of the final layer
+    """
+    if architecture not in HEAD_LAYERS:
+        raise ValueError(f"Unsupported architecture: {architecture}")
+    return state_dict[f"{HEAD_LAYERS[architecture]}.weight"].shape[0]
+
+
+def get_head(model: nn.Module, architecture: str) -> nn.Linear:
+    """The final classification layer that `create_model` replaced"""
+    if architecture not in HEAD_LAYERS:
+        raise ValueError(f"Unsupported architecture: {architecture}")
+    return model.get_submodule(HEAD_LAYERS[architecture])
+
+
+def replace_head(model: nn.Module, architecture: str, module: nn.Module) -> nn.Module:
+    """
+    Swap the final classification layer for another module.
+
+    Replacing it with nn.Identity turns the model into a feature extractor
+    whose output is the penultimate (head input) features.
+
+    Args:
+        model: Model from `create_model`
+        architecture: Model architecture
+        module: New final layer
+
+    Returns:
+        The previous final layer
+    """
+    old = get_head(model, architecture)
+    parent_name, _, name = HEAD_LAYERS[architecture].rpartition(".")
+    parent = model.get_submodule(parent_name) if parent_name else model
+    setattr(parent, name, module)
+    return old
+
+
+def freeze_backbone(model: nn.Module, architecture: str, trainable_blocks: int = 0):
+    """
+    Freeze every parameter except the head and the last backbone blocks.
+
+    Args:
+        model: Model from `create_model`
+        architecture: Model architecture
+        trainable_blocks: Number of final BACKBONE_BLOCKS stages left trainable
+    """
+    if architecture not in BACKBONE_BLOCKS:
+        raise ValueError(f"Unsupported architecture: {architecture}")
+
+    for param in model.parameters():
+        param.requires_grad = False
+
+    trainable = [get_head(model, architecture)]
+    blocks = BACKBONE_BLOCKS[architecture]
+    for block in blocks[len(blocks) - trainable_blocks:] if trainable_blocks > 0 else []:
+        trainable += [model.get_submodule(name) for name in block]
+
+    for module in trainable:
+        for param in module.parameters():
+            param.requires_grad = True
+
+
+def count_macs(model: nn.Module, img_size: int = 224) -> int:
+    """
+    Multiply-accumulates of one forward pass on a single image.
+
+    Counts convolutions and linear layers, which make up nearly all of the
+    compute of these CNNs (normalization, activations and pooling are left
+    out).
+
+    Args:
+        model: PyTorch model
+        img_size: Input image size (square)
+
+    Returns:
+        Multiply-accumulates per image
+    """
+    macs = []
+
+    def conv_hook(module, inputs, output):
+        kernel = module.weight[0].numel()  # in_channels / groups * kh * kw
+        macs.append(output[0].numel() * kernel)
+
+    def linear_hook(module, inputs, output):
+        macs.append(output[0].numel() * module.in_features)
+
+    handles = []
+    for module in model.modules():
+        if isinstance(module, nn.Conv2d):
+            handles.append(module.register_forward_hook(conv_hook))
+        elif isinstance(module, nn.Linear):
+            handles.append(module.register_forward_hook(linear_hook))
+
+    param = next(model.parameters())
+    was_training = model.training
+    model.eval()
+    try:
+        with torch.no_grad():
+            model(torch.zeros(1, 3, img_size, img_size, device=param.device, dtype=param.dtype))
+    finally:
+        model.train(was_training)
+        for handle in handles:
+            handle.remove()
+    return sum(macs)
+
+
+def count_parameters(
+    model: nn.Module,
+    img_size: Optional[int] = None,
+    latency_runs: int = 0,
+    batch_size: int = 1,
+) -> dict:
+    """
+    Count total and trainable parameters in a model, and optionally its cost.
 
     Args:
         model: PyTorch model
+        img_size: Also report FLOPs per image at this input size
+        latency_runs: Also measure the median CPU latency over this many
+            forward passes (on a copy of the model, in fp32)
+        batch_size: Batch size for the latency measurement
 
     Returns:
-        Dictionary with parameter counts
+        Dictionary with parameter counts, plus 'macs' and 'flops'
+        (2 x multiply-accumulates) per image with `img_size`, and
+        'cpu_latency_ms' with `latency_runs`
     """
     total_params = sum(p.numel() for p in model.parameters())
     trainable_params = sum(p.numel() for p in model.parameters() if p.requires_grad)
 
-    return {
+    counts = {
         "total": total_params,
         "trainable": trainable_params,
         "frozen": total_params - trainable_params,
     }
+    if img_size is not None:
+        macs = count_macs(model, img_size)
+        counts["macs"] = macs
+        counts["flops"] = 2 * macs
+    if img_size is not None and latency_runs > 0:
+        cpu_model = copy.deepcopy(model).float().cpu().eval()
+        x = torch.rand(batch_size, 3, img_size, img_size)
+        counts["cpu_latency_ms"] = measure_latency(cpu_model, x, runs=latency_runs)
+    return counts
@@ -0,0 +1,161 @@
+"""Input shape specs, TorchScript/ONNX export and parity checks for exported models"""
+
+import inspect
+import torch
+import torch.nn as nn
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+EXPORT_FORMATS = ("coreml", "torchscript", "onnx")
+
+# An input dimension: enumerated sizes (a single size is a one-element list)
+# or an inclusive (low, high) range
+InputDim = Union[List[int], Tuple[int, int]]
+
+
+def parse_dim(spec: str) -> InputDim:
+    """
+    Parse an input dimension spec.
+
+    "224" is a fixed size, "192,224,256" enumerates sizes and "1-16" is an
+    inclusive range.
+
+    Returns:
+        List of sizes, or a (low, high) tuple for a range
+    """
+    spec = str(spec).replace(" ", "")
+    if "-" in spec:
+        low, high = (int(part) for part in spec.split("-", 1))
+        if not 0 < low <= high:
+            raise ValueError(f"Invalid range {spec!r}: expected LOW-HIGH with 0 < LOW <= HIGH")
+        return (low, high)
+    sizes = [int(part) for part in spec.split(",")]
+    if any(size <= 0 for size in sizes):
+        raise ValueError(f"Invalid sizes {spec!r}")
+    return sizes
+
+
+def dim_default(dim: InputDim) -> int:
+    """Size used for tracing and latency: the first enumerated size or the range's low end"""
+    return dim[0]
+
+
+def dim_checkpoints(dim: InputDim) -> List[int]:
+    """Sizes the parity check runs at: every enumerated size, or both ends of a range"""
+    return sorted(set(dim))
+
+
+def describe_dim(dim: InputDim) -> str:
+    if isinstance(dim, tuple):
+        return f"{dim[0]}-{dim[1]}"
+    return ",".join(map(str, dim))
+
+
+def is_fixed(dim: InputDim) -> bool:
+    return isinstance(dim, list) and len(dim) == 1
+
+
+def export_torchscript(model: nn.Module, example_input: torch.Tensor, output_path: str) -> nn.Module:
+    """
+    Trace `model` and save it as TorchScript.
+
+    The traced CNNs here have no shape-dependent Python control flow, so
+    the saved module accepts any batch size and image size.
+
+    Returns:
+        The traced module
+    """
+    model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, example_input)
+    torch.jit.save(traced, output_path)
+    return traced
+
+
+def export_onnx(
+    model: nn.Module,
+    example_input: torch.Tensor,
+    output_path: str,
+    dynamic_batch: bool = True,
+    dynamic_size: bool = False,
+    opset: int = 17,
+):
+    """
+    Export `model` to ONNX with an `image` input and a `logits` output.
+
+    Requires the `onnx` package. Uses the TorchScript-based exporter, so
+    `onnxscript` is not needed on torch versions that default to dynamo.
+
+    Args:
+        model: Model in eval mode on CPU
+        example_input: Input at the default shape
+        output_path: Path of the .onnx file
+        dynamic_batch: Mark the batch dimension dynamic
+        dynamic_size: Mark height and width dynamic
+        opset: ONNX opset version
+    """
+    axes = {}
+    if dynamic_batch:
+        axes[0] = "batch"
+    if dynamic_size:
+        axes.update({2: "height", 3: "width"})
+
+    kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        kwargs["dynamo"] = False
+
+    model.eval()
+    torch.onnx.export(
+        model,
+        (example_input,),
+        output_path,
+        input_names=["image"],
+        output_names=["logits"],
+        dynamic_axes={"image": axes, "logits": {0: "batch"} if dynamic_batch else {}},
+        opset_version=opset,
+        **kwargs,
+    )
+
+
+def onnx_runtime(path: str) -> Optional[Callable[[torch.Tensor], torch.Tensor]]:
+    """
+    ONNX Runtime CPU session for an exported model.
+
+    Returns:
+        Function mapping an input batch to logits, or None if onnxruntime
+        is not installed
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        return None
+
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+
+    def run(x: torch.Tensor) -> torch.Tensor:
+        (logits,) = session.run(["logits"], {"image": x.numpy()})
+        return torch.from_numpy(logits)
+
+    return run
+
+
+def compare_outputs(reference: torch.Tensor, logits: torch.Tensor) -> Dict[str, float]:
+    """
+    Compare an exported model's outputs with the PyTorch reference.
+
+    Softmax probabilities rather than logits are compared, so the tolerance
+    means the same thing for every model.
+
+    Args:
+        reference: PyTorch logits (N, C)
+        logits: Exported model's logits or log-probabilities (N, C)
+
+    Returns:
+        Dict with 'max_abs_diff' (of softmax probabilities) and
+        'top1_agreement' (fraction of samples with the same argmax)
+    """
+    reference = reference.float().softmax(dim=1)
+    probs = logits.float().softmax(dim=1)
+    return {
+        "max_abs_diff": (reference - probs).abs().max().item(),
+        "top1_agreement": (reference.argmax(dim=1) == probs.argmax(dim=1)).float().mean().item(),
+    }
@@ -0,0 +1,266 @@
+"""Structured channel pruning that physically shrinks `create_model` networks"""
+
+import copy
+import math
+import torch
+import torch.nn as nn
+from typing import Dict, List, Optional, Tuple
+
+from .classifier import count_macs
+from .quantization import measure_latency
+
+
+def channel_groups(model: nn.Module, architecture: str) -> List[Dict[str, list]]:
+    """
+    Channel groups that can be pruned without touching a block's interface.
+
+    Each group is the inner width of one block (the bottleneck of a DenseNet
+    layer or ResNet block, the expanded channels of a MobileNetV3 block), so
+    concatenations and residual additions keep their channel counts and
+    pruning a group is a local change.
+
+    Returns:
+        List of dicts with 'out' (modules whose output channels are the
+        group: convolutions, batch norms, depthwise convolutions, the SE
+        expansion), 'in' (modules consuming the group as input channels) and
+        'score' (the batch norm whose |gamma| ranks the channels)
+    """
+    groups = []
+    if architecture == "densenet121":
+        for name, module in model.named_modules():
+            if type(module).__name__ == "_DenseLayer":
+                groups.append({
+                    "out": [f"{name}.conv1", f"{name}.norm2"],
+                    "in": [f"{name}.conv2"],
+                    "score": f"{name}.norm2",
+                })
+
+    elif architecture == "resnet50":
+        for name, module in model.named_modules():
+            if type(module).__name__ == "Bottleneck":
+                for i in (1, 2):
+                    groups.append({
+                        "out": [f"{name}.conv{i}", f"{name}.bn{i}"],
+                        "in": [f"{name}.conv{i + 1}"],
+                        "score": f"{name}.bn{i}",
+                    })
+
+    elif architecture == "mobilenet_v3_small":
+        for name, module in model.named_modules():
+            if type(module).__name__ != "InvertedResidual":
+                continue
+            layers = [f"{name}.block.{i}" for i in range(len(module.block))]
+            if not isinstance(module.block[0][0], nn.Conv2d) or module.block[0][0].groups != 1 or len(layers) < 3:
+                continue  # no expansion (first block): the depthwise width is the block input
+            expand, depthwise, project = layers[0], layers[1], layers[-1]
+            has_se = len(layers) == 4
+            groups.append({
+                "out": [f"{expand}.0", f"{expand}.1", f"{depthwise}.0", f"{depthwise}.1"]
+                + ([f"{layers[2]}.fc2"] if has_se else []),
+                "in": ([f"{layers[2]}.fc1"] if has_se else []) + [f"{project}.0"],
+                "score": f"{depthwise}.1",
+            })
+        groups.append({
+            "out": ["features.12.0", "features.12.1"],
+            "in": ["classifier.0"],
+            "score": "features.12.1",
+        })
+
+    else:
+        raise ValueError(f"Unsupported architecture: {architecture}")
+    return groups
+
+
+def _take(tensor: torch.Tensor, keep: torch.Tensor, dim: int) -> torch.Tensor:
+    """`tensor` indexed along `dim`, keeping channels_last layout if it had one"""
+    out = tensor.index_select(dim, keep.to(tensor.device))
+    if out.dim() == 4 and tensor.is_contiguous(memory_format=torch.channels_last) and not tensor.is_contiguous():
+        out = out.contiguous(memory_format=torch.channels_last)
+    return out
+
+
+def _set_param(module: nn.Module, name: str, value: torch.Tensor):
+    old = getattr(module, name)
+    param = nn.Parameter(value, requires_grad=old.requires_grad)
+    setattr(module, name, param)
+
+
+def _prune_out(module: nn.Module, keep: torch.Tensor):
+    if isinstance(module, nn.BatchNorm2d):
+        _set_param(module, "weight", _take(module.weight.data, keep, 0))
+        _set_param(module, "bias", _take(module.bias.data, keep, 0))
+        module.running_mean = _take(module.running_mean, keep, 0)
+        module.running_var = _take(module.running_var, keep, 0)
+        module.num_features = len(keep)
+    elif isinstance(module, nn.Conv2d):
+        depthwise = module.groups > 1 and module.groups == module.in_channels == module.out_channels
+        _set_param(module, "weight", _take(module.weight.data, keep, 0))
+        if module.bias is not None:
+            _set_param(module, "bias", _take(module.bias.data, keep, 0))
+        module.out_channels = len(keep)
+        if depthwise:
+            module.in_channels = module.groups = len(keep)
+    elif isinstance(module, nn.Linear):
+        _set_param(module, "weight", _take(module.weight.data, keep, 0))
+        if module.bias is not None:
+            _set_param(module, "bias", _take(module.bias.data, keep, 0))
+        module.out_features = len(keep)
+    else:
+        raise TypeError(f"Cannot prune output channels of {type(module).__name__}")
+
+
+def _prune_in(module: nn.Module, keep: torch.Tensor):
+    if isinstance(module, nn.Conv2d) and module.groups == 1:
+        _set_param(module, "weight", _take(module.weight.data, keep, 1))
+        module.in_channels = len(keep)
+    elif isinstance(module, nn.Linear):
+        _set_param(module, "weight", _take(module.weight.data, keep, 1))
+        module.in_features = len(keep)
+    else:
+        raise TypeError(f"Cannot prune input channels of {type(module).__name__}")
+
+
+def group_width(model: nn.Module, group: dict) -> int:
+    """Current number of channels in a group"""
+    return model.get_submodule(group["score"]).num_features
+
+
+def prune_group(model: nn.Module, group: dict, keep: torch.Tensor):
+    """
+    Keep only the channels `keep` of a group, slicing every module in it in place.
+
+    Args:
+        model: Model the group belongs to
+        group: Entry of `channel_groups`
+        keep: Sorted channel indices to keep
+    """
+    for name in group["out"]:
+        _prune_out(model.get_submodule(name), keep)
+    for name in group["in"]:
+        _prune_in(model.get_submodule(name), keep)
+
+
+def prune_model(model: nn.Module, architecture: str, ratio: float, multiple: int = 8) -> nn.Module:
+    """
+    Remove the least important `ratio` of the channels of every group.
+
+    Channels are ranked by the |gamma| of the group's batch norm (a channel
+    the norm scales towards zero contributes little downstream). Kept widths
+    are rounded up to a multiple of `multiple`, which vectorized CPU kernels
+    and the Neural Engine handle best.
+
+    Args:
+        model: Model from `create_model` (pruned in place)
+        architecture: Model architecture
+        ratio: Fraction of each group's channels to remove, in [0, 1)
+        multiple: Kept widths are multiples of this (and at least this)
+
+    Returns:
+        The pruned model
+    """
+    if not 0.0 <= ratio < 1.0:
+        raise ValueError(f"ratio must be in [0, 1), got {ratio}")
+    for group in channel_groups(model, architecture):
+        width = group_width(model, group)
+        keep_count = min(width, max(multiple, math.ceil(width * (1.0 - ratio) / multiple) * multiple))
+        if keep_count == width:
+            continue
+        scores = model.get_submodule(group["score"]).weight.detach().abs()
+        keep = scores.topk(keep_count).indices.sort().values
+        prune_group(model, group, keep)
+    return model
+
+
+def match_state_dict(model: nn.Module, architecture: str, state_dict: dict) -> nn.Module:
+    """
+    Shrink a freshly created model to the channel widths of a pruned state dict.
+
+    Models are always built at full width by `create_model`; this slices
+    each group down to the width stored in `state_dict` so the pruned
+    weights can then be loaded. A full-width state dict leaves the model
+    unchanged.
+
+    Returns:
+        The model, ready for `load_state_dict(state_dict)`
+    """
+    for group in channel_groups(model, architecture):
+        key = f"{group['score']}.weight"
+        if key not in state_dict:
+            continue
+        width = state_dict[key].shape[0]
+        if width != group_width(model, group):
+            prune_group(model, group, torch.arange(width))
+    return model
+
+
+def prune_to_budget(
+    model: nn.Module,
+    architecture: str,
+    img_size: int = 224,
+    target_flops: Optional[float] = None,
+    target_latency_ms: Optional[float] = None,
+    multiple: int = 8,
+    max_ratio: float = 0.9,
+    steps: int = 8,
+    latency_runs: int = 10,
+) -> Tuple[nn.Module, float, float]:
+    """
+    Find the smallest pruning ratio that meets a FLOPs or CPU latency budget.
+
+    Bisects the ratio of `prune_model`, pruning a copy of the model at each
+    step and measuring its cost; the layers outside the pruned groups set a
+    floor on how far the cost can drop.
+
+    Args:
+        model: Trained model (left unchanged)
+        architecture: Model architecture
+        img_size: Input size the cost is measured at
+        target_flops: Budget in FLOPs per image
+        target_latency_ms: Budget in median single-image CPU latency
+        multiple: Kept widths are multiples of this
+        max_ratio: Largest ratio tried
+        steps: Bisection steps
+        latency_runs: Forward passes per latency measurement
+
+    Returns:
+        Tuple of (pruned copy of the model, ratio used, its cost). If the
+        budget cannot be met, the model pruned at `max_ratio`.
+    """
+    if (target_flops is None) == (target_latency_ms is None):
+        raise ValueError("Give exactly one of target_flops and target_latency_ms")
+
+    if target_flops is not None:
+        budget = target_flops
+
+        def cost(m: nn.Module) -> float:
+            return 2 * count_macs(m, img_size)
+    else:
+        budget = target_latency_ms
+        x = torch.rand(1, 3, img_size, img_size)
+
+        def cost(m: nn.Module) -> float:
+            return measure_latency(copy.deepcopy(m).float().cpu().eval(), x, runs=latency_runs)
+
+    def pruned(ratio: float) -> Tuple[nn.Module, float]:
+        candidate = prune_model(copy.deepcopy(model), architecture, ratio, multiple)
+        return candidate, cost(candidate)
+
+    best = pruned(0.0)
+    if best[1] <= budget:
+        return best[0], 0.0, best[1]
+    best_ratio = max_ratio
+    best = pruned(max_ratio)
+    if best[1] > budget:
+        print(f"WARNING: Budget {budget:g} not reachable; pruning {max_ratio:.0%} of channels gives {best[1]:g}")
+        return best[0], max_ratio, best[1]
+
+    low, high = 0.0, max_ratio
+    for _ in range(steps):
+        mid = (low + high) / 2
+        candidate, candidate_cost = pruned(mid)
+        print(f"  ratio {mid:.3f}: {candidate_cost:g}")
+        if candidate_cost <= budget:
+            high, best, best_ratio = mid, (candidate, candidate_cost), mid
+        else:
+            low = mid
+    return best[0], best_ratio, best[1]
@@ -1,6 +1,20 @@
 """Training utilities and callbacks"""
 
-from .trainer import create_trainer
-from .callbacks import setup_callbacks
+import importlib
 
-__all__ = ["create_trainer", "setup_callbacks"]
+# Resolved on first access; ignite is only imported when training code is used
+_EXPORTS = {
+    "AsyncCheckpointWriter": ".trainer",
+    "create_evaluator": ".trainer",
+    "create_trainer": ".trainer",
+    "load_checkpoint": ".trainer",
+    "setup_callbacks": ".callbacks",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,34 @@
 """Training callbacks for logging and checkpointing"""
 
+import os
 import time
+import shutil
 import datetime
-import numpy as np
 from collections import deque
 from pathlib import Path
 from ignite.engine import Events
 
+from .metrics import classification_report, format_top_k, write_report
+from .resume import ENGINE_STATE_KEYS, training_state
+
+
+def _link_atomic(src: Path, dst: Path):
+    """
+    Point dst at src's contents without writing the data a second time.
+
+    Hardlinks src to a temp name and renames it over dst, so readers never
+    see a partially written file. Falls back to copying where hardlinks are
+    not supported.
+    """
+    tmp = dst.with_name(dst.name + ".tmp")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
 
 def setup_callbacks(
     trainer,
@@ -15,6 +37,15 @@ def setup_callbacks(
     test_loader,
     output_dir: str,
     verbose: bool = True,
+    train_metrics: str = "full",
+    train_eval_loader=None,
+    keep_last: int = None,
+    early_stopping_patience: int = None,
+    early_stopping_min_delta: float = 0.0,
+    checkpoint_writer=None,
+    save_checkpoints: bool = True,
+    eval_reports: bool = False,
+    class_names: list = None,
 ):
     """
     Set up training callbacks for logging and checkpointing.
@@ -26,26 +57,74 @@ def setup_callbacks(
         test_loader: Testing data loader
         output_dir: Directory to save checkpoints
         verbose: Whether to print detailed progress
+        train_metrics: How the epoch's training metrics are computed:
+            'running' reads the metrics accumulated on the trainer,
+            'subsample' evaluates `train_eval_loader`,
+            'full' re-evaluates the whole `train_loader`
+        train_eval_loader: Non-augmented training subsample (for 'subsample')
+        keep_last: Number of epoch checkpoints to keep (None keeps all);
+            `checkpoint_latest.pt` and `best.pt` are kept regardless
+        early_stopping_patience: Stop after this many epochs without test
+            accuracy improvement (None disables early stopping)
+        early_stopping_min_delta: Minimum test accuracy gain that counts as
+            an improvement
+        checkpoint_writer: AsyncCheckpointWriter to write checkpoints in the
+            background (None writes synchronously); flushed when training completes
+        save_checkpoints: Whether this process writes checkpoints (False on
+            every rank but 0 in distributed training). Best-model tracking
+            and early stopping still run, on metrics synced across ranks.
+        eval_reports: Write a per-class classification report of every
+            test evaluation to `output_dir/eval/epoch_NNN.json` (needs an
+            evaluator with a confusion matrix; only where checkpoints are saved)
+        class_names: Class names for the reports
     """
+    if train_metrics == "subsample" and train_eval_loader is None:
+        raise ValueError("train_metrics='subsample' requires a train_eval_loader")
+
     output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if save_checkpoints:
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    @trainer.on(Events.EPOCH_STARTED)
+    def reshuffle_distributed_sampler(engine):
+        """DistributedSampler derives its shuffle from the epoch number"""
+        sampler = getattr(train_loader, 'sampler', None)
+        if hasattr(sampler, 'set_epoch'):
+            sampler.set_epoch(engine.state.epoch - 1)
+
+    # Saved with the engine state in checkpoints, so a resumed run keeps tracking the best model
+    trainer.state_dict_user_keys.extend(key for key in ENGINE_STATE_KEYS if key not in trainer.state_dict_user_keys)
 
     @trainer.on(Events.STARTED)
     def initialize_custom_vars(engine):
-        """Initialize custom tracking variables"""
+        """Initialize custom tracking variables (keeping values restored from a checkpoint)"""
         engine.iteration_timings = deque(maxlen=100)
         engine.iteration_loss = deque(maxlen=100)
+        engine.iteration_loss_sum = 0.0
+        # Epoch a mid-epoch resume continues, whose running metrics miss the batches before it
+        done = engine.state.iteration % engine.state.epoch_length
+        engine.resumed_epoch = engine.state.epoch + 1 if done else None
+        engine.state.best_accuracy = getattr(engine.state, 'best_accuracy', None)
+        engine.state.best_epoch = getattr(engine.state, 'best_epoch', None)
+        engine.state.epochs_without_improvement = getattr(engine.state, 'epochs_without_improvement', 0)
 
     @trainer.on(Events.ITERATION_COMPLETED)
     def log_training_loss(engine):
         """Log training progress each iteration"""
-        engine.iteration_timings.append(time.time())
-        engine.iteration_loss.append(engine.state.output)
+        engine.iteration_timings.append(time.perf_counter())
+        loss = engine.state.output[-1]
+
+        # Running sum over the window instead of re-averaging the deque every iteration
+        if len(engine.iteration_loss) == engine.iteration_loss.maxlen:
+            engine.iteration_loss_sum -= engine.iteration_loss[0]
+        engine.iteration_loss.append(loss)
+        engine.iteration_loss_sum += loss
 
         if verbose:
+            timings = engine.iteration_timings
             seconds_per_iteration = (
-                np.mean(np.gradient(engine.iteration_timings))
-                if len(engine.iteration_timings) > 1
+                (timings[-1] - timings[0]) / (len(timings) - 1)
+                if len(timings) > 1
                 else 0
             )
             eta = seconds_per_iteration * (
@@ -56,8 +135,8 @@ def setup_callbacks(
                 f"\rEPOCH: {engine.state.epoch:03d} | "
                 f"BATCH: {engine.state.iteration % len(train_loader):03d} "
                 f"of {len(train_loader):03d} | "
-                f"LOSS: {engine.state.output:.3f} "
-                f"({np.mean(engine.iteration_loss):.3f}) | "
+                f"LOSS: {loss:.3f} "
+                f"({engine.iteration_loss_sum / len(engine.iteration_loss):.3f}) | "
                 f"({seconds_per_iteration:.2f} s/it; "
                 f"ETA {str(datetime.timedelta(seconds=int(eta)))})",
                 end=''
@@ -65,14 +144,22 @@ def setup_callbacks(
 
     @trainer.on(Events.EPOCH_COMPLETED)
     def log_training_results(engine):
-        """Evaluate on training set after each epoch"""
-        evaluator.run(train_loader)
-        metrics = evaluator.state.metrics
+        """Report training set metrics after each epoch"""
+        if train_metrics == "running":
+            metrics = engine.state.metrics
+        elif train_metrics == "subsample":
+            evaluator.run(train_eval_loader)
+            metrics = evaluator.state.metrics
+        else:
+            evaluator.run(train_loader)
+            metrics = evaluator.state.metrics
         acc = metrics['accuracy']
         loss = metrics['loss']
 
         print(f"\nEnd of epoch {engine.state.epoch:03d}")
         print(f"TRAINING   Accuracy: {acc:.3f} | Loss: {loss:.3f}")
+        if train_metrics == "running" and engine.state.epoch == engine.resumed_epoch:
+            print("           (running metrics cover only the batches after the resume point)")
 
     @trainer.on(Events.EPOCH_COMPLETED)
     def log_validation_results(engine):
@@ -81,29 +168,75 @@ def setup_callbacks(
         metrics = evaluator.state.metrics
         acc = metrics['accuracy']
         loss = metrics['loss']
+        engine.state.val_metrics = dict(metrics)
+
+        print(f"TESTING    Accuracy: {acc:.3f}{format_top_k(metrics)} | Loss: {loss:.3f}\n")
 
-        print(f"TESTING    Accuracy: {acc:.3f} | Loss: {loss:.3f}\n")
+        if eval_reports and save_checkpoints and 'confusion_matrix' in metrics:
+            report = classification_report(metrics, class_names)
+            report["epoch"] = engine.state.epoch
+            write_report(report, output_dir / "eval" / f"epoch_{engine.state.epoch:03d}.json")
 
     @trainer.on(Events.EPOCH_COMPLETED)
     def save_checkpoint(engine):
-        """Save checkpoint every epoch"""
+        """Save checkpoint every epoch, track the best model and prune old checkpoints"""
         from .trainer import save_checkpoint as save_ckpt
 
-        checkpoint_path = output_dir / f"checkpoint_epoch_{engine.state.epoch:03d}.pt"
-        save_ckpt(
-            engine.state.model if hasattr(engine.state, 'model') else trainer.state_dict(),
-            engine.state.optimizer if hasattr(engine.state, 'optimizer') else None,
-            engine.state.epoch,
-            str(checkpoint_path)
-        )
-
-        # Also save as "latest"
-        latest_path = output_dir / "checkpoint_latest.pt"
-        save_ckpt(
-            engine.state.model if hasattr(engine.state, 'model') else trainer.state_dict(),
-            engine.state.optimizer if hasattr(engine.state, 'optimizer') else None,
-            engine.state.epoch,
-            str(latest_path)
-        )
-
-    print(f"Callbacks configured. Checkpoints will be saved to: {output_dir}")
+        epoch = engine.state.epoch
+        checkpoint_path = output_dir / f"checkpoint_epoch_{epoch:03d}.pt"
+
+        acc = engine.state.val_metrics['accuracy']
+        best = engine.state.best_accuracy
+        is_best = best is None or acc > best + early_stopping_min_delta
+        if is_best:
+            engine.state.best_accuracy = acc
+            engine.state.best_epoch = epoch
+            engine.state.epochs_without_improvement = 0
+            print(f"New best test accuracy {acc:.3f} (epoch {epoch:03d})")
+        else:
+            engine.state.epochs_without_improvement += 1
+
+        def on_written():
+            # "latest" and "best" are hardlinks to the epoch file, not second writes
+            _link_atomic(checkpoint_path, output_dir / "checkpoint_latest.pt")
+            if is_best:
+                _link_atomic(checkpoint_path, output_dir / "best.pt")
+
+            # Retention: keep the newest `keep_last` epoch files
+            if keep_last is not None:
+                epoch_files = sorted(output_dir.glob("checkpoint_epoch_*.pt"))
+                for old_path in epoch_files[:-keep_last] if keep_last > 0 else epoch_files:
+                    old_path.unlink()
+
+        if save_checkpoints:
+            save_ckpt(
+                engine.state.model if hasattr(engine.state, 'model') else trainer.state_dict(),
+                engine.state.optimizer if hasattr(engine.state, 'optimizer') else None,
+                epoch,
+                str(checkpoint_path),
+                writer=checkpoint_writer,
+                on_written=on_written,
+                extra=training_state(engine),
+            )
+
+        if (
+            early_stopping_patience is not None
+            and engine.state.epochs_without_improvement >= early_stopping_patience
+        ):
+            print(
+                f"Early stopping: no test accuracy improvement for "
+                f"{early_stopping_patience} epochs (best {engine.state.best_accuracy:.3f} "
+                f"at epoch {engine.state.best_epoch:03d})"
+            )
+            engine.terminate()
+
+    if checkpoint_writer is not None:
+        @trainer.on(Events.COMPLETED)
+        def flush_checkpoints(engine):
+            """Wait for background checkpoint writes before run() returns"""
+            checkpoint_writer.flush()
+
+    if save_checkpoints:
+        print(f"Callbacks configured. Checkpoints will be saved to: {output_dir}")
+    else:
+        print("Callbacks configured (checkpoints disabled)")
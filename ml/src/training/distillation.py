@@ -0,0 +1,131 @@
+"""Knowledge distillation from a trained teacher into a smaller student"""
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from pathlib import Path
+from typing import Optional
+
+from data.cache import samples_fingerprint
+from .output_cache import build_output_cache
+from .trainer import autocast
+
+TEACHER_CACHE_VERSION = 2
+LOGITS_FILE = "logits.f32"
+
+
+class DistillationLoss(nn.Module):
+    """
+    Weighted mix of a soft teacher loss and the hard-label cross entropy.
+
+        loss = alpha * T^2 * KL(softmax(teacher / T) || softmax(student / T))
+               + (1 - alpha) * CE(student, labels)
+
+    The T^2 factor keeps the soft term's gradient scale independent of the
+    temperature (Hinton et al., 2015). Called without teacher logits (as the
+    evaluator and the running train metrics do) it is plain cross entropy.
+    """
+
+    def __init__(self, alpha: float = 0.7, temperature: float = 4.0):
+        super().__init__()
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError(f"alpha must be in [0, 1], got {alpha}")
+        self.alpha = alpha
+        self.temperature = temperature
+
+    def forward(
+        self,
+        student_logits: torch.Tensor,
+        targets: torch.Tensor,
+        teacher_logits: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        hard = F.cross_entropy(student_logits, targets)
+        if teacher_logits is None:
+            return hard
+
+        t = self.temperature
+        soft = F.kl_div(
+            F.log_softmax(student_logits.float() / t, dim=1),
+            F.log_softmax(teacher_logits.float() / t, dim=1),
+            reduction="batchmean",
+            log_target=True,
+        ) * (t * t)
+        return self.alpha * soft + (1.0 - self.alpha) * hard
+
+
+class OnlineTeacher:
+    """
+    Runs the teacher on every (augmented) training batch.
+
+    Used when training images are augmented, since each epoch then sees
+    different inputs.
+    """
+
+    def __init__(self, model: nn.Module, device: str = "cpu", precision: str = "fp32"):
+        self.model = model.eval()
+        self.device = device
+        self.precision = precision
+
+    def __call__(self, x: torch.Tensor, batch) -> torch.Tensor:
+        with torch.no_grad(), autocast(self.device, self.precision):
+            return self.model(x).float()
+
+
+class CachedTeacher:
+    """
+    Looks up precomputed teacher logits by sample index.
+
+    Requires a train loader that yields `(images, labels, indices)` (see
+    `data.dataset.IndexedDataset`) over non-augmented images, so the
+    teacher's output for each sample is the same every epoch.
+    """
+
+    def __init__(self, logits: torch.Tensor, device: str = "cpu"):
+        self.logits = logits.to(device)
+        self.device = device
+
+    def __call__(self, x: torch.Tensor, batch) -> torch.Tensor:
+        if len(batch) < 3:
+            raise ValueError("CachedTeacher needs batches of (images, labels, indices)")
+        return self.logits[batch[2].to(self.device)]
+
+
+def build_teacher_cache(
+    teacher: nn.Module,
+    loader: torch.utils.data.DataLoader,
+    cache_path: str,
+    key: dict,
+    device: str = "cpu",
+    precision: str = "fp32",
+    channels_last: bool = False,
+) -> torch.Tensor:
+    """
+    Teacher logits for every sample of a dataset, computed once and cached.
+
+    Logits are stored in dataset order as `logits.f32` (float32, shape
+    (N, C)) by `build_output_cache`, with `index.json` holding `key`. The
+    cache is reused while `key` and the dataset's sample fingerprint are
+    unchanged.
+
+    Args:
+        teacher: Trained teacher model
+        loader: Unshuffled, non-augmented loader (see `data.create_eval_loader`)
+            whose dataset has ImageFolder's `samples`
+        cache_path: Directory for this split's cache
+        key: Everything else the logits depend on (teacher weights,
+            architecture, image size, precision)
+        device: Device the teacher is on
+        precision: Forward pass precision
+        channels_last: Feed batches in channels_last memory format
+
+    Returns:
+        Logits tensor (N, C) on the CPU
+    """
+    key = {**key, "fingerprint": samples_fingerprint(loader.dataset.samples)}
+    index = build_output_cache(
+        teacher, [loader], cache_path, LOGITS_FILE, TEACHER_CACHE_VERSION, key, dtype=np.float32,
+        device=device, precision=precision, channels_last=channels_last,
+    )
+    logits = np.fromfile(Path(cache_path) / LOGITS_FILE, dtype=np.float32).reshape(index["shape"])
+    return torch.from_numpy(logits)
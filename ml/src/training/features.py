@@ -0,0 +1,158 @@
+"""Cached backbone features for training only the classification head"""
+
+import copy
+import json
+import numpy as np
+import torch
+import torch.nn as nn
+from pathlib import Path
+from typing import Tuple
+from ignite.engine import Events
+
+from data.cache import samples_fingerprint
+from models.classifier import get_head
+from .callbacks import setup_callbacks
+from .output_cache import INDEX_FILE, build_output_cache, penultimate_features
+from .trainer import create_trainer
+
+FEATURE_CACHE_VERSION = 1
+FEATURES_FILE = "features.f16"
+
+
+def build_feature_cache(
+    model: nn.Module,
+    architecture: str,
+    loader: torch.utils.data.DataLoader,
+    cache_path: str,
+    key: dict,
+    device: str = "cpu",
+    precision: str = "fp32",
+    channels_last: bool = False,
+) -> Path:
+    """
+    Compute penultimate features for a dataset once and store them as float16.
+
+    The head is temporarily replaced with nn.Identity and the model is run
+    over `loader` (which should be unshuffled and not augmented, see
+    `data.create_eval_loader`) by `build_output_cache`. Features go to
+    `features.f16`, shape (N, D); `index.json` holds the labels, classes and
+    `key`. The cache is reused while `key` and the dataset's sample
+    fingerprint are unchanged.
+
+    Args:
+        model: Model from `create_model` with the backbone weights to use
+        architecture: Model architecture
+        loader: Loader whose dataset has ImageFolder's `samples` and `classes`
+        cache_path: Directory for this split's cache
+        key: Everything else the features depend on (architecture, backbone
+            weights, image size, precision)
+        device: Device the model is on
+        precision: Forward pass precision
+        channels_last: Feed batches in channels_last memory format
+
+    Returns:
+        Path to the cache directory
+    """
+    dataset = loader.dataset
+    key = {**key, "fingerprint": samples_fingerprint(dataset.samples)}
+    with penultimate_features(model, architecture):
+        build_output_cache(
+            model, [loader], cache_path, FEATURES_FILE, FEATURE_CACHE_VERSION, key,
+            index={"classes": dataset.classes, "labels": [label for _, label in dataset.samples]},
+            device=device, precision=precision, channels_last=channels_last,
+        )
+    return Path(cache_path)
+
+
+def load_feature_cache(cache_path: str) -> torch.utils.data.TensorDataset:
+    """
+    Load a feature cache into memory.
+
+    Args:
+        cache_path: Directory written by `build_feature_cache`
+
+    Returns:
+        TensorDataset of (float32 features, int64 labels)
+    """
+    cache_path = Path(cache_path)
+    with open(cache_path / INDEX_FILE, 'r') as f:
+        index = json.load(f)
+    features = np.fromfile(cache_path / FEATURES_FILE, dtype=np.float16).reshape(index["shape"])
+    return torch.utils.data.TensorDataset(
+        torch.from_numpy(features).float(),
+        torch.tensor(index["labels"], dtype=torch.int64),
+    )
+
+
+def fit_head(
+    model: nn.Module,
+    architecture: str,
+    train_features: torch.utils.data.Dataset,
+    test_features: torch.utils.data.Dataset,
+    epochs: int = 50,
+    learning_rate: float = 0.001,
+    batch_size: int = 256,
+    device: str = "cpu",
+    verbose: bool = True,
+    early_stopping_patience: int = None,
+    early_stopping_min_delta: float = 0.0,
+) -> Tuple[float, int]:
+    """
+    Train only the model's final nn.Linear on cached features.
+
+    Runs the regular Ignite trainer and callbacks with the head as the model
+    and feature batches as inputs, so an epoch takes milliseconds. No
+    checkpoints are written; the head from the best test epoch is loaded
+    back into `model` at the end.
+
+    Args:
+        model: Model whose head is trained in place
+        architecture: Model architecture
+        train_features: Dataset of (features, label) from `load_feature_cache`
+        test_features: Test split features
+        epochs: Maximum number of epochs
+        learning_rate: Adam learning rate
+        batch_size: Feature batch size
+        device: Device to train the head on
+        verbose: Log every iteration
+        early_stopping_patience: Stop after this many epochs without test
+            accuracy improvement (None disables)
+        early_stopping_min_delta: Minimum test accuracy increase that counts
+            as an improvement
+
+    Returns:
+        Tuple of (best test accuracy, best epoch)
+    """
+    head = get_head(model, architecture)
+    train_loader = torch.utils.data.DataLoader(train_features, batch_size=batch_size, shuffle=True)
+    test_loader = torch.utils.data.DataLoader(test_features, batch_size=batch_size)
+
+    optimizer = torch.optim.Adam(head.parameters(), lr=learning_rate)
+    trainer, evaluator = create_trainer(
+        head, optimizer, nn.CrossEntropyLoss(), device, train_metrics="running",
+        num_classes=head.out_features,
+    )
+    setup_callbacks(
+        trainer=trainer,
+        evaluator=evaluator,
+        train_loader=train_loader,
+        test_loader=test_loader,
+        output_dir="",
+        verbose=verbose,
+        train_metrics="running",
+        early_stopping_patience=early_stopping_patience,
+        early_stopping_min_delta=early_stopping_min_delta,
+        save_checkpoints=False,
+    )
+
+    best_head = {}
+
+    @trainer.on(Events.EPOCH_COMPLETED)
+    def keep_best_head(engine):
+        if engine.state.best_epoch == engine.state.epoch:
+            best_head["state_dict"] = copy.deepcopy(head.state_dict())
+
+    trainer.run(train_loader, max_epochs=epochs)
+    head.load_state_dict(best_head["state_dict"])
+
+    return trainer.state.best_accuracy, trainer.state.best_epoch
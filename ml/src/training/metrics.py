@@ -0,0 +1,171 @@
+"""Streaming evaluation metrics and per-class classification reports"""
+
+import json
+import os
+import torch
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+from ignite.metrics import Accuracy, ConfusionMatrix, Loss, Metric, Precision, TopKCategoricalAccuracy
+
+
+def evaluation_metrics(
+    loss_fn: torch.nn.Module,
+    num_classes: Optional[int] = None,
+    top_k: Sequence[int] = (3, 5),
+    device: str = "cpu",
+) -> Dict[str, Metric]:
+    """
+    Metrics for the evaluator, all accumulated batch by batch.
+
+    Each metric keeps only fixed-size running state on `device` (counts,
+    a loss sum, a num_classes x num_classes confusion matrix), so memory does
+    not grow with the test set and no logits are stored or moved to the host
+    until the epoch is computed. Under torch.distributed the states are
+    summed across ranks.
+
+    Args:
+        loss_fn: Loss function
+        num_classes: Number of classes; enables top-k accuracy (for each
+            k < num_classes) and the confusion matrix, and with it per-class
+            recall. None keeps only accuracy, loss and precision.
+        top_k: k values for top-k accuracy, stored as 'top{k}'
+        device: Device the running state lives on
+
+    Returns:
+        Dict of metric name to ignite Metric
+    """
+    metrics = {
+        'accuracy': Accuracy(device=device),
+        'loss': Loss(loss_fn, device=device),
+        'precision': Precision(device=device),
+    }
+    if num_classes is not None:
+        for k in top_k:
+            if k < num_classes:
+                metrics[f'top{k}'] = TopKCategoricalAccuracy(k=k, device=device)
+        metrics['confusion_matrix'] = ConfusionMatrix(num_classes, device=device)
+    return metrics
+
+
+def top_k_keys(metrics: dict) -> List[str]:
+    """The 'top{k}' keys present in `metrics`, by increasing k"""
+    keys = [key for key in metrics if key.startswith("top") and key[3:].isdigit()]
+    return sorted(keys, key=lambda key: int(key[3:]))
+
+
+def format_top_k(metrics: dict) -> str:
+    """' | Top-3: 0.950 | Top-5: 0.980' for the top-k metrics present"""
+    return "".join(f" | Top-{key[3:]}: {metrics[key]:.3f}" for key in top_k_keys(metrics))
+
+
+def classification_report(
+    metrics: dict,
+    class_names: Optional[List[str]] = None,
+    num_confusions: int = 10,
+) -> dict:
+    """
+    Per-class recall, precision and F1 from an evaluator's metrics.
+
+    Args:
+        metrics: `evaluator.state.metrics` with a 'confusion_matrix' (rows
+            are true classes, columns predictions)
+        class_names: Class names in label order
+        num_confusions: Most frequent (true, predicted) mistakes to list
+
+    Returns:
+        JSON-serializable dict with the overall metrics, 'balanced_accuracy'
+        (mean per-class recall), 'macro_f1', 'per_class', 'top_confusions'
+        and the raw 'confusion_matrix'
+    """
+    matrix = metrics['confusion_matrix'].detach().cpu().round().to(torch.int64)
+    num_classes = len(matrix)
+    class_names = class_names or [str(i) for i in range(num_classes)]
+
+    support = matrix.sum(dim=1)
+    predicted = matrix.sum(dim=0)
+    correct = matrix.diag()
+    recall = correct / support.clamp(min=1)
+    precision = correct / predicted.clamp(min=1)
+    f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall), torch.zeros_like(recall))
+    present = support > 0
+
+    per_class = [
+        {
+            "class": class_names[i],
+            "support": support[i].item(),
+            "recall": round(recall[i].item(), 4),
+            "precision": round(precision[i].item(), 4),
+            "f1": round(f1[i].item(), 4),
+        }
+        for i in range(num_classes)
+    ]
+
+    mistakes = matrix.clone()
+    mistakes.fill_diagonal_(0)
+    counts, flat = mistakes.flatten().topk(min(num_confusions, mistakes.numel()))
+    top_confusions = [
+        {"true": class_names[idx // num_classes], "predicted": class_names[idx % num_classes], "count": count}
+        for count, idx in zip(counts.tolist(), flat.tolist())
+        if count > 0
+    ]
+
+    report = {
+        "samples": support.sum().item(),
+        "accuracy": round(metrics['accuracy'], 4),
+        "loss": round(metrics['loss'], 4) if 'loss' in metrics else None,
+    }
+    for key in top_k_keys(metrics):
+        report[key] = round(metrics[key], 4)
+    report.update({
+        "balanced_accuracy": round(recall[present].mean().item(), 4) if present.any() else 0.0,
+        "macro_f1": round(f1[present].mean().item(), 4) if present.any() else 0.0,
+        "per_class": per_class,
+        "top_confusions": top_confusions,
+        "confusion_matrix": matrix.tolist(),
+    })
+    return report
+
+
+def write_report(report: dict, path: str):
+    """Write a classification report as JSON (atomically)"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def print_classification_report(report: dict, worst: Optional[int] = None):
+    """
+    Print a classification report, classes with the lowest recall first.
+
+    Args:
+        report: Output of `classification_report`
+        worst: Only print this many classes (None prints all)
+    """
+    top_k = "".join(f", top-{key[3:]} {report[key]:.3f}" for key in top_k_keys(report))
+    print("\n" + "=" * 72)
+    print(f"CLASSIFICATION REPORT ({report['samples']} images)")
+    print("=" * 72)
+    print(
+        f"Accuracy {report['accuracy']:.3f}{top_k}, balanced accuracy "
+        f"{report['balanced_accuracy']:.3f}, macro F1 {report['macro_f1']:.3f}"
+    )
+
+    rows = sorted(report["per_class"], key=lambda row: (row["support"] == 0, row["recall"]))
+    if worst is not None:
+        rows = rows[:worst]
+    width = max([5] + [len(row["class"]) for row in rows])
+    print(f"\n{'class':<{width}} {'support':>8} {'recall':>8} {'precision':>10} {'f1':>7}")
+    for row in rows:
+        print(
+            f"{row['class']:<{width}} {row['support']:>8} {row['recall']:>8.3f} "
+            f"{row['precision']:>10.3f} {row['f1']:>7.3f}"
+        )
+
+    if report["top_confusions"]:
+        print("\nMost frequent confusions (true -> predicted):")
+        for item in report["top_confusions"]:
+            print(f"  {item['count']:>5}  {item['true']} -> {item['predicted']}")
+    print("=" * 72)
@@ -0,0 +1,145 @@
+"""Model outputs over whole datasets, computed once and cached on disk"""
+
+import json
+import os
+import numpy as np
+import torch
+import torch.nn as nn
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Optional, Sequence
+
+from data.cache import file_lock
+from models.classifier import replace_head
+from .trainer import autocast
+
+INDEX_FILE = "index.json"
+
+
+@contextmanager
+def penultimate_features(model: nn.Module, architecture: str):
+    """
+    Temporarily make `model` return its penultimate (head input) features.
+
+    The head is swapped for nn.Identity and put back on exit.
+    """
+    head = replace_head(model, architecture, nn.Identity())
+    try:
+        yield model
+    finally:
+        replace_head(model, architecture, head)
+
+
+def read_cache_index(cache_path: str, version: int, key: dict) -> Optional[dict]:
+    """`index.json` of a cache directory, or None if missing or written for another version or key"""
+    index_path = Path(cache_path) / INDEX_FILE
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r') as f:
+        index = json.load(f)
+    if index.get("version") != version or index.get("key") != key:
+        return None
+    return index
+
+
+def build_output_cache(
+    model: nn.Module,
+    loaders: Sequence[torch.utils.data.DataLoader],
+    cache_path: str,
+    data_file: str,
+    version: int,
+    key: dict,
+    index: Optional[dict] = None,
+    dtype=np.float16,
+    select: Optional[Callable] = None,
+    invalidates: Sequence[str] = (),
+    device: str = "cpu",
+    precision: str = "fp32",
+    channels_last: bool = False,
+) -> dict:
+    """
+    Run a model over datasets once and store its outputs as an (N, D) array.
+
+    Outputs of every loader are written, in loader order, through a memory
+    map to `data_file` in `cache_path`, so the dataset never has to fit in
+    memory. `index.json` (version, `key`, shape and the `index` fields) is
+    written last and only after the array is in place, so a complete index
+    always describes a complete array. The cache is reused while `version`
+    and `key` are unchanged; concurrent builders (DDP ranks, parallel sweep
+    trials) wait on `file_lock` and write per-process temp files.
+
+    Args:
+        model: Model to run, in eval mode for the duration of the build
+        loaders: Unshuffled, non-augmented loaders (see `data.create_eval_loader`)
+        cache_path: Cache directory
+        data_file: Name of the array file in the cache directory
+        version: Cache format version
+        key: Everything the outputs depend on, including the datasets'
+            sample fingerprints
+        index: Further fields stored in `index.json` (labels, classes, ...)
+        dtype: Stored dtype
+        select: Picks the tensor to store from the model output (default:
+            the output itself)
+        invalidates: Files in the cache directory derived from the previous
+            outputs, deleted when the cache is rebuilt
+        device: Device the model is on
+        precision: Forward pass precision
+        channels_last: Feed batches in channels_last memory format
+
+    Returns:
+        The cache's index dict
+    """
+    cache_path = Path(cache_path)
+    index_path = cache_path / INDEX_FILE
+
+    with file_lock(cache_path):
+        cached = read_cache_index(cache_path, version, key)
+        if cached is not None:
+            return cached
+
+        total = sum(len(loader.dataset) for loader in loaders)
+        print(f"Computing outputs for {total} images into {cache_path}...")
+        cache_path.mkdir(parents=True, exist_ok=True)
+        index_path.unlink(missing_ok=True)
+        for name in invalidates:
+            (cache_path / name).unlink(missing_ok=True)
+
+        tmp_data = cache_path / f"{data_file}.{os.getpid()}.tmp"
+        outputs = None
+        start = 0
+
+        was_training = model.training
+        model.eval()
+        try:
+            with torch.inference_mode():
+                for loader in loaders:
+                    for batch in loader:
+                        x = batch[0].to(device)
+                        if channels_last:
+                            x = x.contiguous(memory_format=torch.channels_last)
+                        with autocast(device, precision):
+                            output = model(x)
+                        output = (select(output) if select is not None else output).float().cpu().numpy()
+                        if outputs is None:
+                            outputs = np.memmap(tmp_data, dtype=dtype, mode='w+', shape=(total, output.shape[1]))
+                        outputs[start:start + len(output)] = output
+                        start += len(output)
+                        print(f"\r  Computed {start}/{total}", end='')
+        finally:
+            model.train(was_training)
+        print()
+
+        shape = outputs.shape
+        outputs.flush()
+        del outputs
+        os.replace(tmp_data, cache_path / data_file)
+
+        index = {"version": version, "key": key, "shape": list(shape), **(index or {})}
+        tmp_index = cache_path / f"{INDEX_FILE}.{os.getpid()}.tmp"
+        with open(tmp_index, 'w') as f:
+            json.dump(index, f)
+        os.replace(tmp_index, index_path)
+
+        size_mb = (cache_path / data_file).stat().st_size / (1024 * 1024)
+        print(f"  Written to {cache_path} ({size_mb:.1f} MB)")
+        return index
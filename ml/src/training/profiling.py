@@ -0,0 +1,180 @@
+"""Per-phase timing of the training loop and an optional torch.profiler window"""
+
+import json
+import time
+import torch
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Optional
+from ignite.engine import Engine, Events
+
+
+class StageTimer:
+    """
+    Accumulates wall time per named phase.
+
+    Only a running total, count and max are kept per phase, so recording
+    costs two perf_counter calls and a dict update. On CUDA, kernels run
+    asynchronously: with `synchronize=True` each phase waits for the device
+    before it is closed, so time is attributed to the phase that queued the
+    work (at the cost of losing CPU/GPU overlap while profiling).
+    """
+
+    def __init__(self, device: str = "cpu", synchronize: bool = True):
+        self.synchronize = synchronize and torch.device(device).type == "cuda"
+        self.totals = {}
+        self.counts = {}
+        self.maxima = {}
+
+    def add(self, name: str, seconds: float):
+        """Record `seconds` spent in phase `name`"""
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+        if seconds > self.maxima.get(name, 0.0):
+            self.maxima[name] = seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.synchronize:
+                torch.cuda.synchronize()
+            self.add(name, time.perf_counter() - start)
+
+    def summary(self, wall_seconds: Optional[float] = None) -> dict:
+        """
+        Per-phase totals, means and share of the wall time.
+
+        Args:
+            wall_seconds: Total training time; the time not covered by any
+                phase is reported as 'other'
+
+        Returns:
+            Dict of {"wall_s", "phases": {name: {"total_s", "mean_ms", "max_ms",
+            "count", "share"}}}
+        """
+        phases = {}
+        for name, total in self.totals.items():
+            phases[name] = {
+                "total_s": round(total, 4),
+                "mean_ms": round(1000 * total / self.counts[name], 3),
+                "max_ms": round(1000 * self.maxima[name], 3),
+                "count": self.counts[name],
+            }
+
+        if wall_seconds is not None:
+            other = wall_seconds - sum(self.totals.values())
+            phases["other"] = {"total_s": round(max(other, 0.0), 4), "count": None}
+            for stats in phases.values():
+                stats["share"] = round(stats["total_s"] / wall_seconds, 4) if wall_seconds else 0.0
+
+        return {"wall_s": None if wall_seconds is None else round(wall_seconds, 4), "phases": phases}
+
+
+def phase_timer(timer: Optional[StageTimer], name: str):
+    """`timer.phase(name)`, or a no-op context when profiling is off"""
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+def attach_profiling(
+    trainer: Engine,
+    evaluator: Engine,
+    timer: StageTimer,
+    output_dir: str,
+    trace_start: Optional[int] = None,
+    trace_iterations: int = 5,
+):
+    """
+    Record data loading and evaluation time and write a timing report.
+
+    The step phases (h2d, augment, forward, backward, optimizer) are recorded
+    by the trainer's step function when `create_trainer` is given the same timer.
+    Data loading is timed between Ignite's GET_BATCH events and evaluation
+    as the evaluator's full runs (including its own data loading). At the
+    end of training the summary is printed and written to
+    `output_dir/timing_report.json`.
+
+    Args:
+        trainer: Trainer engine
+        evaluator: Evaluator engine
+        timer: StageTimer shared with `create_trainer`
+        output_dir: Directory for timing_report.json and profiler traces
+        trace_start: First trainer iteration (1-based) recorded with
+            torch.profiler (None disables the trace)
+        trace_iterations: Number of iterations in the trace window
+    """
+    output_dir = Path(output_dir)
+    clock = {}
+
+    @trainer.on(Events.STARTED)
+    def start_clock(engine):
+        clock["start"] = time.perf_counter()
+
+    @trainer.on(Events.GET_BATCH_STARTED)
+    def batch_requested(engine):
+        clock["batch"] = time.perf_counter()
+
+    @trainer.on(Events.GET_BATCH_COMPLETED)
+    def batch_received(engine):
+        timer.add("data", time.perf_counter() - clock["batch"])
+
+    @evaluator.on(Events.STARTED)
+    def eval_started(engine):
+        clock["eval"] = time.perf_counter()
+
+    @evaluator.on(Events.COMPLETED)
+    def eval_completed(engine):
+        timer.add("eval", time.perf_counter() - clock["eval"])
+
+    if trace_start is not None:
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        profiler = torch.profiler.profile(activities=activities)
+        trace_end = trace_start + trace_iterations - 1
+
+        @trainer.on(Events.ITERATION_STARTED(once=trace_start))
+        def start_trace(engine):
+            profiler.start()
+
+        @trainer.on(Events.ITERATION_COMPLETED(once=trace_end))
+        def stop_trace(engine):
+            profiler.stop()
+            output_dir.mkdir(parents=True, exist_ok=True)
+            trace_path = output_dir / f"trace_iter_{trace_start:05d}-{trace_end:05d}.json"
+            profiler.export_chrome_trace(str(trace_path))
+            print(f"\nProfiler trace of iterations {trace_start}-{trace_end} saved to {trace_path}")
+            print(profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=15))
+
+    @trainer.on(Events.COMPLETED | Events.TERMINATE)
+    def write_report(engine):
+        if "report" in clock:
+            return
+        clock["report"] = True
+
+        summary = timer.summary(time.perf_counter() - clock["start"])
+        summary["iterations"] = engine.state.iteration
+        summary["epochs"] = engine.state.epoch
+        print_timing_report(summary)
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report_path = output_dir / "timing_report.json"
+        with open(report_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Timing report saved to {report_path}")
+
+
+def print_timing_report(summary: dict):
+    """Print a `StageTimer.summary` as a table"""
+    print("\n" + "=" * 60)
+    print(f"TIMING REPORT ({summary['iterations']} iterations, {summary['wall_s']:.1f} s)")
+    print("=" * 60)
+    print(f"{'phase':<12} {'total s':>10} {'share':>8} {'mean ms':>10} {'max ms':>10}")
+    for name, stats in sorted(summary["phases"].items(), key=lambda item: -item[1]["total_s"]):
+        mean = f"{stats['mean_ms']:.2f}" if "mean_ms" in stats else "-"
+        peak = f"{stats['max_ms']:.2f}" if "max_ms" in stats else "-"
+        print(f"{name:<12} {stats['total_s']:>10.2f} {stats['share']:>7.1%} {mean:>10} {peak:>10}")
+    print("=" * 60)
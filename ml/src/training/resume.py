@@ -0,0 +1,165 @@
+"""Exact training resume: engine, RNG and data-order state saved with checkpoints"""
+
+import random
+import signal
+import threading
+import numpy as np
+import torch
+from pathlib import Path
+from typing import Optional
+from ignite.engine import Engine, Events
+
+from .trainer import save_checkpoint
+
+RESUME_CHECKPOINT = "checkpoint_resume.pt"
+
+# Trainer state attributes (set up by `setup_callbacks`) saved with the engine state
+ENGINE_STATE_KEYS = ("best_accuracy", "best_epoch", "epochs_without_improvement")
+
+
+def rng_state() -> dict:
+    """Python, NumPy, torch CPU and CUDA random number generator states"""
+    kind, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    state = {
+        "python": random.getstate(),
+        # Plain lists, so checkpoints still load with torch.load(weights_only=True)
+        "numpy": [kind, keys.tolist(), pos, has_gauss, cached_gaussian],
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state: dict):
+    """Restore generator states captured by `rng_state`"""
+    random.setstate(state["python"])
+    kind, keys, pos, has_gauss, cached_gaussian = state["numpy"]
+    np.random.set_state((kind, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+    torch.set_rng_state(state["torch"].cpu())
+    if "cuda" in state and torch.cuda.is_available() and len(state["cuda"]) == torch.cuda.device_count():
+        torch.cuda.set_rng_state_all([s.cpu() for s in state["cuda"]])
+
+
+def training_state(trainer: Engine) -> dict:
+    """
+    Everything besides the model and optimizer that an exact resume needs.
+
+    Returns:
+        Dict with 'trainer' (iteration, epoch length, max epochs and the
+        best-model/early-stopping counters), 'rng' and, for fp16 training,
+        'scaler'
+    """
+    state = {"trainer": dict(trainer.state_dict()), "rng": rng_state()}
+    if getattr(trainer, "scaler", None) is not None:
+        state["scaler"] = trainer.scaler.state_dict()
+    return state
+
+
+def restore_training_state(trainer: Engine, checkpoint: dict, train_loader: torch.utils.data.DataLoader):
+    """
+    Put a trainer, its data order and the RNGs back where a checkpoint left them.
+
+    The next `trainer.run(train_loader)` continues at the iteration after
+    the checkpoint, with the epoch's order regenerated by the loader's
+    `ResumableSampler` and the batches already trained on skipped.
+
+    Args:
+        trainer: Trainer from `create_trainer`, with callbacks set up
+        checkpoint: Checkpoint dict holding `training_state` entries
+        train_loader: Training loader (same batch size and dataset as the
+            checkpointed run)
+    """
+    if "trainer" not in checkpoint:
+        raise ValueError("Checkpoint has no training state (saved before resume support); cannot resume exactly")
+
+    state = checkpoint["trainer"]
+    if state["epoch_length"] != len(train_loader):
+        raise ValueError(
+            f"Checkpoint epochs have {state['epoch_length']} iterations but the train loader has "
+            f"{len(train_loader)}; keep the batch size, process count and training images unchanged to resume"
+        )
+    trainer.load_state_dict(state)
+    if "scaler" in checkpoint and getattr(trainer, "scaler", None) is not None:
+        trainer.scaler.load_state_dict(checkpoint["scaler"])
+
+    done = state["iteration"] % state["epoch_length"]
+    train_loader.sampler.skip(done * train_loader.batch_size)
+    set_rng_state(checkpoint["rng"])
+
+
+def find_resume_checkpoint(output_dir: str) -> Optional[Path]:
+    """The most recently written of `checkpoint_resume.pt` and `checkpoint_latest.pt`, if any"""
+    candidates = [Path(output_dir) / name for name in (RESUME_CHECKPOINT, "checkpoint_latest.pt")]
+    candidates = [path for path in candidates if path.exists()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda path: path.stat().st_mtime)
+
+
+def attach_resume_checkpoints(
+    trainer: Engine,
+    output_dir: str,
+    every: Optional[int] = None,
+    checkpoint_writer=None,
+    save_checkpoints: bool = True,
+    handle_sigterm: bool = False,
+):
+    """
+    Write mid-epoch resume checkpoints.
+
+    Every `every` iterations the full training state goes to
+    `output_dir/checkpoint_resume.pt` (epoch ends are covered by the epoch
+    checkpoints). With `handle_sigterm`, SIGTERM (e.g. a spot instance
+    interruption) writes one at the end of the current iteration and stops
+    training, setting `trainer.state.interrupted`.
+
+    Args:
+        trainer: Trainer with `state.model` and `state.optimizer` set
+        output_dir: Checkpoint directory
+        every: Iterations between checkpoints (None: only on SIGTERM)
+        checkpoint_writer: AsyncCheckpointWriter for the periodic checkpoints
+        save_checkpoints: Whether this process writes checkpoints
+        handle_sigterm: Install the SIGTERM handler (single process only:
+            ranks would stop at different iterations; ignored off the main
+            thread, where signal handlers cannot be installed)
+    """
+    path = str(Path(output_dir) / RESUME_CHECKPOINT)
+    trainer.state.interrupted = False
+    requested = []
+
+    def save(engine: Engine, writer):
+        if save_checkpoints:
+            save_checkpoint(
+                engine.state.model,
+                engine.state.optimizer,
+                engine.state.epoch,
+                path,
+                writer=writer,
+                extra=training_state(engine),
+            )
+
+    if every:
+        @trainer.on(Events.ITERATION_COMPLETED(every=every))
+        def save_resume_checkpoint(engine):
+            """Periodic mid-epoch checkpoint (skipped at epoch ends, which have their own)"""
+            if engine.state.iteration % engine.state.epoch_length != 0:
+                save(engine, checkpoint_writer)
+
+    if handle_sigterm and threading.current_thread() is threading.main_thread():
+        previous = signal.signal(signal.SIGTERM, lambda signum, frame: requested.append(signum))
+
+        @trainer.on(Events.COMPLETED)
+        def restore_sigterm(engine):
+            signal.signal(signal.SIGTERM, previous)
+
+        @trainer.on(Events.ITERATION_COMPLETED)
+        def stop_on_sigterm(engine):
+            """Checkpoint and stop once a SIGTERM has arrived (after the epoch's evaluation at epoch ends)"""
+            if requested and engine.state.iteration % engine.state.epoch_length != 0:
+                print(f"\nSIGTERM received: saving {path} at iteration {engine.state.iteration} and stopping")
+                if checkpoint_writer is not None:
+                    checkpoint_writer.flush()
+                save(engine, None)
+                engine.state.interrupted = True
+                engine.terminate()
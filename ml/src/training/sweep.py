@@ -0,0 +1,255 @@
+"""Hyperparameter search spaces and ASHA-style early stopping of sweep trials"""
+
+import copy
+import csv
+import fcntl
+import itertools
+import json
+import math
+import os
+import random
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from ignite.engine import Engine, Events
+
+
+def sample_trials(search_space: Dict[str, Any], num_trials: Optional[int] = None, seed: int = 0) -> List[dict]:
+    """
+    Draw trial parameters from a search space.
+
+    Keys are dotted config paths (e.g. "training.learning_rate"). A value is
+    either a list of choices, a dict `{"log_uniform": [low, high]}` or
+    `{"uniform": [low, high]}`, or a constant. With `num_trials` set, that
+    many random draws are made; with None, every combination of the list
+    values is returned (ranges are not allowed in grid mode).
+
+    Args:
+        search_space: Mapping of dotted config key to choices or range
+        num_trials: Number of random trials (None for a full grid)
+        seed: Random seed
+
+    Returns:
+        List of {dotted key: value} dicts, one per trial
+    """
+    for key, space in search_space.items():
+        if isinstance(space, dict) and not (
+            len(space) == 1 and next(iter(space)) in ("log_uniform", "uniform")
+        ):
+            raise ValueError(f"{key}: expected a list, a constant, or one of log_uniform/uniform")
+
+    if num_trials is None:
+        keys = list(search_space)
+        choices = []
+        for key in keys:
+            space = search_space[key]
+            if isinstance(space, dict):
+                raise ValueError(f"{key}: ranges need a trial count; grid search takes lists only")
+            choices.append(space if isinstance(space, list) else [space])
+        return [dict(zip(keys, values)) for values in itertools.product(*choices)]
+
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(num_trials):
+        params = {}
+        for key, space in search_space.items():
+            if isinstance(space, list):
+                params[key] = rng.choice(space)
+            elif isinstance(space, dict) and "log_uniform" in space:
+                low, high = space["log_uniform"]
+                params[key] = float(f"{math.exp(rng.uniform(math.log(low), math.log(high))):.3g}")
+            elif isinstance(space, dict):
+                low, high = space["uniform"]
+                params[key] = float(f"{rng.uniform(low, high):.3g}")
+            else:
+                params[key] = space
+        trials.append(params)
+    return trials
+
+
+def apply_params(config: dict, params: Dict[str, Any]) -> dict:
+    """Copy of `config` with each dotted key in `params` set"""
+    config = copy.deepcopy(config)
+    for key, value in params.items():
+        *sections, name = key.split(".")
+        node = config
+        for section in sections:
+            node = node.setdefault(section, {})
+        node[name] = value
+    return config
+
+
+class ASHARule:
+    """
+    Asynchronous successive halving, as a stopping rule.
+
+    Rungs sit at `min_epochs * reduction_factor**k` epochs. When a trial
+    reaches a rung it records its metric there and continues only if it is
+    in the top `1 / reduction_factor` of every result recorded at that rung
+    so far (including trials that were later stopped). Early trials have
+    little to compare against and mostly continue; as the rungs fill up
+    only the best configurations get the full epoch budget.
+
+    Rung results live in a JSON file guarded by an flock, so trials running
+    in separate processes share one set of rungs without a coordinator.
+    """
+
+    def __init__(
+        self,
+        state_path: str,
+        max_epochs: int,
+        min_epochs: int = 1,
+        reduction_factor: int = 3,
+        mode: str = "max",
+    ):
+        if reduction_factor < 2:
+            raise ValueError(f"reduction_factor must be at least 2, got {reduction_factor}")
+        if mode not in ("max", "min"):
+            raise ValueError(f"mode must be 'max' or 'min', got {mode!r}")
+        self.state_path = Path(state_path)
+        self.min_epochs = min_epochs
+        self.reduction_factor = reduction_factor
+        self.max_epochs = max_epochs
+        self.mode = mode
+
+    @property
+    def rungs(self) -> List[int]:
+        """Epochs at which trials are compared (the last epoch never is)"""
+        rungs = []
+        epoch = self.min_epochs
+        while epoch < self.max_epochs:
+            rungs.append(epoch)
+            epoch *= self.reduction_factor
+        return rungs
+
+    @contextmanager
+    def _locked_state(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.state_path.with_suffix(".lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = {}
+                if self.state_path.exists():
+                    with open(self.state_path, 'r') as f:
+                        state = json.load(f)
+                yield state
+                tmp_path = self.state_path.with_suffix(".tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump(state, f, indent=2)
+                os.replace(tmp_path, self.state_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def report(self, trial_id: str, epoch: int, value: float) -> bool:
+        """
+        Record a trial's metric after `epoch` and decide whether it continues.
+
+        Args:
+            trial_id: Unique trial name
+            epoch: Epochs completed
+            value: Validation metric after that epoch
+
+        Returns:
+            False if the trial should stop at this rung
+        """
+        if epoch not in self.rungs:
+            return True
+
+        with self._locked_state() as state:
+            rung = state.setdefault(str(epoch), {})
+            rung[trial_id] = value
+            values = sorted(rung.values(), reverse=self.mode == "max")
+
+        # Continue while ranked within the top 1/reduction_factor of the rung
+        keep = max(1, math.ceil(len(values) / self.reduction_factor))
+        cutoff = values[keep - 1]
+        return value >= cutoff if self.mode == "max" else value <= cutoff
+
+
+def attach_asha(trainer: Engine, rule: ASHARule, trial_id: str, metric: str = "accuracy") -> dict:
+    """
+    Stop training when the trial falls out of the top of an ASHA rung.
+
+    Must be attached after `setup_callbacks`, whose EPOCH_COMPLETED handler
+    stores the test metrics in `trainer.state.val_metrics`.
+
+    Args:
+        trainer: Trainer engine
+        rule: Shared ASHA rule
+        trial_id: Unique trial name
+        metric: Key of `trainer.state.val_metrics` to compare
+
+    Returns:
+        Dict filled with 'stopped_at' (epoch) if the trial is stopped
+    """
+    outcome = {}
+
+    @trainer.on(Events.EPOCH_COMPLETED)
+    def asha_checkpoint(engine):
+        epoch = engine.state.epoch
+        value = engine.state.val_metrics[metric]
+        if not rule.report(trial_id, epoch, value):
+            print(f"ASHA: stopping {trial_id} at epoch {epoch:03d} ({metric} {value:.3f} below rung cutoff)")
+            outcome["stopped_at"] = epoch
+            engine.terminate()
+
+    return outcome
+
+
+def write_results(results: List[dict], output_dir: str, metric: str = "best_accuracy") -> Path:
+    """
+    Write sweep results as results.json and a results.csv comparison table.
+
+    Rows are sorted best first by `metric`; failed trials go last.
+
+    Returns:
+        Path to results.csv
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    rows = sorted(results, key=lambda r: (r.get(metric) is None, -(r.get(metric) or 0.0)))
+
+    with open(output_dir / "results.json", 'w') as f:
+        json.dump(rows, f, indent=2)
+
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    csv_path = output_dir / "results.csv"
+    with open(csv_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return csv_path
+
+
+def print_results(results: List[dict], param_keys: List[str], metric: str = "best_accuracy"):
+    """Print sweep results as a table, best trial first"""
+    rows = sorted(results, key=lambda r: (r.get(metric) is None, -(r.get(metric) or 0.0)))
+    headers = ["trial"] + [key.split(".")[-1] for key in param_keys] + [
+        "status", "epochs", "best_acc", "best_ep", "minutes"
+    ]
+
+    def fmt(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.3g}" if abs(value) < 1e-2 else f"{value:.3f}"
+        return str(value)
+
+    table = [
+        [row["trial"]] + [fmt(row.get(key)) for key in param_keys] + [
+            row["status"], fmt(row.get("epochs")), fmt(row.get(metric)),
+            fmt(row.get("best_epoch")), fmt(row.get("minutes")),
+        ]
+        for row in rows
+    ]
+    widths = [max(len(h), *(len(r[i]) for r in table)) if table else len(h) for i, h in enumerate(headers)]
+
+    print("\n" + "=" * 60)
+    print(f"SWEEP RESULTS ({len(rows)} trials)")
+    print("=" * 60)
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for r in table:
+        print("  ".join(c.ljust(w) for c, w in zip(r, widths)))
+    print("=" * 60)
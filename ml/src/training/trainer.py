@@ -1,8 +1,134 @@
 """Training setup using PyTorch Ignite"""
 
+import os
+import queue
+import threading
 import torch
-from ignite.engine import create_supervised_trainer, create_supervised_evaluator
-from ignite.metrics import Accuracy, Loss, Precision
+from ignite.engine import Engine
+from typing import Callable, Optional, Sequence
+from ignite.metrics import Accuracy, Loss
+
+from .metrics import evaluation_metrics
+from .profiling import StageTimer, phase_timer
+
+TRAIN_METRIC_MODES = ("running", "subsample", "full")
+
+# Autocast dtype for each precision option (None runs in full fp32)
+PRECISIONS = {
+    "fp32": None,
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+
+
+def _train_output(x, y, y_pred, loss):
+    """Trainer output: detached predictions and targets for running metrics, plus batch loss"""
+    return y_pred.detach(), y, loss.item()
+
+
+def autocast(device: str, precision: str = "fp32"):
+    """
+    Autocast context for the given device and precision.
+
+    Args:
+        device: Device the forward pass runs on ('cuda' or 'cpu')
+        precision: 'fp32', 'bf16' or 'fp16'
+
+    Returns:
+        torch.autocast context manager (disabled for fp32)
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+
+    device_type = torch.device(device).type
+    if precision == "fp16" and device_type != "cuda":
+        raise ValueError("fp16 autocast requires CUDA; use bf16 on CPU")
+
+    dtype = PRECISIONS[precision]
+    return torch.autocast(device_type=device_type, dtype=dtype, enabled=dtype is not None)
+
+
+def prepare_batch(
+    batch,
+    device: str,
+    channels_last: bool = False,
+    non_blocking: bool = False,
+    batch_transform: Optional[Callable] = None,
+    timer: Optional[StageTimer] = None,
+):
+    """
+    Move an (x, y) batch to the device, optionally in channels_last layout.
+
+    Args:
+        batch: Tuple of (images, labels); further elements (such as the
+            sample indices of an `IndexedDataset`) are ignored
+        device: Device to move tensors to
+        channels_last: Convert the image batch to channels_last memory format
+        non_blocking: Use asynchronous host-to-device copies
+        batch_transform: Applied to uint8 image batches once on the device
+            (e.g. `BatchAugment`)
+        timer: Records the copy as 'h2d' and the transform as 'augment'
+
+    Returns:
+        Tuple of (x, y) on the device
+    """
+    x, y = batch[0], batch[1]
+    with phase_timer(timer, "h2d"):
+        x = x.to(device, non_blocking=non_blocking)
+        y = y.to(device, non_blocking=non_blocking)
+    if batch_transform is not None and x.dtype == torch.uint8:
+        with phase_timer(timer, "augment"):
+            x = batch_transform(x)
+    if channels_last:
+        x = x.contiguous(memory_format=torch.channels_last)
+    return x, y
+
+
+def create_evaluator(
+    model: torch.nn.Module,
+    loss_fn: torch.nn.Module,
+    device: str = "cuda",
+    precision: str = "fp32",
+    channels_last: bool = False,
+    batch_transform: Optional[Callable] = None,
+    num_classes: Optional[int] = None,
+    top_k: Sequence[int] = (3, 5),
+) -> Engine:
+    """
+    Create an evaluator engine with streaming metrics.
+
+    Metrics are 'accuracy', 'loss', 'precision' (per class) and, when
+    `num_classes` is given, 'top{k}' and 'confusion_matrix' (see
+    `training.metrics.evaluation_metrics`). All are accumulated on `device`.
+
+    Args:
+        model: The neural network model
+        loss_fn: Loss function
+        device: Device to run on
+        precision: Forward pass precision ('fp32', 'bf16' or 'fp16')
+        channels_last: Feed batches in channels_last memory format
+        batch_transform: Applied on the device to uint8 image batches
+        num_classes: Number of classes (enables top-k and the confusion matrix)
+        top_k: k values for top-k accuracy
+
+    Returns:
+        Evaluator engine
+    """
+    autocast(device, precision)
+    non_blocking = torch.device(device).type == "cuda"
+
+    def eval_step(engine, batch):
+        model.eval()
+        with torch.no_grad():
+            x, y = prepare_batch(batch, device, channels_last, non_blocking, batch_transform)
+            with autocast(device, precision):
+                y_pred = model(x)
+            return y_pred.float(), y
+
+    evaluator = Engine(eval_step)
+    for name, metric in evaluation_metrics(loss_fn, num_classes, top_k, device).items():
+        metric.attach(evaluator, name)
+    return evaluator
 
 
 def create_trainer(
@@ -10,58 +136,252 @@ def create_trainer(
     optimizer: torch.optim.Optimizer,
     loss_fn: torch.nn.Module,
     device: str = "cuda",
+    train_metrics: str = "full",
+    precision: str = "fp32",
+    channels_last: bool = False,
+    batch_transform: Optional[Callable] = None,
+    timer: Optional[StageTimer] = None,
+    num_classes: Optional[int] = None,
+    top_k: Sequence[int] = (3, 5),
+    teacher: Optional[Callable] = None,
 ):
     """
     Create PyTorch Ignite trainer and evaluator.
 
+    The trainer's output is `(y_pred, y, loss)`. With `train_metrics="running"`,
+    accuracy and loss are also attached to the trainer itself and accumulated
+    from the training iterations, so `trainer.state.metrics` holds the epoch's
+    training metrics without a second pass over the data.
+
+    Both engines run the forward pass under autocast for 'bf16' (CPU or CUDA)
+    and 'fp16' (CUDA only). fp16 training uses a GradScaler to keep small
+    gradients from underflowing; bf16 has the fp32 exponent range and does
+    not need one.
+
     Args:
         model: The neural network model
         optimizer: Optimizer for training
         loss_fn: Loss function (e.g., CrossEntropyLoss)
         device: Device to run on ('cuda' or 'cpu')
+        train_metrics: How training-set metrics are computed
+            ('running', 'subsample' or 'full')
+        precision: Forward pass precision ('fp32', 'bf16' or 'fp16')
+        channels_last: Feed batches in channels_last memory format
+            (pair with `create_model(..., channels_last=True)`)
+        batch_transform: Applied on the device to uint8 image batches, e.g.
+            `BatchAugment` for the 'tensor' augmentation backend. Float
+            batches (the test loader) pass through unchanged.
+        timer: StageTimer the training step records its h2d, augment,
+            forward, backward and optimizer phases into (see
+            `training.profiling.attach_profiling`); None adds no overhead
+        num_classes: Number of classes; adds top-k accuracy and a confusion
+            matrix to the evaluator's metrics (see `create_evaluator`)
+        top_k: k values for the evaluator's top-k accuracy
+        teacher: Knowledge distillation: `teacher(x, batch)` returns teacher
+            logits for the (transformed) training batch and the loss is
+            computed as `loss_fn(y_pred, y, teacher_logits)` (see
+            `training.distillation`). The evaluator still calls
+            `loss_fn(y_pred, y)`.
 
     Returns:
         Tuple of (trainer, evaluator)
     """
-    trainer = create_supervised_trainer(
-        model,
-        optimizer,
-        loss_fn,
-        device=device
-    )
+    if train_metrics not in TRAIN_METRIC_MODES:
+        raise ValueError(f"Unsupported train_metrics mode: {train_metrics}")
+
+    # Validate the precision/device combination up front
+    autocast(device, precision)
+    non_blocking = torch.device(device).type == "cuda"
+    scaler = None
+    if precision == "fp16":
+        # torch.amp.GradScaler replaces torch.cuda.amp.GradScaler in torch>=2.3
+        scaler = (
+            torch.amp.GradScaler("cuda") if hasattr(torch.amp, "GradScaler")
+            else torch.cuda.amp.GradScaler()
+        )
+
+    def train_step(engine, batch):
+        model.train()
+        optimizer.zero_grad()
+        x, y = prepare_batch(batch, device, channels_last, non_blocking, batch_transform, timer)
+
+        teacher_logits = None
+        if teacher is not None:
+            with phase_timer(timer, "teacher"):
+                teacher_logits = teacher(x, batch)
+
+        with phase_timer(timer, "forward"), autocast(device, precision):
+            y_pred = model(x)
+            if teacher_logits is not None:
+                loss = loss_fn(y_pred, y, teacher_logits)
+            else:
+                loss = loss_fn(y_pred, y)
+
+        with phase_timer(timer, "backward"):
+            if scaler is not None:
+                scaler.scale(loss).backward()
+            else:
+                loss.backward()
+
+        with phase_timer(timer, "optimizer"):
+            if scaler is not None:
+                scaler.step(optimizer)
+                scaler.update()
+            else:
+                optimizer.step()
 
-    evaluator = create_supervised_evaluator(
-        model,
-        metrics={
-            'accuracy': Accuracy(),
-            'loss': Loss(loss_fn),
-            'precision': Precision(),
-        },
-        device=device
+        return _train_output(x, y, y_pred.float(), loss)
+
+    trainer = Engine(train_step)
+    trainer.scaler = scaler
+
+    if train_metrics == "running":
+        Accuracy(output_transform=lambda out: (out[0], out[1])).attach(trainer, 'accuracy')
+        Loss(loss_fn, output_transform=lambda out: (out[0], out[1])).attach(trainer, 'loss')
+
+    evaluator = create_evaluator(
+        model, loss_fn, device,
+        precision=precision,
+        channels_last=channels_last,
+        batch_transform=batch_transform,
+        num_classes=num_classes,
+        top_k=top_k,
     )
 
     return trainer, evaluator
 
 
-def save_checkpoint(model: torch.nn.Module, optimizer: torch.optim.Optimizer, epoch: int, path: str):
+def _to_cpu(obj):
+    """Recursively copy every tensor in a (nested) state dict to CPU memory"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: _to_cpu(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(value) for value in obj)
+    return obj
+
+
+def write_atomic(state: dict, path: str):
+    """torch.save to a temp file and rename it into place"""
+    tmp_path = f"{path}.tmp"
+    torch.save(state, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class AsyncCheckpointWriter:
+    """
+    Serializes and writes checkpoints on a background thread.
+
+    `submit` only snapshots the state dicts to CPU memory and returns, so
+    training continues while the file is written. At most `max_pending`
+    snapshots wait in the queue; beyond that `submit` blocks, which bounds
+    memory when writes are slower than epochs. Errors from the writer
+    thread are re-raised on the next `submit` or `flush`.
+    """
+
+    def __init__(self, max_pending: int = 1):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                state, path, on_written = item
+                write_atomic(state, path)
+                print(f"Checkpoint saved to {path}")
+                if on_written is not None:
+                    on_written()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Background checkpoint write failed") from error
+
+    def submit(self, state: dict, path: str, on_written: Callable[[], None] = None):
+        """
+        Queue a state snapshot for writing.
+
+        Args:
+            state: Checkpoint dict (already copied to CPU)
+            path: Destination path
+            on_written: Called on the writer thread once the file is in place
+        """
+        self._raise_error()
+        self._queue.put((state, path, on_written))
+
+    def flush(self):
+        """Block until every queued checkpoint is written"""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+
+
+def save_checkpoint(
+    model: torch.nn.Module,
+    optimizer: torch.optim.Optimizer,
+    epoch: int,
+    path: str,
+    writer: Optional[AsyncCheckpointWriter] = None,
+    on_written: Callable[[], None] = None,
+    extra: Optional[dict] = None,
+):
     """
     Save model checkpoint.
 
+    The file is written to a temp path and renamed, so an interrupted write
+    never leaves a truncated checkpoint behind.
+
     Args:
         model: The model to save
         optimizer: The optimizer state to save
         epoch: Current epoch number
         path: Path to save checkpoint
+        writer: Background writer; if given, the state is copied to CPU and
+            written asynchronously
+        on_written: Called once the checkpoint file is in place
+        extra: More entries for the checkpoint dict, e.g. the resume state
+            from `training.resume.training_state`
     """
-    torch.save({
+    state = {
         'epoch': epoch,
         'model_state_dict': model.state_dict(),
         'optimizer_state_dict': optimizer.state_dict(),
-    }, path)
+        **(extra or {}),
+    }
+
+    if writer is not None:
+        writer.submit(_to_cpu(state), path, on_written)
+        return
+
+    write_atomic(state, path)
     print(f"Checkpoint saved to {path}")
+    if on_written is not None:
+        on_written()
 
 
-def load_checkpoint(model: torch.nn.Module, optimizer: torch.optim.Optimizer, path: str) -> int:
+def load_checkpoint(
+    model: torch.nn.Module,
+    optimizer: torch.optim.Optimizer,
+    path: str,
+    map_location=None,
+    trainer: Optional[Engine] = None,
+    train_loader: Optional[torch.utils.data.DataLoader] = None,
+) -> int:
     """
     Load model checkpoint.
 
@@ -69,13 +389,27 @@ def load_checkpoint(model: torch.nn.Module, optimizer: torch.optim.Optimizer, pa
         model: The model to load weights into
         optimizer: The optimizer to load state into
         path: Path to checkpoint file
+        map_location: Where to load tensors (defaults to the model's device,
+            so GPU checkpoints resume on CPU-only machines)
+        trainer: Also restore the engine, RNG and data-order state, so
+            `trainer.run(train_loader)` resumes at the next iteration (see
+            `training.resume.restore_training_state`)
+        train_loader: Training loader (required with `trainer`)
 
     Returns:
         Epoch number from checkpoint
     """
-    checkpoint = torch.load(path)
+    if map_location is None:
+        map_location = next(model.parameters()).device
+    checkpoint = torch.load(path, map_location=map_location)
     model.load_state_dict(checkpoint['model_state_dict'])
     optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
     epoch = checkpoint['epoch']
-    print(f"Checkpoint loaded from {path} (epoch {epoch})")
+    if trainer is not None:
+        from .resume import restore_training_state
+
+        restore_training_state(trainer, checkpoint, train_loader)
+        print(f"Checkpoint loaded from {path} (iteration {trainer.state.iteration})")
+    else:
+        print(f"Checkpoint loaded from {path} (epoch {epoch})")
     return epoch